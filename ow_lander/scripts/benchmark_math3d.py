@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Compares the time and memory allocations of the trajectory geometry computed
+by TaskScoopLinear and TaskGrind when intermediate results are geometry_msgs
+messages (math3d) and when they are math3d_lite value types. Does not require
+ROS to be running.
+"""
+
+import sys
+import math
+import timeit
+import argparse
+import tracemalloc
+
+from geometry_msgs.msg import Vector3, Point, Pose
+
+from ow_lander import math3d
+from ow_lander import math3d_lite
+
+def scoop_linear_geometry(m3d, vector, pose):
+  """Same computations as TaskScoopLinearServer.plan_trajectory
+  m3d    -- math3d or math3d_lite
+  vector -- constructor of intermediate vectors
+  pose   -- function that creates a Pose message from a position and
+            orientation
+  """
+  ENTRY_PITCH = math.pi / 3
+  EXIT_PITCH = -math.pi / 3
+  ENTRY_RADIUS = EXIT_RADIUS = 0.1
+  length, depth = 0.1, 0.02
+  dig_point = vector(1.65, 0.0, -0.15)
+  yaw = math.atan2(dig_point.y, dig_point.x)
+  trench_direction = vector(math.cos(yaw), math.sin(yaw), 0.0)
+  digging_orientation = m3d.quaternion_from_euler(math.pi, 0, yaw)
+  entry_orientation = m3d.quaternion_from_euler(math.pi, ENTRY_PITCH, yaw)
+  exit_orientation = m3d.quaternion_from_euler(math.pi, EXIT_PITCH, yaw)
+  linear_start_surface = m3d.add(dig_point,
+    m3d.scalar_multiply(-length / 2, trench_direction))
+  linear_start_bottom = m3d.add(linear_start_surface, vector(0, 0, -depth))
+  linear_end_bottom = m3d.add(linear_start_bottom,
+    m3d.scalar_multiply(length, trench_direction))
+  entry_circle_center = m3d.add(linear_start_bottom,
+                                vector(0, 0, ENTRY_RADIUS))
+  exit_circle_center = m3d.add(linear_end_bottom, vector(0, 0, EXIT_RADIUS))
+  entry_rot = m3d.quaternion_from_euler(0, ENTRY_PITCH, yaw)
+  entry_arc_start = m3d.add(m3d.quaternion_rotate(entry_rot,
+      m3d.subtract(linear_start_bottom, entry_circle_center)),
+    entry_circle_center)
+  exit_rot = m3d.quaternion_from_euler(0, EXIT_PITCH, yaw)
+  exit_arc_end = m3d.add(m3d.quaternion_rotate(exit_rot,
+      m3d.subtract(linear_end_bottom, exit_circle_center)),
+    exit_circle_center)
+  return [pose(entry_arc_start, entry_orientation),
+          pose(linear_start_bottom, digging_orientation),
+          pose(linear_end_bottom, digging_orientation),
+          pose(exit_arc_end, exit_orientation)]
+
+def grind_geometry(m3d, vector, pose):
+  """Same computations as TaskGrindServer.plan_trajectory"""
+  SEGMENT_SEPARATION_DISTANCE = 0.15
+  APPROACH_DISTANCE = 0.25
+  length, depth = 0.5, 0.05
+  grind_point = vector(1.65, 0.0, -0.15)
+  yaw = math.atan2(grind_point.y, grind_point.x)
+  trench_direction = vector(math.sin(yaw), -math.cos(yaw), 0.0)
+  grind_orientation = m3d.quaternion_from_euler(math.pi, math.pi / 2, 0)
+  offset = m3d.add(vector(-SEGMENT_SEPARATION_DISTANCE / 2, 0, 0),
+                   m3d.scalar_multiply(-length / 2, trench_direction))
+  separation = m3d.scalar_multiply(-SEGMENT_SEPARATION_DISTANCE,
+                                   m3d.orthogonal(trench_direction))
+  rot_to_parallel = m3d.quaternion_from_euler(0, 0, math.pi / 2)
+  offset = m3d.quaternion_rotate(rot_to_parallel, offset)
+  separation = m3d.quaternion_rotate(rot_to_parallel, separation)
+  trench_direction = m3d.quaternion_rotate(rot_to_parallel, trench_direction)
+  start_surface = m3d.add(grind_point, offset)
+  entry_approach = m3d.add(start_surface, vector(0, 0, APPROACH_DISTANCE))
+  segment1_start = m3d.subtract(start_surface, vector(0, 0, depth))
+  segment1_end = m3d.add(segment1_start,
+                         m3d.scalar_multiply(length, trench_direction))
+  segment2_start = m3d.add(segment1_end, separation)
+  segment2_end = m3d.add(segment1_start, separation)
+  exit_retract = m3d.add(entry_approach, separation)
+  return [pose(entry_approach, grind_orientation),
+          pose(segment1_end, grind_orientation),
+          pose(segment2_end, grind_orientation),
+          segment2_start, exit_retract]
+
+def message_pose(position, orientation):
+  return Pose(Point(position.x, position.y, position.z), orientation)
+
+VARIANTS = {
+  'math3d': (math3d, Vector3, message_pose),
+  'math3d_lite': (math3d_lite, math3d_lite.Vec3, math3d_lite.pose_msg)
+}
+
+GEOMETRIES = {
+  'scoop_linear': scoop_linear_geometry,
+  'grind': grind_geometry
+}
+
+def measure(geometry, variant, number):
+  """returns a tuple of microseconds per call and the peak number of bytes
+  allocated during a call
+  """
+  args = VARIANTS[variant]
+  seconds = min(timeit.repeat(lambda: geometry(*args), number=number, repeat=5))
+  tracemalloc.start()
+  geometry(*args)
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return seconds / number * 1e6, peak
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--number', type=int, default=2000,
+                      help="calls per timing repetition")
+  args = parser.parse_args()
+  # results must match before their cost is worth comparing
+  for name, geometry in GEOMETRIES.items():
+    reference = geometry(*VARIANTS['math3d'])
+    lite = geometry(*VARIANTS['math3d_lite'])
+    for r, l in zip(reference, lite):
+      r = getattr(r, 'position', r)
+      l = getattr(l, 'position', l)
+      if not math3d.vectors_approx_equivalent(r, l, 1e-9):
+        print(f"{name}: math3d_lite result {l} differs from math3d result {r}")
+        return 1
+  print(f"{'geometry':<14}{'variant':<13}{'us/call':>9}{'peak bytes':>12}")
+  for name, geometry in GEOMETRIES.items():
+    results = dict()
+    for variant in VARIANTS:
+      results[variant] = measure(geometry, variant, args.number)
+      usec, peak = results[variant]
+      print(f"{name:<14}{variant:<13}{usec:>9.1f}{peak:>12}")
+    speedup = results['math3d'][0] / results['math3d_lite'][0]
+    print(f"{name:<14}{'speedup':<13}{speedup:>9.2f}")
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Fits the calibration parameters of the task duration estimator to the
+action durations measured by ow_sim_tests/scripts/action_test_analysis.py. The
+goals and start configurations of the measured actions are described by a
+cases file like config/duration_calibration_cases.yaml. robot_description must
+be on the parameter server.
+"""
+
+import argparse
+from types import SimpleNamespace
+
+import numpy as np
+import yaml
+
+import rospy
+
+from ow_lander.math3d_lite import Vec3
+from ow_lander.duration_estimator import DurationEstimator
+
+# a task's own parameters are only fit when it has at least this many samples,
+# so that the fit is overdetermined
+MIN_TASK_SAMPLES = 3
+
+def fit(samples):
+  """Fit execution scale and per-segment planning duration to samples
+  samples -- list of tuples of estimated execution duration, planned segments,
+             and measured duration
+  returns a tuple of execution_scale, planning_duration, and the root mean
+  square of the residuals of the fit
+  """
+  execution, segments, measured = np.array(samples).T
+  scale, planning = 1.0, None
+  if len(samples) > 1:
+    (scale, planning), *_ = np.linalg.lstsq(
+      np.stack([execution, segments], axis=1), measured, rcond=None)
+  if planning is None or scale <= 0 or planning < 0:
+    # too few or inconsistent samples to fit both, so only planning is fit
+    scale = 1.0
+    planning = max(0.0, float(np.sum(segments * (measured - execution))
+                              / np.sum(segments ** 2)))
+  residuals = measured - scale * execution - planning * segments
+  return float(scale), float(planning), float(np.sqrt(np.mean(residuals ** 2)))
+
+parser = argparse.ArgumentParser(
+  formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+  description="Calibrate the task duration estimator.")
+parser.add_argument('statistics',
+  help="YAML file of action statistics saved by action_test_analysis.py")
+parser.add_argument('cases',
+  help="YAML file that maps the units of the statistics to the task, goal, "
+       "and start joint positions of each action")
+parser.add_argument('--output', '-o', default=None,
+  help="YAML file the calibration parameters are saved to. They are printed "
+       "if not provided.")
+args = parser.parse_args(rospy.myargv()[1:])
+
+rospy.init_node('calibrate_duration_estimator')
+
+with open(args.statistics, 'r') as f:
+  statistics = yaml.safe_load(f)['test_action_statistics']
+with open(args.cases, 'r') as f:
+  cases = yaml.safe_load(f)
+
+estimator = DurationEstimator()
+samples = dict()
+for unit, case in cases.items():
+  if unit not in statistics:
+    rospy.logwarn(f"{unit} has no statistics and will not be used")
+    continue
+  goal = dict(case['goal'])
+  if 'point' in goal:
+    goal['point'] = Vec3(*goal['point'])
+  execution = estimator.estimate_execution(case['task'], case['start'],
+                                           SimpleNamespace(**goal))
+  measured = statistics[unit]['duration']['mean']
+  samples.setdefault(case['task'], list()).append(
+    (execution, DurationEstimator.SEGMENTS[case['task']], measured))
+  rospy.loginfo(f"{unit}: estimated {execution:.1f} s of execution, measured "
+                f"{measured:.1f} s in total")
+
+# all tasks share one execution scale and planning duration, which tasks with
+# enough samples of their own override
+execution_scale, planning_duration, rms = fit(
+  [sample for task_samples in samples.values() for sample in task_samples])
+rospy.loginfo(f"Shared fit: execution scale {execution_scale:.3f}, planning "
+              f"duration {planning_duration:.3f} s per segment, residual RMS "
+              f"{rms:.2f} s")
+calibration = {
+  'execution_scale': round(execution_scale, 3),
+  'planning_duration': round(planning_duration, 3)
+}
+for task, task_samples in samples.items():
+  if len(task_samples) < MIN_TASK_SAMPLES:
+    rospy.loginfo(f"{task} has {len(task_samples)} samples, so it uses the "
+                  "shared fit")
+    continue
+  execution_scale, planning_duration, rms = fit(task_samples)
+  rospy.loginfo(f"{task} fit: execution scale {execution_scale:.3f}, planning "
+                f"duration {planning_duration:.3f} s per segment, residual "
+                f"RMS {rms:.2f} s")
+  calibration[task] = {
+    'execution_scale': round(execution_scale, 3),
+    'planning_duration': round(planning_duration, 3)
+  }
+output = yaml.dump({'duration_estimator': calibration},
+                   default_flow_style=False)
+if args.output is None:
+  print(output)
+else:
+  with open(args.output, 'w') as f:
+    f.write(output)
+  rospy.loginfo(f"Saved calibration parameters to {args.output}")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Generates the reachability map the lander action servers use to reject
+task goals the arm cannot reach. For every voxel of a grid over the base_link
+workspace, inverse kinematics is solved for the working pose of each task with
+the tool at the center of the voxel. Only robot_description must be on the
+parameter server.
+"""
+
+import math
+import time
+import argparse
+
+import numpy as np
+
+import rospy
+
+from ow_lander import reachability
+from ow_lander import math3d_lite
+from ow_lander.reachability import ReachabilityMap, DEFAULT_MAP_PATH
+from ow_lander.kinematics import ForwardKinematics
+from ow_lander.inverse_kinematics import InverseKinematics
+
+D2R = math.pi / 180
+
+def quaternion_array(q):
+  return np.array([q.x, q.y, q.z, q.w])
+
+# For each task type, the link placed at the voxel, the orientation of its
+# working pose as a function of shoulder yaw, and the positions of the joints
+# the action server moves to before its working pose as a function of shoulder
+# yaw. These mirror the plans of the task servers in actions.py.
+TASKS = {
+  # the bottom of the trench in the grind orientation
+  reachability.TASK_GRIND: (
+    'l_grinder_tip',
+    lambda yaw: math3d_lite.quaternion_from_euler(math.pi, math.pi / 2, 0),
+    lambda yaw: {'j_shou_yaw': yaw, 'j_shou_pitch': math.pi / 2,
+                 'j_prox_pitch': -math.pi / 2, 'j_dist_pitch': 0.0,
+                 'j_hand_yaw': -2 * math.pi / 3, 'j_grinder': 0.0}
+  ),
+  # the bottom of the trench in the digging orientation
+  reachability.TASK_SCOOP_LINEAR: (
+    'l_scoop_tip',
+    lambda yaw: math3d_lite.quaternion_from_euler(math.pi, 0, yaw),
+    lambda yaw: {'j_shou_yaw': yaw, 'j_shou_pitch': math.pi / 2,
+                 'j_prox_pitch': -math.pi / 2, 'j_dist_pitch': 0.0,
+                 'j_hand_yaw': 0.0, 'j_scoop_yaw': math.pi / 2}
+  ),
+  # the bottom of the trench in the mid-scooping orientation
+  reachability.TASK_SCOOP_CIRCULAR: (
+    'l_scoop_tip',
+    lambda yaw: math3d_lite.quaternion_multiply(
+      math3d_lite.quaternion_from_euler(0, 0, yaw),
+      math3d_lite.quaternion_from_euler(math.pi, 0, -math.pi / 2)),
+    lambda yaw: {'j_shou_yaw': yaw, 'j_shou_pitch': math.pi / 2,
+                 'j_prox_pitch': -math.pi / 2, 'j_dist_pitch': 0.0,
+                 'j_hand_yaw': 0.0, 'j_scoop_yaw': 0.0}
+  ),
+  # the held pose above the discard point, which TaskDiscardSample plans for
+  # l_scoop rather than its tip
+  reachability.TASK_DISCARD: (
+    'l_scoop',
+    lambda yaw: math3d_lite.quaternion_from_euler(-179 * D2R, -20 * D2R,
+                                                  -90 * D2R),
+    lambda yaw: {'j_shou_yaw': yaw, 'j_shou_pitch': math.pi / 2,
+                 'j_prox_pitch': -math.pi / 2, 'j_dist_pitch': 0.0,
+                 'j_hand_yaw': 0.0, 'j_scoop_yaw': 0.0}
+  )
+}
+
+parser = argparse.ArgumentParser(
+  formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+  description="Generate the reachability map of the arm's task types.")
+parser.add_argument('--min', type=float, nargs=3, default=[0.0, -1.5, -1.0],
+  metavar=('X', 'Y', 'Z'),
+  help="Corner of the mapped workspace with the smallest base_link "
+       "coordinates (meters)")
+parser.add_argument('--max', type=float, nargs=3, default=[3.0, 1.5, 1.5],
+  metavar=('X', 'Y', 'Z'),
+  help="Corner of the mapped workspace with the largest base_link "
+       "coordinates (meters)")
+parser.add_argument('--resolution', '-r', type=float, default=0.1,
+  help="Edge length of a voxel (meters)")
+parser.add_argument('--output', '-o', default=DEFAULT_MAP_PATH,
+  help="Map file. An existing map is overwritten.")
+args = parser.parse_args(rospy.myargv()[1:])
+
+rospy.init_node('generate_reachability_map')
+
+fk = ForwardKinematics()
+ik = InverseKinematics()
+origin = np.array(args.min)
+shape = tuple(np.ceil((np.array(args.max) - origin) / args.resolution)
+                .astype(int))
+# the limits of shoulder yaw, which all tasks move
+(yaw_lower,), (yaw_upper,) = fk.get_joint_limits(['j_shou_yaw'])
+
+tasks = np.zeros(shape, dtype=np.uint8)
+shoulder_yaw = np.full(shape, np.nan)
+seeds = dict()
+for task, (link, _, _) in TASKS.items():
+  joint_names = fk.get_joint_names(link)
+  seeds[task] = (joint_names, np.full(shape + (len(joint_names),), np.nan))
+
+def map_column(i, j):
+  """Solve all voxels of a vertical column of the grid"""
+  x, y = origin[:2] + (np.array([i, j]) + 0.5) * args.resolution
+  yaw = reachability.workspace_shoulder_yaw(x, y)
+  if math.isnan(yaw) or yaw <= yaw_lower or yaw >= yaw_upper:
+    return
+  shoulder_yaw[i, j, :] = yaw
+  for task, (link, orientation, pre_positions) in TASKS.items():
+    joint_names, task_seeds = seeds[task]
+    pre_seed = [pre_positions(yaw).get(name, 0.0) for name in joint_names]
+    previous = None
+    # each voxel of a column is warm-started from the solution of the voxel
+    # below it, if any, before the joint positions of the task's pre-pose
+    for k in range(shape[2]):
+      z = origin[2] + (k + 0.5) * args.resolution
+      pose = np.concatenate(([x, y, z], quaternion_array(orientation(yaw))))
+      solution = None
+      for seed in ([previous] if previous is not None else []) + [pre_seed]:
+        solution = ik.solve(link, joint_names, seed, pose)
+        if solution is not None:
+          break
+      previous = solution
+      if solution is not None:
+        tasks[i, j, k] |= task
+        task_seeds[i, j, k] = solution
+
+start = time.time()
+for i in range(shape[0]):
+  for j in range(shape[1]):
+    map_column(i, j)
+  rospy.loginfo(f"Mapped {i + 1} of {shape[0]} slices of the workspace in "
+                f"{time.time() - start:.0f} seconds")
+
+reachability_map = ReachabilityMap(args.output)
+reachability_map.set_grid(origin, args.resolution, tasks, shoulder_yaw, seeds)
+reachability_map.save()
+for task, name in reachability.TASK_NAMES.items():
+  rospy.loginfo(f"{name} can be performed in "
+                f"{np.count_nonzero(tasks & task)} of {tasks.size} voxels")
+rospy.loginfo(f"Saved the reachability map to {args.output}")
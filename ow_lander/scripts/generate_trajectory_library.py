@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Precomputes trajectories between the named SRDF targets of a move group and
+stores them in a trajectory library that the lander action servers load at
+startup. MoveIt must be running, e.g. by having started the simulator.
+"""
+
+import sys
+import argparse
+
+import rospy
+import moveit_commander
+
+from ow_lander.trajectory_library import TrajectoryLibrary, DEFAULT_LIBRARY_PATH
+from ow_lander.trajectory_sequence import robot_state_at
+
+def trajectory_duration(trajectory):
+  return trajectory.joint_trajectory.points[-1].time_from_start.to_sec()
+
+def plan_best(group, start_state, target_values, attempts):
+  """Plan several times from start_state to target_values
+  returns the trajectory of shortest duration or None if all attempts failed
+  """
+  best = None
+  for _ in range(attempts):
+    group.set_start_state(start_state)
+    group.set_joint_value_target(target_values)
+    success, trajectory, _, error_code = group.plan()
+    if not success:
+      rospy.logwarn(f"Planning attempt failed with error code {error_code}")
+      continue
+    if best is None \
+        or trajectory_duration(trajectory) < trajectory_duration(best):
+      best = trajectory
+  return best
+
+parser = argparse.ArgumentParser(
+  formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+  description="Precompute trajectories between named arm targets.")
+parser.add_argument('--group', '-g', default='arm',
+  help="Move group to plan for")
+parser.add_argument('--targets', '-t', nargs='*', default=None,
+  help="Named targets trajectories will end at. All named targets of the "
+       "group are used if not provided.")
+parser.add_argument('--starts', '-s', nargs='*', default=None,
+  help="Named targets trajectories will start from. All named targets of the "
+       "group and the current arm configuration are used if not provided.")
+parser.add_argument('--planner', '-p', default='RRTstar',
+  help="ID of the planner used to plan each trajectory")
+parser.add_argument('--planning-time', type=float, default=10.0,
+  help="Time in seconds allotted to each planning attempt")
+parser.add_argument('--attempts', '-a', type=int, default=3,
+  help="Planning attempts per trajectory. The fastest trajectory is kept.")
+parser.add_argument('--output', '-o', default=DEFAULT_LIBRARY_PATH,
+  help="Library file. Trajectories are added to it if it already exists.")
+args = parser.parse_args(rospy.myargv()[1:])
+
+moveit_commander.roscpp_initialize(sys.argv)
+rospy.init_node('generate_trajectory_library')
+
+robot = moveit_commander.RobotCommander()
+group = moveit_commander.MoveGroupCommander(args.group)
+group.set_planner_id(args.planner)
+group.set_planning_time(args.planning_time)
+joint_names = group.get_active_joints()
+
+named_targets = group.get_named_targets()
+targets = named_targets if args.targets is None else args.targets
+start_names = named_targets if args.starts is None else args.starts
+starts = [(name, [group.get_named_target_values(name)[j] for j in joint_names])
+          for name in start_names]
+if args.starts is None:
+  starts.append(('current', group.get_current_joint_values()))
+
+library = TrajectoryLibrary(args.output)
+for target in targets:
+  target_values = group.get_named_target_values(target)
+  for start_name, start_positions in starts:
+    if start_name == target:
+      continue
+    rospy.loginfo(f"Planning from {start_name} to {target}...")
+    start_state = robot_state_at(robot.get_current_state(), joint_names,
+                                 start_positions)
+    trajectory = plan_best(group, start_state, target_values, args.attempts)
+    if trajectory is None:
+      rospy.logerr(f"Could not plan from {start_name} to {target}")
+      continue
+    library.add(args.group, target, trajectory)
+    rospy.loginfo(f"Added a {trajectory_duration(trajectory):.1f} second "
+                  f"trajectory from {start_name} to {target}")
+
+library.save()
+rospy.loginfo(f"Saved {len(library)} trajectories to {args.output}")
+moveit_commander.roscpp_shutdown()
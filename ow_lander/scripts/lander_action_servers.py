@@ -8,12 +8,22 @@ import rospy
 
 from ow_lander import actions
 from ow_lander import frame_transformer
+from ow_lander.trajectory_library import TrajectoryLibrary
+from ow_lander.reachability import ReachabilityMap
+from ow_lander.duration_estimator import DurationEstimatorServer
+from ow_lander.planning_telemetry import PlanningTelemetryServer
+from ow_lander.execution_monitor import ExecutionMonitorServer
 
 rospy.init_node('lander_action_servers')
 
 # handles initialization that must occur after init_node call
 frame_transformer.initialize()
 
+# load precomputed trajectories to named targets before any goals arrive
+TrajectoryLibrary()
+# load the reachability map task goals are checked against
+ReachabilityMap()
+
 # arm actions
 server_stop           = actions.ArmStopServer()
 server_guarded_move   = actions.GuardedMoveServer()
@@ -41,4 +51,11 @@ server_antenna_pan         = actions.PanServer()
 server_antenna_tilt        = actions.TiltServer()
 server_pan_tilt_move_cartesian = actions.PanTiltMoveCartesianServer()
 
+# estimates of task durations for scheduling
+server_duration_estimator = DurationEstimatorServer()
+# histograms of the planning telemetry of the arm action servers
+server_planning_telemetry = PlanningTelemetryServer()
+# tracking error of the arm's trajectory executions
+server_execution_monitor = ExecutionMonitorServer()
+
 rospy.spin()
@@ -21,6 +21,8 @@ from gazebo_msgs.msg import LinkStates
 import ow_lander.msg
 from ow_lander import mixins
 from ow_lander import math3d
+from ow_lander import math3d_lite
+from ow_lander.math3d_lite import Vec3
 from ow_lander import constants
 from ow_lander.server import ActionServerBase
 from ow_lander.common import normalize_radians, wait_for_subscribers
@@ -31,6 +33,8 @@ from ow_lander.subscribers import wait_for_message
 from ow_lander.ground_detector import GroundDetector, FTSensorThresholdMonitor
 from ow_lander.frame_transformer import FrameTransformer
 from ow_lander.trajectory_sequence import TrajectorySequence
+from ow_lander import reachability
+from ow_lander.reachability import ReachabilityMap
 
 
 # This message is used by both ArmMoveCartesianGuarded and ArmMoveJointsGuarded
@@ -71,10 +75,10 @@ def _compute_workspace_shoulder_yaw(x, y):
     x -- base_link x position
     y -- base_link y position
     """
-    yaw = math.atan2(y - constants.Y_SHOU, x - constants.X_SHOU)
-    h = math.sqrt(pow(y - constants.Y_SHOU, 2) + pow(x - constants.X_SHOU, 2))
-    l = constants.Y_SHOU - constants.HAND_Y_OFFSET
-    yaw += math.asin(l / h)
+    yaw = reachability.workspace_shoulder_yaw(x, y)
+    if math.isnan(yaw):
+      raise ArmPlanningError("Position is too close to the shoulder to be "
+                             "reached")
     _assert_shou_yaw_in_range(yaw)
     return yaw
     
@@ -102,7 +106,7 @@ class ArmStopServer(mixins.ArmActionMixin, ActionServerBase):
 
 
 ### DEPRECATED: ArmFindSurface should be used in place of GuardedMove
-class GuardedMoveServer(mixins.ArmActionMixin, ActionServerBase):
+class GuardedMoveServer(mixins.PlanOnlyMixin, ActionServerBase):
 
   # NOTE: The "final" in GuardedMove's result is not in the same frame as the
   #       other arm action's finals, which seems misleading from a user
@@ -124,7 +128,7 @@ class GuardedMoveServer(mixins.ArmActionMixin, ActionServerBase):
 
   def plan_trajectory(self, goal):
     sequence = TrajectorySequence(
-      self._arm.robot, self._arm.move_group_scoop, 'l_scoop')
+      self._arm.robot, self.move_group_scoop, 'l_scoop', action=self.name)
     # STUB: GROUND HEIGHT TO BE EXTRACTED FROM DEM
     targ_elevation = -0.2
     if (goal.start.z+targ_elevation) == 0:
@@ -161,10 +165,10 @@ class GuardedMoveServer(mixins.ArmActionMixin, ActionServerBase):
 
     detector = GroundDetector(GROUND_REFERENCE_FRAME, GROUND_POKER_LINK)
 
-    # define the callback locally to avoid making detector a member variable
-    def ground_detect_cb():
-      # publish feedback
+    # define the callbacks locally to avoid making detector a member variable
+    def feedback_cb():
       self._publish_feedback(current=self._arm_tip_monitor.get_link_position())
+    def ground_detect_cb():
       # check if ground has been detected
       if detector.was_ground_detected():
         self._arm.stop_trajectory_silently()
@@ -179,7 +183,8 @@ class GuardedMoveServer(mixins.ArmActionMixin, ActionServerBase):
       #       called
       trajectory = self.plan_trajectory(goal)
       self._arm.execute_arm_trajectory(trajectory,
-        action_feedback_cb=ground_detect_cb)
+        action_feedback_cb=feedback_cb, feedback_rate=self._feedback_rate,
+        guard_cb=ground_detect_cb)
     except ArmExecutionError as err:
       self._arm.checkin_arm(self.name)
       self._set_aborted(str(err), final=Point())
@@ -211,7 +216,7 @@ class ArmUnstowServer(mixins.ArmTrajectoryMixin, ActionServerBase):
 
 
   def plan_trajectory(self, _goal):
-    sequence = TrajectorySequence(self._arm.robot, self._arm.move_group_scoop)
+    sequence = self.create_sequence(self.move_group_scoop)
     sequence.plan_to_target('arm_unstowed')
     return sequence.merge()
 
@@ -226,7 +231,7 @@ class ArmStowServer(mixins.ArmTrajectoryMixin, ActionServerBase):
   goal_group_id = ow_lander.msg.ActionGoalStatus.ARM_GOAL
 
   def plan_trajectory(self, _goal):
-    sequence = TrajectorySequence(self._arm.robot, self._arm.move_group_scoop)
+    sequence = self.create_sequence(self.move_group_scoop)
     sequence.plan_to_target('arm_stowed')
     return sequence.merge()
 
@@ -240,6 +245,8 @@ class TaskGrindServer(mixins.GrinderTrajectoryMixin, ActionServerBase):
   result_type   = owl_msgs.msg.TaskGrindResult
   goal_group_id = ow_lander.msg.ActionGoalStatus.TASK_GOAL
 
+  pipelined_execution = True
+
   def publish_feedback_cb(self):
     self._publish_feedback(current=self._arm_tip_monitor.get_link_position())
 
@@ -250,66 +257,73 @@ class TaskGrindServer(mixins.GrinderTrajectoryMixin, ActionServerBase):
 
     # NOTE: grind_point lies halfway between the two segments in the center of
     #       the trench
-    grind_point = Point(goal.x_start, goal.y_start, goal.ground_position)
+    grind_point = Vec3(goal.x_start, goal.y_start, goal.ground_position)
+    ReachabilityMap().check(reachability.TASK_GRIND, math3d_lite.subtract(
+      grind_point, Vec3(0, 0, goal.depth)))
     yaw = _compute_workspace_shoulder_yaw(grind_point.x, grind_point.y)
     # define variables in perpendicular configuration (left-to-right of lander)
-    trench_direction = Vector3(math.sin(yaw), -math.cos(yaw), 0.0)
+    trench_direction = Vec3(math.sin(yaw), -math.cos(yaw), 0.0)
     # NOTE: this grinder design can grind in any direction, so yaw can be zero
-    grind_orientation = math3d.quaternion_from_euler(math.pi, math.pi / 2, 0)
+    grind_orientation = math3d_lite.quaternion_from_euler(math.pi, math.pi / 2,
+                                                          0)
     # compute the start of segment1 from grind_point
-    segment1_offset_from_grind_point = math3d.add(
-      Vector3(-SEGMENT_SEPARATION_DISTANCE / 2, 0, 0),
-      math3d.scalar_multiply(-goal.length / 2, trench_direction)
+    segment1_offset_from_grind_point = math3d_lite.add(
+      Vec3(-SEGMENT_SEPARATION_DISTANCE / 2, 0, 0),
+      math3d_lite.scalar_multiply(-goal.length / 2, trench_direction)
     )
-    segment_separation = math3d.scalar_multiply(
-      -SEGMENT_SEPARATION_DISTANCE, math3d.orthogonal(trench_direction))
+    segment_separation = math3d_lite.scalar_multiply(
+      -SEGMENT_SEPARATION_DISTANCE, math3d_lite.orthogonal(trench_direction))
     if goal.parallel:
       # rotate segment defining vectors so they now run parallel
-      rot_to_parallel = math3d.quaternion_from_euler(0, 0, math.pi / 2)
-      segment1_offset_from_grind_point = math3d.quaternion_rotate(
+      rot_to_parallel = math3d_lite.quaternion_from_euler(0, 0, math.pi / 2)
+      segment1_offset_from_grind_point = math3d_lite.quaternion_rotate(
         rot_to_parallel, segment1_offset_from_grind_point)
-      segment_separation = math3d.quaternion_rotate(rot_to_parallel,
-                                                    segment_separation)
-      trench_direction = math3d.quaternion_rotate(rot_to_parallel,
-                                                  trench_direction)
+      segment_separation = math3d_lite.quaternion_rotate(rot_to_parallel,
+                                                         segment_separation)
+      trench_direction = math3d_lite.quaternion_rotate(rot_to_parallel,
+                                                       trench_direction)
     # define entry position and positions for first segment of grind motion
-    segment1_start_surface = math3d.add(grind_point, segment1_offset_from_grind_point)
-    entry_approach = math3d.add(segment1_start_surface,
-                                Vector3(0, 0, APPROACH_DISTANCE))
-    segment1_start_bottom = math3d.subtract(segment1_start_surface,
-                                            Vector3(0, 0, goal.depth))
-    segment1_end_bottom = math3d.add(segment1_start_bottom,
-      math3d.scalar_multiply(goal.length, trench_direction))
+    segment1_start_surface = math3d_lite.add(grind_point,
+                                             segment1_offset_from_grind_point)
+    entry_approach = math3d_lite.add(segment1_start_surface,
+                                     Vec3(0, 0, APPROACH_DISTANCE))
+    segment1_start_bottom = math3d_lite.subtract(segment1_start_surface,
+                                                 Vec3(0, 0, goal.depth))
+    segment1_end_bottom = math3d_lite.add(segment1_start_bottom,
+      math3d_lite.scalar_multiply(goal.length, trench_direction))
     # define positions for second segment of grind motion when it moves backward
-    segment2_start_bottom = math3d.add(segment1_end_bottom,
-                                       segment_separation)
-    segment2_end_bottom = math3d.add(segment1_start_bottom, segment_separation)
-    exit_retract = math3d.add(entry_approach, segment_separation)
-
-    sequence = TrajectorySequence(
-      self._arm.robot, self._arm.move_group_grinder, 'l_grinder_tip')
-    sequence.plan_to_named_joint_positions(
-      j_shou_yaw = yaw,
-      j_shou_pitch = math.pi / 2,
-      j_prox_pitch = -math.pi / 2,
-      j_dist_pitch = 0.0,
-      j_hand_yaw = -2 * math.pi / 3,
-      j_grinder = 0.0
-    )
-    # place grinder directly above its terrain entry point
-    sequence.plan_to_pose(Pose(entry_approach, grind_orientation))
-    # enter terrain at the start of segment 1
-    sequence.plan_to_position(segment1_start_bottom)
-    # perform segment 1, moving away from grind_point
-    sequence.plan_linear_path_to_pose(
-      Pose(segment1_end_bottom, grind_orientation))
-    # shift along segment separation direction to the start of segment 2
-    sequence.plan_to_position(segment2_start_bottom)
-    # perform segment 2, moving towards grind_point
-    sequence.plan_linear_path_to_pose(
-      Pose(segment2_end_bottom, grind_orientation))
-    # retract out of terrain
-    sequence.plan_to_position(exit_retract)
+    segment2_start_bottom = math3d_lite.add(segment1_end_bottom,
+                                            segment_separation)
+    segment2_end_bottom = math3d_lite.add(segment1_start_bottom,
+                                          segment_separation)
+    exit_retract = math3d_lite.add(entry_approach, segment_separation)
+
+    sequence = self.create_sequence(self.move_group_grinder,
+                                    'l_grinder_tip', segments=7)
+    with sequence.parallel_planning():
+      sequence.plan_to_named_joint_positions(
+        j_shou_yaw = yaw,
+        j_shou_pitch = math.pi / 2,
+        j_prox_pitch = -math.pi / 2,
+        j_dist_pitch = 0.0,
+        j_hand_yaw = -2 * math.pi / 3,
+        j_grinder = 0.0
+      )
+      # place grinder directly above its terrain entry point
+      sequence.plan_to_pose(
+        math3d_lite.pose_msg(entry_approach, grind_orientation))
+      # enter terrain at the start of segment 1
+      sequence.plan_to_position(segment1_start_bottom.to_msg(Point))
+      # perform segment 1, moving away from grind_point
+      sequence.plan_linear_path_to_pose(
+        math3d_lite.pose_msg(segment1_end_bottom, grind_orientation))
+      # shift along segment separation direction to the start of segment 2
+      sequence.plan_to_position(segment2_start_bottom.to_msg(Point))
+      # perform segment 2, moving towards grind_point
+      sequence.plan_linear_path_to_pose(
+        math3d_lite.pose_msg(segment2_end_bottom, grind_orientation))
+      # retract out of terrain
+      sequence.plan_to_position(exit_retract.to_msg(Point))
     return sequence.merge()
 
 class TaskScoopCircularServer(mixins.FrameMixin, mixins.ArmTrajectoryMixin,
@@ -322,6 +336,8 @@ class TaskScoopCircularServer(mixins.FrameMixin, mixins.ArmTrajectoryMixin,
   result_type   = owl_msgs.msg.TaskScoopCircularResult
   goal_group_id = ow_lander.msg.ActionGoalStatus.TASK_GOAL
 
+  pipelined_execution = True
+
   def __init__(self, *args, **kwargs):
     super().__init__('l_scoop_tip', *args, **kwargs)
 
@@ -337,43 +353,45 @@ class TaskScoopCircularServer(mixins.FrameMixin, mixins.ArmTrajectoryMixin,
     # NOTE: dig point is on the surface in the center of the circular trench
     dig_point = self.transform_to_planning_frame(
       self.get_intended_position(goal.frame, goal.relative, goal.point)).point
+    trench_bottom = Vec3(dig_point.x,
+                         dig_point.y,
+                         dig_point.z - goal.depth)
+    ReachabilityMap().check(reachability.TASK_SCOOP_CIRCULAR, trench_bottom)
     # place end-effector above trench position
     yaw = _compute_workspace_shoulder_yaw(dig_point.x, dig_point.y)
-    trench_bottom = Point(dig_point.x,
-                          dig_point.y,
-                          dig_point.z - goal.depth)
     # center of the circular arc
-    center = math3d.add(trench_bottom, Vector3(0, 0, RADIUS))
+    center = math3d_lite.add(trench_bottom, Vec3(0, 0, RADIUS))
     # rotates a downward facing point of contact (POC) on the circle to the
     # start and end of the perpendicular downward arc trajectory
-    rot_down_to_start = math3d.quaternion_from_euler(ARC / 2, 0, yaw)
-    rot_down_to_end = math3d.quaternion_from_euler(-ARC / 2, 0, yaw)
+    rot_down_to_start = math3d_lite.quaternion_from_euler(ARC / 2, 0, yaw)
+    rot_down_to_end = math3d_lite.quaternion_from_euler(-ARC / 2, 0, yaw)
     # rotates from the scoops identity orientation (bottom up, facing away from
     # lander) to its perpendicular mid-scooping orientation (bottom down, facing
     # to the lander's right)
-    rot_scoop_to_down = math3d.quaternion_from_euler(math.pi, 0, -math.pi / 2)
+    rot_scoop_to_down = math3d_lite.quaternion_from_euler(math.pi, 0,
+                                                          -math.pi / 2)
     if goal.parallel:
       # modify rotations so they describe the parallel downward arc trajectory
-      rot_to_parallel = math3d.quaternion_from_euler(0, 0, math.pi / 2)
-      rot_down_to_start = math3d.quaternion_multiply(rot_to_parallel,
-                                                     rot_down_to_start)
-      rot_down_to_end = math3d.quaternion_multiply(rot_to_parallel,
-                                                   rot_down_to_end)
+      rot_to_parallel = math3d_lite.quaternion_from_euler(0, 0, math.pi / 2)
+      rot_down_to_start = math3d_lite.quaternion_multiply(rot_to_parallel,
+                                                          rot_down_to_start)
+      rot_down_to_end = math3d_lite.quaternion_multiply(rot_to_parallel,
+                                                        rot_down_to_end)
     # compute the start and end POCs along the circle by rotating the downward
     # facing POC into position using the rot_down_to_* quaternions
-    poc1 = math3d.quaternion_rotate(rot_down_to_start, Vector3(0, 0, -RADIUS))
-    poc2 = math3d.quaternion_rotate(rot_down_to_end, Vector3(0, 0, -RADIUS))
+    poc1 = math3d_lite.quaternion_rotate(rot_down_to_start, Vec3(0, 0, -RADIUS))
+    poc2 = math3d_lite.quaternion_rotate(rot_down_to_end, Vec3(0, 0, -RADIUS))
     # convert POCs back to BASE frame
-    p1 = math3d.add(poc1, center)
-    p2 = math3d.add(poc2, center)
+    p1 = math3d_lite.add(poc1, center)
+    p2 = math3d_lite.add(poc2, center)
     # acquire BASE frame orientations by combining the rotation required to
     # rotate the scoop into its mid-scooping orientation at the downward POC
     # with the rot_down_to_* rotations
-    o1 = math3d.quaternion_multiply(rot_down_to_start, rot_scoop_to_down)
-    o2 = math3d.quaternion_multiply(rot_down_to_end, rot_scoop_to_down)
+    o1 = math3d_lite.quaternion_multiply(rot_down_to_start, rot_scoop_to_down)
+    o2 = math3d_lite.quaternion_multiply(rot_down_to_end, rot_scoop_to_down)
 
-    sequence = TrajectorySequence(
-      self._arm.robot, self._arm.move_group_scoop, 'l_scoop_tip')
+    sequence = self.create_sequence(self.move_group_scoop,
+                                    'l_scoop_tip', segments=4)
     sequence.plan_to_named_joint_positions(
       j_shou_yaw = yaw,
       j_shou_pitch = math.pi / 2,
@@ -383,9 +401,10 @@ class TaskScoopCircularServer(mixins.FrameMixin, mixins.ArmTrajectoryMixin,
       j_scoop_yaw = math.pi / 2 if goal.parallel else 0.0
     )
     # move arm to start of downward circular arc, with scoop facing down
-    sequence.plan_to_pose(Pose(p1, o1))
+    sequence.plan_to_pose(math3d_lite.pose_msg(p1, o1))
     # move through downward circular arc and end with scoop pitched up
-    sequence.plan_circular_path_to_pose(Pose(p2, o2), center)
+    sequence.plan_circular_path_to_pose(math3d_lite.pose_msg(p2, o2),
+                                        center.to_msg(Point))
     # retract out of the trench so the next arm movement can be made safely
     sequence.plan_to_z(dig_point.z + RETRACT_DISTANCE)
     return sequence.merge()
@@ -401,6 +420,8 @@ class TaskScoopLinearServer(mixins.FrameMixin, mixins.ArmTrajectoryMixin,
   result_type   = owl_msgs.msg.TaskScoopLinearResult
   goal_group_id = ow_lander.msg.ActionGoalStatus.TASK_GOAL
 
+  pipelined_execution = True
+
   def __init__(self, *args, **kwargs):
     super().__init__('l_scoop_tip', *args, **kwargs)
 
@@ -420,74 +441,83 @@ class TaskScoopLinearServer(mixins.FrameMixin, mixins.ArmTrajectoryMixin,
     #       circular trajectory and the start of the exit circular trajectory
     dig_point = self.transform_to_planning_frame(
       self.get_intended_position(goal.frame, goal.relative, goal.point)).point
+    ReachabilityMap().check(reachability.TASK_SCOOP_LINEAR,
+      Vec3(dig_point.x, dig_point.y, dig_point.z - goal.depth))
     yaw = _compute_workspace_shoulder_yaw(dig_point.x, dig_point.y)
-    trench_direction = Vector3(math.cos(yaw), math.sin(yaw), 0.0)
+    trench_direction = Vec3(math.cos(yaw), math.sin(yaw), 0.0)
     # orientations scoop will transition between
-    digging_orientation = math3d.quaternion_from_euler(math.pi, 0, yaw)
-    entry_orietation = math3d.quaternion_from_euler(math.pi, ENTRY_PITCH, yaw)
-    exit_orientation = math3d.quaternion_from_euler(math.pi, EXIT_PITCH, yaw)
+    digging_orientation = math3d_lite.quaternion_from_euler(math.pi, 0, yaw)
+    entry_orietation = math3d_lite.quaternion_from_euler(math.pi, ENTRY_PITCH,
+                                                         yaw)
+    exit_orientation = math3d_lite.quaternion_from_euler(math.pi, EXIT_PITCH,
+                                                         yaw)
     # point on the surface above where linear movement starts
-    linear_start_surface = math3d.add(dig_point,
-      math3d.scalar_multiply(-goal.length / 2, trench_direction))
+    linear_start_surface = math3d_lite.add(dig_point,
+      math3d_lite.scalar_multiply(-goal.length / 2, trench_direction))
     # point under the surface where linear movement starts
-    linear_start_bottom = math3d.add(linear_start_surface,
-                                     Vector3(0, 0, -goal.depth))
+    linear_start_bottom = math3d_lite.add(linear_start_surface,
+                                          Vec3(0, 0, -goal.depth))
     # point under the surface where linear movement ends
-    linear_end_bottom = math3d.add(linear_start_bottom,
-      math3d.scalar_multiply(goal.length, trench_direction))
+    linear_end_bottom = math3d_lite.add(linear_start_bottom,
+      math3d_lite.scalar_multiply(goal.length, trench_direction))
     # center of the circular entry arc
-    entry_circle_center = math3d.add(linear_start_bottom,
-                                     Vector3(0, 0, ENTRY_RADIUS))
+    entry_circle_center = math3d_lite.add(linear_start_bottom,
+                                          Vec3(0, 0, ENTRY_RADIUS))
     # center of the circular exit arc
-    exit_circle_center = math3d.add(linear_end_bottom,
-                                    Vector3(0, 0, EXIT_RADIUS))
+    exit_circle_center = math3d_lite.add(linear_end_bottom,
+                                         Vec3(0, 0, EXIT_RADIUS))
     # rotate around center by entry arc
-    entry_rot = math3d.quaternion_from_euler(0, ENTRY_PITCH, yaw)
-    linear_start_poc = math3d.subtract(linear_start_bottom, entry_circle_center)
-    entry_arc_start_poc = math3d.quaternion_rotate(entry_rot, linear_start_poc)
-    entry_arc_start = math3d.add(entry_arc_start_poc, entry_circle_center)
+    entry_rot = math3d_lite.quaternion_from_euler(0, ENTRY_PITCH, yaw)
+    linear_start_poc = math3d_lite.subtract(linear_start_bottom,
+                                            entry_circle_center)
+    entry_arc_start_poc = math3d_lite.quaternion_rotate(entry_rot,
+                                                        linear_start_poc)
+    entry_arc_start = math3d_lite.add(entry_arc_start_poc, entry_circle_center)
     # place approach directly above the start of the entry arc
     entry_approach = copy(entry_arc_start)
     entry_approach.z = dig_point.z + APPROACH_DISTANCE
     # rotate around center by exit arc
-    exit_rot = math3d.quaternion_from_euler(0, EXIT_PITCH, yaw)
-    linear_end_poc = math3d.subtract(linear_end_bottom, exit_circle_center)
-    exit_arc_end_poc = math3d.quaternion_rotate(exit_rot, linear_end_poc)
-    exit_arc_end = math3d.add(exit_arc_end_poc, exit_circle_center)
+    exit_rot = math3d_lite.quaternion_from_euler(0, EXIT_PITCH, yaw)
+    linear_end_poc = math3d_lite.subtract(linear_end_bottom, exit_circle_center)
+    exit_arc_end_poc = math3d_lite.quaternion_rotate(exit_rot, linear_end_poc)
+    exit_arc_end = math3d_lite.add(exit_arc_end_poc, exit_circle_center)
     # z-position scoop will retract to after exit
     exit_retract_z = dig_point.z + RETRACT_DISTANCE
 
-    sequence = TrajectorySequence(
-      self._arm.robot, self._arm.move_group_scoop, 'l_scoop_tip')
-    # place end-effector above trench position
-    sequence.plan_to_named_joint_positions(
-      j_shou_yaw = yaw,
-      j_shou_pitch = math.pi / 2,
-      j_prox_pitch = -math.pi / 2,
-      j_dist_pitch = 0.0,
-      j_hand_yaw = 0.0,
-      j_scoop_yaw = math.pi / 2
-    )
-    # approach terrain while rotating into entry orientation
-    sequence.plan_to_pose(Pose(entry_approach, entry_orietation))
-    # place scoop tip at the start of the circular entry arc while maintaining
-    # entry orientation
-    sequence.plan_to_position(entry_arc_start)
-    # rotate scoop tip into terrain
-    sequence.plan_circular_path_to_pose(
-      Pose(linear_start_bottom, digging_orientation),
-      entry_circle_center
-    )
-    # move the scoop along a linear path to the end of the trench
-    sequence.plan_linear_path_to_pose(
-      Pose(linear_end_bottom, digging_orientation))
-    # pitch scoop upward and out of the exit point
-    sequence.plan_circular_path_to_pose(Pose(exit_arc_end, exit_orientation),
-                                        exit_circle_center)
-    # retract up from terrain while maintaining exit orientation
-    # NOTE: only required for especially deep digs
-    if sequence.get_final_pose().position.z < exit_retract_z:
-      sequence.plan_to_z(exit_retract_z)
+    sequence = self.create_sequence(self.move_group_scoop,
+                                    'l_scoop_tip', segments=7)
+    with sequence.parallel_planning():
+      # place end-effector above trench position
+      sequence.plan_to_named_joint_positions(
+        j_shou_yaw = yaw,
+        j_shou_pitch = math.pi / 2,
+        j_prox_pitch = -math.pi / 2,
+        j_dist_pitch = 0.0,
+        j_hand_yaw = 0.0,
+        j_scoop_yaw = math.pi / 2
+      )
+      # approach terrain while rotating into entry orientation
+      sequence.plan_to_pose(
+        math3d_lite.pose_msg(entry_approach, entry_orietation))
+      # place scoop tip at the start of the circular entry arc while maintaining
+      # entry orientation
+      sequence.plan_to_position(entry_arc_start.to_msg(Point))
+      # rotate scoop tip into terrain
+      sequence.plan_circular_path_to_pose(
+        math3d_lite.pose_msg(linear_start_bottom, digging_orientation),
+        entry_circle_center.to_msg(Point)
+      )
+      # move the scoop along a linear path to the end of the trench
+      sequence.plan_linear_path_to_pose(
+        math3d_lite.pose_msg(linear_end_bottom, digging_orientation))
+      # pitch scoop upward and out of the exit point
+      sequence.plan_circular_path_to_pose(
+        math3d_lite.pose_msg(exit_arc_end, exit_orientation),
+        exit_circle_center.to_msg(Point))
+      # retract up from terrain while maintaining exit orientation
+      # NOTE: only required for especially deep digs
+      if sequence.get_final_pose().position.z < exit_retract_z:
+        sequence.plan_to_z(exit_retract_z)
     return sequence.merge()
 
 
@@ -501,16 +531,21 @@ class TaskDiscardSampleServer(mixins.FrameMixin, mixins.ArmTrajectoryMixin,
   result_type   = owl_msgs.msg.TaskDiscardSampleResult
   goal_group_id = ow_lander.msg.ActionGoalStatus.TASK_GOAL
 
+  pipelined_execution = True
+
   def __init__(self, *args, **kwargs):
     super().__init__('l_scoop_tip', *args, **kwargs)
 
   def plan_trajectory(self, goal):
     discard_surface_pos = self.transform_to_planning_frame(
       self.get_intended_position(goal.frame, goal.relative, goal.point)).point
-    self._arm.move_group_scoop.set_planner_id("RRTstar")
+    ReachabilityMap().check(reachability.TASK_DISCARD,
+      Vec3(discard_surface_pos.x, discard_surface_pos.y,
+           discard_surface_pos.z + goal.height))
+    self.move_group_scoop.set_planner_id("RRTstar")
     try:
-      sequence = TrajectorySequence(
-        self._arm.robot, self._arm.move_group_scoop, 'l_scoop')
+      sequence = self.create_sequence(self.move_group_scoop, 'l_scoop',
+                                      segments=2)
       # move scoop to a pose above the discard point that holds the sample
       D2R = math.pi / 180
       held_euler = (
@@ -554,7 +589,7 @@ class TaskDiscardSampleServer(mixins.FrameMixin, mixins.ArmTrajectoryMixin,
       # TrajectorySequence calls may throw ArmPlanningError, which is handled
       # by ArmTrajectoryMixin, but they must be caught and passed on here so the
       # planner ID may be set back to RRTConnect before this method ends
-      self._arm.move_group_scoop.set_planner_id("RRTConnect")
+      self.move_group_scoop.set_planner_id("RRTConnect")
 
 
 class TaskDeliverSampleServer(mixins.ArmTrajectoryMixin, ActionServerBase):
@@ -566,11 +601,13 @@ class TaskDeliverSampleServer(mixins.ArmTrajectoryMixin, ActionServerBase):
   result_type   = owl_msgs.msg.TaskDeliverSampleResult
   goal_group_id = ow_lander.msg.ActionGoalStatus.TASK_GOAL
 
+  pipelined_execution = True
+
   def plan_trajectory(self, _goal):
-    self._arm.move_group_scoop.set_planner_id("RRTstar")
+    self.move_group_scoop.set_planner_id("RRTstar")
     try:
-      sequence = TrajectorySequence(
-        self._arm.robot, self._arm.move_group_scoop, 'l_scoop')
+      sequence = self.create_sequence(self.move_group_scoop, 'l_scoop',
+                                      segments=3)
       sequence.plan_to_target("arm_deliver_staging_1")
       sequence.plan_to_target("arm_deliver_staging_2")
       sequence.plan_to_target("arm_deliver_final")
@@ -581,7 +618,7 @@ class TaskDeliverSampleServer(mixins.ArmTrajectoryMixin, ActionServerBase):
       # TrajectorySequence calls may throw ArmPlanningError, which is handled
       # by ArmTrajectoryMixin, but they must be caught and passed on here so the
       # planner ID may be set back to RRTConnect before this method ends
-      self._arm.move_group_scoop.set_planner_id("RRTConnect")
+      self.move_group_scoop.set_planner_id("RRTConnect")
 
 class ArmMoveCartesianServer(mixins.FrameMixin, mixins.ArmActionMixin,
                              ActionServerBase):
@@ -614,7 +651,8 @@ class ArmMoveCartesianServer(mixins.FrameMixin, mixins.ArmActionMixin,
         intended_pose_stamped.header.frame_id)
       trajectory = self.plan_end_effector_to_pose(intended_pose_stamped)
       self._arm.execute_arm_trajectory(trajectory,
-        action_feedback_cb=self.publish_feedback_cb)
+        action_feedback_cb=self.publish_feedback_cb,
+        feedback_rate=self._feedback_rate)
     except ArmExecutionError as err:
       self._arm.checkin_arm(self.name)
       self._set_aborted(str(err),
@@ -661,12 +699,13 @@ class ArmMoveCartesianGuardedServer(mixins.FrameMixin, mixins.ArmActionMixin,
     # monitor F/T sensor and define a callback to check its status
     monitor = FTSensorThresholdMonitor(force_threshold=goal.force_threshold,
                                        torque_threshold=goal.torque_threshold)
-    def guarded_cb():
+    def feedback_cb():
       self._publish_feedback(
         pose=self._arm_tip_monitor.get_link_pose(),
         force=monitor.get_force(),
         torque=monitor.get_torque()
       )
+    def guarded_cb():
       if monitor.threshold_breached():
         self._arm.stop_trajectory_silently()
     # perform action
@@ -675,7 +714,8 @@ class ArmMoveCartesianGuardedServer(mixins.FrameMixin, mixins.ArmActionMixin,
       plan = self.plan_end_effector_to_pose(intended_pose_stamped)
       comparison_transform = self.get_comparison_transform(
         intended_pose_stamped.header.frame_id)
-      self._arm.execute_arm_trajectory(plan, action_feedback_cb=guarded_cb)
+      self._arm.execute_arm_trajectory(plan, action_feedback_cb=feedback_cb,
+        feedback_rate=self._feedback_rate, guard_cb=guarded_cb)
     except ArmExecutionError as err:
       rospy.loginfo("ArmExecutionError occur")
       self._arm.checkin_arm(self.name)
@@ -783,7 +823,8 @@ class ArmFindSurfaceServer(mixins.FrameMixin, mixins.ArmActionMixin,
       comparison_transform = self.get_comparison_transform(
         intended_start_pose_stamped.header.frame_id)
       self._arm.execute_arm_trajectory(trajectory_setup,
-        action_feedback_cb=self.publish_feedback_cb)
+        action_feedback_cb=self.publish_feedback_cb,
+        feedback_rate=self._feedback_rate)
     except ArmExecutionError as err:
       self._arm.checkin_arm(self.name)
       self._set_aborted(str(err) + " - Setup trajectory failed",
@@ -813,9 +854,10 @@ class ArmFindSurfaceServer(mixins.FrameMixin, mixins.ArmActionMixin,
     # setup F/T monitor and its callback
     monitor = FTSensorThresholdMonitor(force_threshold=goal.force_threshold,
                                        torque_threshold=goal.torque_threshold)
-    def guarded_cb():
+    def feedback_cb():
       self.publish_feedback_cb(
         compute_distance(), monitor.get_force(), monitor.get_torque())
+    def guarded_cb():
       if monitor.threshold_breached():
         self._arm.stop_trajectory_silently()
     # move towards surface until F/T is breached or overdrive distance reached
@@ -826,7 +868,8 @@ class ArmFindSurfaceServer(mixins.FrameMixin, mixins.ArmActionMixin,
       comparison_transform = self.get_comparison_transform(
         intended_start_pose_stamped.header.frame_id)
       self._arm.execute_arm_trajectory(trajectory_approach,
-        action_feedback_cb=guarded_cb)
+        action_feedback_cb=feedback_cb, feedback_rate=self._feedback_rate,
+        guard_cb=guarded_cb)
     except ArmExecutionError as err:
       self._arm.checkin_arm(self.name)
       self._set_aborted(str(err) + " - Surface approach trajectory failed",
@@ -917,21 +960,24 @@ class ArmMoveJointsGuardedServer(ArmMoveJointsServer):
     self._arm_faults.reset_arm_faults_flags()
     monitor = FTSensorThresholdMonitor(force_threshold=goal.force_threshold,
                                        torque_threshold=goal.torque_threshold)
-    def guarded_cb():
+    def feedback_cb():
       self._publish_feedback(
         angles=self._arm_joints_monitor.get_joint_positions(),
         force=monitor.get_force(),
         torque=monitor.get_torque()
       )
+    def guarded_cb():
       if monitor.threshold_breached():
         self._arm.stop_trajectory_silently()
     try:
       self._arm.checkout_arm(self.name)
       new_positions = self.modify_joint_positions(goal)
-      sequence = TrajectorySequence(self._arm.robot, self._arm.move_group_scoop)
+      sequence = TrajectorySequence(self._arm.robot, self._arm.move_group_scoop,
+                                    action=self.name)
       sequence.plan_to_joint_positions(new_positions)
       self._arm.execute_arm_trajectory(sequence.merge(),
-        action_feedback_cb=guarded_cb)
+        action_feedback_cb=feedback_cb, feedback_rate=self._feedback_rate,
+        guard_cb=guarded_cb)
     except ArmExecutionError as err:
       self._arm.checkin_arm(self.name)
       self._set_aborted(str(err),
@@ -7,6 +7,12 @@ with the OceanWATERS fault system to enable arm fault awareness and enables the
 ability to stop the arm mid-trajectory.
 """
 
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+
 import rospy
 import actionlib
 import moveit_commander
@@ -17,15 +23,63 @@ from control_msgs.msg import (FollowJointTrajectoryAction,
 from actionlib_msgs.msg import GoalStatus
 from controller_manager_msgs.srv import SwitchController
 
-from ow_lander.common import Singleton
+import ow_lander.msg
+from ow_lander.common import Singleton, create_header
 from ow_lander.exception import ArmExecutionError
 from ow_lander.frame_transformer import FrameTransformer
+from ow_lander.execution_monitor import ExecutionMonitor
+from ow_lander.trajectory_pipeline import SegmentPipeline
+
+class _PendingCheckout:
+  """An action server waiting in the queue to check out the arm"""
+
+  def __init__(self, owner, priority, sequence):
+    self.owner = owner
+    self.priority = priority
+    self.sequence = sequence
+    self.enqueued = time.time()
+    # reason the checkout was cancelled, if it was
+    self.cancelled = None
+
+  def __lt__(self, other):
+    # higher priorities first, then first come, first served
+    return (-self.priority, self.sequence) < (-other.priority, other.sequence)
+
 
 class OWArmInterface(metaclass = Singleton):
   """Implements an ownership layer and stop method over trajectory execution.
-  Ownership is claimed/relinquished via the check out/in methods.
+  Ownership is claimed/relinquished via the check out/in methods. Action
+  servers that check out the arm while it is in use wait in a priority queue
+  and are granted the arm in order of priority, then of arrival. Arbitration
+  is configured by the following parameters in the private namespace of the
+  node:
+    arm_arbitration/queue_timeout    -- seconds a checkout waits for the arm
+                                        before it is rejected. 0 rejects it
+                                        immediately. default: 60
+    arm_arbitration/default_priority -- priority of action servers without
+                                        their own. default: 0
+    arm_arbitration/priorities       -- dictionary of action server name to
+                                        priority. default: {}
+    arm_arbitration/preempt_lower_priority -- if True, a checkout stops the
+                                        owner of the arm if it has a lower
+                                        priority. default: False
+    arm_arbitration/stop_clears_queue -- if True, stop_arm also rejects all
+                                        waiting checkouts, so a stop is not
+                                        followed by queued motions.
+                                        default: True
+  The state of the queue is published on a latched topic after every change.
+  Action servers that execute with a controller other than the arm_controller
+  register it and switch back to the arm_controller in the background when
+  they are done, unless the next action server waiting for the arm uses the
+  same controller. Before a trajectory is executed, the controller of the
+  owner is switched to if it is not active. Every switch is published on the
+  controller switch topic with its latency.
   """
 
+  QUEUE_STATUS_TOPIC = '/arm_queue_status'
+  CONTROLLER_SWITCH_TOPIC = '/controller_switches'
+  DEFAULT_CONTROLLER = 'arm_controller'
+
   """A string that identifies what facility is using the arm. If None, arm is
   not in use.
   """
@@ -36,25 +90,187 @@ class OWArmInterface(metaclass = Singleton):
   """
   _stopped = False
 
+  """Why the arm was stopped, prefixed to the error raised by the stopped
+  trajectory execution.
+  """
+  _stop_reason = "Stop was called"
+
+  """Checkouts waiting for the arm as a heap of _PendingCheckout, the priority
+  of the owner, and the arbitration configuration set on initialization
+  """
+  _queue = []
+  _sequence = itertools.count()
+  _owner_priority = 0
+  _queue_timeout = 60.0
+  _default_priority = 0
+  _priorities = dict()
+  _preempt_lower_priority = False
+  _stop_clears_queue = True
+
+  """Controllers action servers execute with by action server name. Action
+  servers not listed execute with DEFAULT_CONTROLLER.
+  """
+  _controllers = dict()
+
+  """Wait-time metrics of the queue"""
+  _wait_times = deque(maxlen=100)
+  _granted = 0
+  _rejected = 0
+  _queue_pub = None
+
+  """Notified when the arm is stopped or the execution of a trajectory ends,
+  so the thread awaiting the execution wakes immediately.
+  """
+  _condition = threading.Condition()
+
   @classmethod
   def checkout_arm(cls, owner):
+    """Claim the arm for owner, waiting in the queue while it is in use. Once
+    granted, it waits for the planning threads of cancelled pipelines that
+    still plan with the shared move groups.
+    owner -- name of the action server
+    raises ArmExecutionError if the checkout timed out or was cancelled
+    """
+    priority = cls._priorities.get(owner, cls._default_priority)
+    with cls._condition:
+      pending = _PendingCheckout(owner, priority, next(cls._sequence))
+      heapq.heappush(cls._queue, pending)
+      if cls._in_use_by is not None and cls._queue_timeout > 0:
+        rospy.loginfo(f"{owner} waits for the arm, which is checked out by "
+                      f"the {cls._in_use_by} action server, at position "
+                      f"{sorted(cls._queue).index(pending) + 1} of the queue")
+      if cls._in_use_by is not None and cls._preempt_lower_priority \
+          and priority > cls._owner_priority:
+        cls._stopped = True
+        cls._stop_reason = f"Preempted by the {owner} action server"
+      cls._publish_queue_status()
+      cls._condition.notify_all()
+      granted = cls._condition.wait_for(
+        lambda: pending.cancelled is not None or rospy.is_shutdown()
+                or (cls._in_use_by is None and cls._queue[0] is pending),
+        cls._queue_timeout)
+      cls._queue.remove(pending)
+      heapq.heapify(cls._queue)
+      if not granted or pending.cancelled is not None or rospy.is_shutdown():
+        cls._rejected += 1
+        cls._publish_queue_status()
+        # the next checkout in the queue may now be at its head
+        cls._condition.notify_all()
+        raise ArmExecutionError(cls._rejection_reason(pending))
+      wait_time = time.time() - pending.enqueued
+      cls._in_use_by = owner
+      cls._owner_priority = priority
+      cls._wait_times.append(wait_time)
+      cls._granted += 1
+      cls._publish_queue_status()
+    if wait_time > 0.01:
+      rospy.loginfo(f"{owner} checked out the arm after waiting "
+                    f"{wait_time:.2f} seconds")
+    SegmentPipeline.wait_for_cancelled()
+
+  @classmethod
+  def _rejection_reason(cls, pending):
+    if pending.cancelled is not None:
+      return pending.cancelled
+    if rospy.is_shutdown():
+      return "Node shut down while waiting for the arm"
+    if cls._queue_timeout <= 0:
+      return f"Arm is already checked out by the {cls._in_use_by} action " \
+             "server"
+    reason = f"Waited {cls._queue_timeout} seconds for the arm without it " \
+             "becoming available"
     if cls._in_use_by is not None:
-      raise ArmExecutionError(
-        f"Arm is already checked out by the {cls._in_use_by} action server")
-    cls._in_use_by = owner
+      reason += f"; it is checked out by the {cls._in_use_by} action server"
+    return reason
+
+  @classmethod
+  def cancel_checkout(cls, owner, reason):
+    """Reject the checkout of owner if it is waiting in the queue
+    reason -- message of the error the checkout raises
+    """
+    with cls._condition:
+      for pending in cls._queue:
+        if pending.owner == owner:
+          pending.cancelled = reason
+      cls._condition.notify_all()
 
   @classmethod
   def checkin_arm(cls, owner):
-    if cls._in_use_by != owner:
-      return # owner has not checked out arm, do nothing
-    cls._in_use_by = None
-    cls._stopped = False
+    with cls._condition:
+      if cls._in_use_by != owner:
+        return # owner has not checked out arm, do nothing
+      cls._in_use_by = None
+      cls._stopped = False
+      cls._stop_reason = "Stop was called"
+      ExecutionMonitor().finish_action(owner)
+      cls._publish_queue_status()
+      cls._condition.notify_all()
+
+  @classmethod
+  def in_use_by(cls):
+    """returns the owner that has checked out the arm or None"""
+    return cls._in_use_by
 
   @classmethod
   def stop_arm(cls):
-    if cls._in_use_by:
-      cls._stopped = True
-    return cls._stopped
+    """Stops the owner of the arm and, if stop_clears_queue is set, rejects
+    all waiting checkouts
+    returns True if anything was stopped or rejected
+    """
+    with cls._condition:
+      cleared = False
+      if cls._stop_clears_queue:
+        for pending in cls._queue:
+          if pending.cancelled is None:
+            pending.cancelled = "Stop was called while waiting for the arm"
+            cleared = True
+      if cls._in_use_by:
+        cls._stopped = True
+        cls._stop_reason = "Stop was called"
+      cls._condition.notify_all()
+      return cls._stopped or cleared
+
+  @classmethod
+  def get_queue_status(cls):
+    """returns an ow_lander/ArmQueueStatus message of the current state of the
+    queue
+    """
+    with cls._condition:
+      waits = list(cls._wait_times)
+      queued = [p.owner for p in sorted(cls._queue) if p.cancelled is None]
+      return ow_lander.msg.ArmQueueStatus(
+        header=create_header('', rospy.Time.now()),
+        owner=cls._in_use_by or '',
+        owner_priority=cls._owner_priority if cls._in_use_by else 0,
+        queued=queued,
+        queue_depth=len(queued),
+        last_wait_time=waits[-1] if waits else 0.0,
+        mean_wait_time=sum(waits) / len(waits) if waits else 0.0,
+        max_wait_time=max(waits, default=0.0),
+        granted=cls._granted,
+        rejected=cls._rejected
+      )
+
+  @classmethod
+  def register_controller(cls, owner, controller):
+    """Set the controller the trajectories of owner are executed with"""
+    cls._controllers[owner] = controller
+
+  @classmethod
+  def get_next_controller(cls):
+    """returns the controller of the action server that will be granted the
+    arm next, or None if no action server is waiting for the arm
+    """
+    with cls._condition:
+      waiting = [p for p in sorted(cls._queue) if p.cancelled is None]
+      if not waiting:
+        return None
+      return cls._controllers.get(waiting[0].owner, cls.DEFAULT_CONTROLLER)
+
+  @classmethod
+  def _publish_queue_status(cls):
+    if cls._queue_pub is not None:
+      cls._queue_pub.publish(cls.get_queue_status())
 
   @classmethod
   def _assert_arm_is_checked_out(cls):
@@ -63,6 +279,34 @@ class OWArmInterface(metaclass = Singleton):
                          "attempting to execute a trajectory.")
 
   def __init__(self):
+    OWArmInterface._queue_timeout = rospy.get_param(
+      '~arm_arbitration/queue_timeout', 60.0)
+    OWArmInterface._default_priority = rospy.get_param(
+      '~arm_arbitration/default_priority', 0)
+    OWArmInterface._priorities = rospy.get_param(
+      '~arm_arbitration/priorities', dict())
+    OWArmInterface._preempt_lower_priority = rospy.get_param(
+      '~arm_arbitration/preempt_lower_priority', False)
+    OWArmInterface._stop_clears_queue = rospy.get_param(
+      '~arm_arbitration/stop_clears_queue', True)
+    OWArmInterface._queue_pub = rospy.Publisher(self.QUEUE_STATUS_TOPIC,
+      ow_lander.msg.ArmQueueStatus, queue_size=10, latch=True)
+    self._switch_pub = rospy.Publisher(self.CONTROLLER_SWITCH_TOPIC,
+      ow_lander.msg.ControllerSwitch, queue_size=10)
+    # thread of the controller switch that runs in the background, if any
+    self._pending_switch = None
+    # rate at which action feedback is published during trajectory execution
+    self._feedback_rate = rospy.get_param('~execution_feedback_rate', 100.0)
+    # rate at which guards check whether to stop trajectory execution
+    self._guard_rate = rospy.get_param('~execution_guard_rate', 100.0)
+    # identifies the trajectory execution in progress, so results of ones
+    # that were ceased before are ignored
+    self._execution_id = 0
+    self._execution_done = False
+    # wake the thread awaiting an execution on shutdown
+    rospy.on_shutdown(self._notify)
+    # samples the tracking error of executed trajectories
+    self._monitor = ExecutionMonitor()
     # initialize/reference trajectory execution singleton
     self.__executor = ArmTrajectoryExecutor()
     # initialize/reference fault monitor
@@ -72,41 +316,137 @@ class OWArmInterface(metaclass = Singleton):
     self.move_group_scoop = moveit_commander.MoveGroupCommander('arm')
     self.move_group_grinder = moveit_commander.MoveGroupCommander('grinder')
 
+  def _notify(self):
+    with OWArmInterface._condition:
+      OWArmInterface._condition.notify_all()
+
   def _stop_arm_if_fault(self, _feedback=None):
     """Ticks the stop flag when arm should stop due to a fault."""
     if not self.__faults.should_arm_continue_in_fault() and \
         self.__faults.is_arm_faulted():
-      OWArmInterface._stopped = True
+      with OWArmInterface._condition:
+        OWArmInterface._stopped = True
+        OWArmInterface._condition.notify_all()
+
+  def _execution_feedback_cb(self, feedback):
+    self._monitor.sample(feedback)
+    self._stop_arm_if_fault()
+
+  def _create_done_cb(self, execution_id):
+    """returns a done_cb for the follow_joint_trajectory action that marks the
+    execution with execution_id as done
+    """
+    def done_cb(_state, _result):
+      with OWArmInterface._condition:
+        if self._execution_id == execution_id:
+          self._execution_done = True
+          OWArmInterface._condition.notify_all()
+    return done_cb
+
+  def _call_periodically(self, callback, rate, finished, description):
+    """Calls callback at rate until finished is set"""
+    period = 1.0 / rate
+    while not finished.wait(period):
+      try:
+        callback()
+      except Exception as err:
+        rospy.logerr(f"{description} callback failed: {err}")
+
+  def _start_periodic_call(self, callback, rate, finished, description):
+    """returns a started daemon thread that calls callback at rate until
+    finished is set
+    """
+    thread = threading.Thread(target=self._call_periodically,
+                              args=(callback, rate, finished, description),
+                              daemon=True)
+    thread.start()
+    return thread
 
   def stop_trajectory_silently(self):
     """Will bypass the stop flag and cease trajectory execution directly. This
     results in no exception being thrown."""
     self.__executor.cease_execution()
 
-  def switch_to_grinder_controller(self):
+  def _switch_controller(self, controller, prewarmed=False):
+    """Switch to controller if it is not active and publish the switch
+    returns False if the switch failed
+    """
+    active = self.__executor.get_active_controller()
+    if active == controller:
+      return True
+    start = time.time()
+    success = self.__executor.switch_controllers(controller, active)
+    latency = time.time() - start
+    self._switch_pub.publish(ow_lander.msg.ControllerSwitch(
+      header=create_header('', rospy.Time.now()),
+      owner=OWArmInterface._in_use_by or '',
+      switch_to=controller,
+      switch_from=active,
+      success=success,
+      prewarmed=prewarmed,
+      latency=latency
+    ))
+    rospy.logdebug(f"Switching from {active} to {controller} took "
+                   f"{latency:.3f} seconds")
+    return success
+
+  def _await_controller_switch(self):
+    """Wait for the controller switch started by prepare_controller, if any. A
+    failed switch is attempted again by the next switch to its controller.
+    """
+    pending, self._pending_switch = self._pending_switch, None
+    if pending is not None:
+      pending.join()
+
+  def prepare_controller(self, controller):
+    """Begin switching to controller in the background, so the switch runs in
+    parallel with planning. Trajectory execution waits for the switch to
+    finish.
+    """
     OWArmInterface._assert_arm_is_checked_out()
-    if self.__executor.get_active_controller() == 'grinder_controller':
+    self._await_controller_switch()
+    if self.__executor.get_active_controller() == controller:
       return
-    if not self.__executor.switch_controllers('grinder_controller',
-                                             'arm_controller'):
+    self._pending_switch = threading.Thread(target=self._switch_controller,
+                                            args=(controller, True),
+                                            daemon=True)
+    self._pending_switch.start()
+
+  def switch_to_grinder_controller(self):
+    OWArmInterface._assert_arm_is_checked_out()
+    self._await_controller_switch()
+    if not self._switch_controller('grinder_controller'):
       raise ArmExecutionError("Failed to switch to grinder_controller")
 
   def switch_to_arm_controller(self):
     OWArmInterface._assert_arm_is_checked_out()
-    if self.__executor.get_active_controller() == 'arm_controller':
-      return
-    if not self.__executor.switch_controllers('arm_controller',
-                                             'grinder_controller'):
+    self._await_controller_switch()
+    if not self._switch_controller('arm_controller'):
       raise ArmExecutionError("Failed to switch to arm_controller")
 
-  def execute_arm_trajectory(self, plan, action_feedback_cb=None):
-    """Executes the provided plan and awaits its completions
+  def execute_arm_trajectory(self, plan, action_feedback_cb=None,
+                             feedback_rate=None, guard_cb=None):
+    """Executes the provided plan and awaits its completions. The waiting
+    thread sleeps until execution ends, the arm is stopped, or a fault stops
+    it, and then wakes immediately.
     plan -- An instance of moveit_msgs.msg.RobotTrajectory that describes the
             arm trajectory to be executed. Can be None, in which case planning
             is assumed to have failed.
-    action_feedback_cb -- A function called at 100 Hz during execution of a
-                          trajectory. Exists to publish the action's feedback
-                          message. Handles no arguments.
+    action_feedback_cb -- A function called periodically on a separate thread
+                          during execution of a trajectory. Exists to publish
+                          the action's feedback message. Handles no arguments.
+    feedback_rate      -- Rate in hertz action_feedback_cb is called at. If not
+                          provided, the execution_feedback_rate parameter in
+                          the private namespace of the node is used.
+                          default: 100
+    guard_cb           -- A function called periodically on its own thread
+                          during execution of a trajectory, which stops the
+                          trajectory when its condition is met, e.g. by calling
+                          stop_trajectory_silently. It is called at the
+                          execution_guard_rate parameter in the private
+                          namespace of the node, independently of
+                          action_feedback_cb, so slow feedback cannot delay a
+                          stop. Handles no arguments. default: 100
     """
 
     OWArmInterface._assert_arm_is_checked_out()
@@ -120,21 +460,51 @@ class OWArmInterface(metaclass = Singleton):
     self._stop_arm_if_fault()
 
     if OWArmInterface._stopped:
-      raise ArmExecutionError("Stop was called; trajectory will not be executed")
-
-    self.__executor.execute(plan.joint_trajectory,
-      feedback_cb=self._stop_arm_if_fault)
-
-    # publish feedback while waiting for trajectory execution completion
-    FEEDBACK_RATE = 100 # hertz
-    rate = rospy.Rate(FEEDBACK_RATE)
-    while self.__executor.is_active():
-      if OWArmInterface._stopped:
-        self.__executor.cease_execution()
-        raise ArmExecutionError("Stop was called; trajectory execution ceased")
-      if action_feedback_cb is not None:
-        action_feedback_cb()
-      rate.sleep()
+      raise ArmExecutionError(
+        f"{OWArmInterface._stop_reason}; trajectory will not be executed")
+
+    # a controller left active by the previous owner is switched from here
+    controller = OWArmInterface._controllers.get(OWArmInterface._in_use_by,
+                                                 self.DEFAULT_CONTROLLER)
+    self._await_controller_switch()
+    if not self._switch_controller(controller):
+      raise ArmExecutionError(f"Failed to switch to {controller}")
+
+    with OWArmInterface._condition:
+      self._execution_id += 1
+      self._execution_done = False
+      done_cb = self._create_done_cb(self._execution_id)
+    self._monitor.begin_execution(OWArmInterface._in_use_by,
+                                  plan.joint_trajectory)
+    started = self.__executor.execute(plan.joint_trajectory, done_cb=done_cb,
+      feedback_cb=self._execution_feedback_cb)
+
+    # publish feedback and check guards on their own schedules while waiting
+    # for trajectory execution completion
+    finished = threading.Event()
+    threads = []
+    if guard_cb is not None:
+      threads.append(self._start_periodic_call(guard_cb, self._guard_rate,
+                                               finished, "Guard"))
+    if action_feedback_cb is not None:
+      threads.append(self._start_periodic_call(action_feedback_cb,
+        feedback_rate or self._feedback_rate, finished, "Action feedback"))
+    try:
+      with OWArmInterface._condition:
+        # a goal that never became active is not awaited
+        OWArmInterface._condition.wait_for(
+          lambda: not started or self._execution_done
+                  or OWArmInterface._stopped or rospy.is_shutdown())
+        stopped = OWArmInterface._stopped and not self._execution_done
+    finally:
+      self._monitor.end_execution()
+      finished.set()
+      for thread in threads:
+        thread.join()
+    if stopped:
+      self.__executor.cease_execution()
+      raise ArmExecutionError(
+        f"{OWArmInterface._stop_reason}; trajectory execution ceased")
 
     result = self.__executor.result()
     # NOTE: a None result is indicative that trajectory execution was ceased
@@ -284,21 +654,30 @@ class ArmTrajectoryExecutor(metaclass=Singleton):
         """Execute the provided trajectory asynchronously.
         trajectory -- An instance of moveit_msgs.msg.RobotTrajectory that
                       describes the desired trajectory.
+        returns False if the goal did not become active or done in time
         """
         goal = FollowJointTrajectoryGoal(trajectory=trajectory)
+        # set when the goal becomes active, or when it is done without ever
+        # becoming active
+        started = threading.Event()
+        def on_active():
+            started.set()
+            if active_cb is not None:
+                active_cb()
+        def on_done(state, result):
+            started.set()
+            if done_cb is not None:
+                done_cb(state, result)
         self._get_active_follow_client().send_goal(
-            goal, done_cb, active_cb, feedback_cb)
+            goal, on_done, on_active, feedback_cb)
         # block until client is active, which should only take some milliseconds
-        CHECK_RATE = 500 # hertz
         MAX_WAIT = 1.0 # seconds
-        rate = rospy.Rate(CHECK_RATE)
-        for i in range(int(CHECK_RATE * MAX_WAIT)):
-          if self.is_active():
-            return
-          rate.sleep()
+        if started.wait(MAX_WAIT):
+            return True
         rospy.logwarn(f"The {self._active_controller}/follow_joint_trajectory "
                       f"action failed to become active within {MAX_WAIT} "
                       "seconds of sending a goal.")
+        return False
 
     def cease_execution(self):
         """Stops the execution of the last trajectory submitted for execution"""
@@ -0,0 +1,139 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a joint trajectory that stores each field of its points as a column
+in a NumPy array, so operations over all points of a trajectory are array
+operations instead of loops over JointTrajectoryPoint messages.
+"""
+
+import numpy as np
+
+import rospy
+from moveit_msgs.msg import RobotTrajectory
+from trajectory_msgs.msg import JointTrajectory, JointTrajectoryPoint
+
+class ColumnarTrajectory:
+  """A joint trajectory of N points for J joints
+  joint_names   -- list of J joint names
+  times         -- array of shape (N,) of seconds from the start
+  positions     -- array of shape (N, J)
+  velocities    -- array of shape (N, J) or None if the points have none
+  accelerations -- array of shape (N, J) or None if the points have none
+  effort        -- array of shape (N, J) or None if the points have none
+  """
+
+  def __init__(self, joint_names, times, positions, velocities=None,
+               accelerations=None, effort=None):
+    self.joint_names = list(joint_names)
+    self.times = np.asarray(times, dtype=float)
+    self.positions = np.asarray(positions, dtype=float) \
+                       .reshape(len(self.times), len(self.joint_names))
+    self.velocities = self._column(velocities)
+    self.accelerations = self._column(accelerations)
+    self.effort = self._column(effort)
+
+  def _column(self, values):
+    if values is None:
+      return None
+    return np.asarray(values, dtype=float).reshape(self.positions.shape)
+
+  @classmethod
+  def from_msg(cls, trajectory):
+    """Create from a message
+    trajectory -- moveit_msgs RobotTrajectory or trajectory_msgs JointTrajectory
+    """
+    if isinstance(trajectory, RobotTrajectory):
+      trajectory = trajectory.joint_trajectory
+    points = trajectory.points
+    def column(field):
+      # a field is only kept if every point has a value for every joint
+      rows = [getattr(p, field) for p in points]
+      if not rows or any(len(r) != len(trajectory.joint_names) for r in rows):
+        return None
+      return rows
+    times = [p.time_from_start.to_sec() for p in points]
+    return cls(trajectory.joint_names, times,
+               [p.positions for p in points], column('velocities'),
+               column('accelerations'), column('effort'))
+
+  def to_msg(self, frame_id=''):
+    """Build the message for execution. This is the only operation that creates
+    a message per point.
+    frame_id -- frame_id of the header of the joint trajectory
+    returns a moveit_msgs RobotTrajectory
+    """
+    secs = np.floor(self.times)
+    nsecs = np.round((self.times - secs) * 1e9)
+    # rounding may carry over to a full second
+    carry = nsecs >= 1e9
+    secs[carry] += 1
+    nsecs[carry] -= 1e9
+    empty = [[]] * len(self)
+    def rows(column):
+      return empty if column is None else column.tolist()
+    joint_trajectory = JointTrajectory()
+    joint_trajectory.header.frame_id = frame_id
+    joint_trajectory.joint_names = list(self.joint_names)
+    joint_trajectory.points = [
+      JointTrajectoryPoint(p, v, a, e, rospy.Duration(s, n))
+      for p, v, a, e, s, n in zip(self.positions.tolist(),
+                                  rows(self.velocities),
+                                  rows(self.accelerations),
+                                  rows(self.effort),
+                                  secs.astype(int).tolist(),
+                                  nsecs.astype(int).tolist())
+    ]
+    return RobotTrajectory(joint_trajectory=joint_trajectory)
+
+  def __len__(self):
+    return len(self.times)
+
+  def __getitem__(self, index):
+    """Select points by slice, index array, or boolean mask. Times are kept
+    as they are.
+    returns a ColumnarTrajectory
+    """
+    if isinstance(index, int):
+      index = slice(index, index + 1 if index != -1 else None)
+    def select(column):
+      return None if column is None else column[index]
+    return ColumnarTrajectory(self.joint_names, self.times[index],
+                              self.positions[index],
+                              select(self.velocities),
+                              select(self.accelerations),
+                              select(self.effort))
+
+  @property
+  def duration(self):
+    """seconds from the start to the last point"""
+    return float(self.times[-1]) if len(self) else 0.0
+
+  @staticmethod
+  def concatenate(trajectories, pause=0.0):
+    """Join trajectories in time, so that each one starts where the previous
+    one ended.
+    trajectories -- non-empty sequence of ColumnarTrajectory with the same
+                    joint names
+    pause        -- seconds inserted between consecutive trajectories so that
+                    no two points share a time
+    returns a ColumnarTrajectory
+    """
+    first = trajectories[0]
+    for trajectory in trajectories[1:]:
+      if trajectory.joint_names != first.joint_names:
+        raise ValueError("Cannot concatenate trajectories of different joints")
+    # each trajectory is offset by the durations and pauses of all the ones
+    # before it
+    durations = np.array([t.duration for t in trajectories])
+    offsets = np.concatenate(([0.0], np.cumsum(durations[:-1] + pause)))
+    def join(field):
+      columns = [getattr(t, field) for t in trajectories]
+      if any(c is None for c in columns):
+        return None
+      return np.concatenate(columns)
+    return ColumnarTrajectory(
+      first.joint_names,
+      np.concatenate([t.times + o for t, o in zip(trajectories, offsets)]),
+      join('positions'), join('velocities'), join('accelerations'),
+      join('effort'))
@@ -0,0 +1,316 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines an analytic estimate of how long the arm tasks take to plan and
+execute, so that autonomy can schedule tasks without planning them. Estimates
+take microseconds and are served by the EstimateTaskDuration service.
+"""
+
+import math
+from collections import namedtuple
+
+import rospy
+
+import ow_lander.srv
+from ow_lander import constants
+from ow_lander import math3d_lite
+from ow_lander import reachability
+from ow_lander.common import Singleton
+from ow_lander.reachability import ReachabilityMap, workspace_shoulder_yaw
+from ow_lander.subscribers import JointAnglesSubscriber
+from ow_lander.trajectory_timing import JointLimits
+
+# tasks are identified by the names of their action servers
+TASK_GRIND = 'TaskGrind'
+TASK_SCOOP_LINEAR = 'TaskScoopLinear'
+TASK_SCOOP_CIRCULAR = 'TaskScoopCircular'
+TASK_DISCARD = 'TaskDiscardSample'
+
+# NOTE: the following constants mirror those of the task servers in actions.py
+GRIND_APPROACH_DISTANCE = 0.25 # meters
+GRIND_SEGMENT_SEPARATION_DISTANCE = 0.08 # meters
+SCOOP_LINEAR_RETRACT_DISTANCE = 0.16 # meters
+SCOOP_LINEAR_ENTRY_RADIUS = 0.2 # meters
+SCOOP_LINEAR_EXIT_RADIUS = 0.4 # meters
+SCOOP_LINEAR_ENTRY_PITCH = math.pi / 2
+SCOOP_LINEAR_EXIT_PITCH = -0.8 # radians
+SCOOP_CIRCULAR_RADIUS = 0.4 # meters
+SCOOP_CIRCULAR_ARC = math.pi / 2
+SCOOP_CIRCULAR_RETRACT_DISTANCE = 0.2 # meters
+# rotation of the scoop from its held pose to its dumped pose when discarding
+DISCARD_DUMP_ROTATION = 2 * math.acos(min(1.0, abs(math3d_lite.dot(
+  math3d_lite.quaternion_from_euler(-179 * math.pi / 180, -20 * math.pi / 180,
+                                    -90 * math.pi / 180),
+  math3d_lite.quaternion_from_euler(math.pi, math.pi / 2, -math.pi / 2)))))
+
+# seconds spent planning (planning) and moving (execution) for a task
+Estimate = namedtuple('Estimate', ['execution', 'planning'])
+# the fields of a TaskGrind goal an estimate depends on
+GrindGoal = namedtuple('GrindGoal', ['x_start', 'y_start', 'ground_position',
+                                     'depth', 'length'])
+
+def trapezoid_duration(distance, max_velocity, max_acceleration):
+  """Duration of a rest-to-rest motion with bounded speed and acceleration
+  distance         -- length of the motion
+  max_velocity     -- maximal speed
+  max_acceleration -- maximal acceleration
+  """
+  if distance <= 0.0:
+    return 0.0
+  if distance * max_acceleration <= max_velocity * max_velocity:
+    # the motion is too short to reach full speed
+    return 2.0 * math.sqrt(distance / max_acceleration)
+  return distance / max_velocity + max_velocity / max_acceleration
+
+def joint_move_duration(start, goal, velocity_limits, acceleration_limits):
+  """Duration of a joint-space motion in which all joints start and stop
+  together, so the slowest joint determines the duration
+  start               -- sequence of joint positions
+  goal                -- sequence of joint positions
+  velocity_limits     -- sequence of maximal joint speeds
+  acceleration_limits -- sequence of maximal joint accelerations
+  """
+  return max((trapezoid_duration(abs(b - a), v, acc) for a, b, v, acc
+              in zip(start, goal, velocity_limits, acceleration_limits)),
+             default=0.0)
+
+
+class DurationEstimator(metaclass=Singleton):
+  """Estimates the planning and execution durations of arm tasks from the
+  joint positions they start from and their goals. Joint-space motions are
+  timed against the joint limits of the lander, and Cartesian motions against
+  a speed of the end-effector. Joint positions of the working pose of a task
+  are taken from the reachability map when it is loaded. Configured by the
+  following parameters in the private namespace of the node:
+    duration_estimator/tool_speed         -- end-effector speed along
+                                             Cartesian paths (m/s).
+                                             default: 0.1
+    duration_estimator/tool_angular_speed -- end-effector angular speed along
+                                             Cartesian paths (rad/s).
+                                             default: 0.2
+    duration_estimator/execution_scale    -- ratio of measured to estimated
+                                             execution durations.
+                                             default: 1.0
+    duration_estimator/planning_duration  -- seconds spent planning each
+                                             segment. default: 1.0
+  The last two are fit by the calibrate_duration_estimator.py script and may
+  be overridden for a task in the duration_estimator/<action name> namespace.
+  Their defaults are neutral, so estimates are uncalibrated until they are
+  set.
+  """
+
+  # number of segments each task plans
+  SEGMENTS = {
+    TASK_GRIND: 7,
+    TASK_SCOOP_LINEAR: 7,
+    TASK_SCOOP_CIRCULAR: 4,
+    TASK_DISCARD: 2
+  }
+
+  def __init__(self):
+    """May raise KeyError if robot_description is not on the parameter server"""
+    limits = JointLimits()
+    self._velocity_limits = limits.velocity_limits(constants.ARM_JOINTS) \
+                                  .tolist()
+    self._acceleration_limits = limits.acceleration_limits(
+      constants.ARM_JOINTS).tolist()
+    self._tool_speed = rospy.get_param('~duration_estimator/tool_speed', 0.1)
+    self._tool_angular_speed = rospy.get_param(
+      '~duration_estimator/tool_angular_speed', 0.2)
+    execution_scale = rospy.get_param('~duration_estimator/execution_scale',
+                                      1.0)
+    planning_duration = rospy.get_param(
+      '~duration_estimator/planning_duration', 1.0)
+    self._calibration = dict()
+    for task in self.SEGMENTS:
+      self._calibration[task] = (
+        rospy.get_param(f'~duration_estimator/{task}/execution_scale',
+                        execution_scale),
+        rospy.get_param(f'~duration_estimator/{task}/planning_duration',
+                        planning_duration)
+      )
+    self._reachability = ReachabilityMap()
+
+  def _joint_move(self, start, goal):
+    return joint_move_duration(start, goal, self._velocity_limits,
+                               self._acceleration_limits)
+
+  def _tool_move(self, distance, rotation=0.0):
+    """Duration of a Cartesian motion of the end-effector
+    distance -- length of the path (meters)
+    rotation -- angle the end-effector rotates by along the path (radians)
+    """
+    return max(distance / self._tool_speed, rotation / self._tool_angular_speed)
+
+  def _working_positions(self, task, point, approach):
+    """Joint positions of the working pose of a task at a point
+    task     -- one of the reachability TASK_* types
+    point    -- base_link position of the tool in the working pose
+    approach -- joint positions the arm reaches the working pose from, which
+                are returned if the reachability map has none for point
+    """
+    voxel = self._reachability.lookup(point.x, point.y, point.z)
+    if voxel is None or task not in voxel.seeds:
+      return approach
+    seed = voxel.seeds[task]
+    # joints of the working pose that are not arm joints, like j_grinder, do
+    # not move the arm
+    return [seed.get(name, q) for name, q in zip(constants.ARM_JOINTS,
+                                                 approach)]
+
+  @staticmethod
+  def _facing_shoulder_yaw(x, y):
+    yaw = workspace_shoulder_yaw(x, y)
+    if math.isnan(yaw):
+      raise ValueError(f"No shoulder yaw faces the goal at ({x:.3f}, {y:.3f})")
+    return yaw
+
+  def grind_execution(self, start, x, y, ground_position, depth, length):
+    """Uncalibrated execution duration of a TaskGrind
+    start -- positions of ARM_JOINTS the task starts from
+    other arguments are those of the TaskGrind goal
+    """
+    yaw = self._facing_shoulder_yaw(x, y)
+    pre = [yaw, math.pi / 2, -math.pi / 2, 0.0, -2 * math.pi / 3, start[5]]
+    working = self._working_positions(reachability.TASK_GRIND,
+      math3d_lite.Vec3(x, y, ground_position - depth), pre)
+    plunge = GRIND_APPROACH_DISTANCE + depth
+    return self._joint_move(start, pre) + self._joint_move(pre, working) \
+      + self._tool_move(length) \
+      + self._tool_move(GRIND_SEGMENT_SEPARATION_DISTANCE) \
+      + self._tool_move(length) + self._tool_move(plunge)
+
+  def scoop_linear_execution(self, start, point, depth, length):
+    """Uncalibrated execution duration of a TaskScoopLinear
+    start -- positions of ARM_JOINTS the task starts from
+    point -- base_link dig point. Other arguments are those of the
+             TaskScoopLinear goal.
+    """
+    yaw = self._facing_shoulder_yaw(point.x, point.y)
+    pre = [yaw, math.pi / 2, -math.pi / 2, 0.0, 0.0, math.pi / 2]
+    bottom = math3d_lite.Vec3(point.x, point.y, point.z - depth)
+    working = self._working_positions(reachability.TASK_SCOOP_LINEAR, bottom,
+                                      pre)
+    exit_pitch = abs(SCOOP_LINEAR_EXIT_PITCH)
+    exit_z = bottom.z \
+      + SCOOP_LINEAR_EXIT_RADIUS * (1.0 - math.cos(exit_pitch))
+    retract = max(0.0, point.z + SCOOP_LINEAR_RETRACT_DISTANCE - exit_z)
+    return self._joint_move(start, pre) + self._joint_move(pre, working) \
+      + self._tool_move(SCOOP_LINEAR_ENTRY_RADIUS * SCOOP_LINEAR_ENTRY_PITCH,
+                        SCOOP_LINEAR_ENTRY_PITCH) \
+      + self._tool_move(length) \
+      + self._tool_move(SCOOP_LINEAR_EXIT_RADIUS * exit_pitch, exit_pitch) \
+      + self._tool_move(retract)
+
+  def scoop_circular_execution(self, start, point, depth, parallel):
+    """Uncalibrated execution duration of a TaskScoopCircular
+    start -- positions of ARM_JOINTS the task starts from
+    point -- base_link dig point. Other arguments are those of the
+             TaskScoopCircular goal.
+    """
+    yaw = self._facing_shoulder_yaw(point.x, point.y)
+    pre = [yaw, math.pi / 2, -math.pi / 2, 0.0, 0.0,
+           math.pi / 2 if parallel else 0.0]
+    bottom = math3d_lite.Vec3(point.x, point.y, point.z - depth)
+    working = self._working_positions(reachability.TASK_SCOOP_CIRCULAR,
+                                      bottom, pre)
+    arc_end_z = bottom.z + SCOOP_CIRCULAR_RADIUS \
+      * (1.0 - math.cos(SCOOP_CIRCULAR_ARC / 2))
+    retract = max(0.0, point.z + SCOOP_CIRCULAR_RETRACT_DISTANCE - arc_end_z)
+    return self._joint_move(start, pre) + self._joint_move(pre, working) \
+      + self._tool_move(SCOOP_CIRCULAR_RADIUS * SCOOP_CIRCULAR_ARC,
+                        SCOOP_CIRCULAR_ARC) \
+      + self._tool_move(retract)
+
+  def discard_execution(self, start, point, height):
+    """Uncalibrated execution duration of a TaskDiscardSample
+    start -- positions of ARM_JOINTS the task starts from
+    point -- base_link discard point. Other arguments are those of the
+             TaskDiscardSample goal.
+    """
+    # without a reachability map, only the shoulder yaw is known to change
+    approach = list(start)
+    approach[constants.J_SHOU_YAW] = self._facing_shoulder_yaw(point.x,
+                                                               point.y)
+    held = self._working_positions(reachability.TASK_DISCARD,
+      math3d_lite.Vec3(point.x, point.y, point.z + height), approach)
+    return self._joint_move(start, held) \
+      + self._tool_move(0.0, DISCARD_DUMP_ROTATION)
+
+  def estimate_execution(self, task, start, goal):
+    """Uncalibrated execution duration of a task
+    task  -- one of the TASK_* action names
+    start -- positions of ARM_JOINTS the task starts from
+    goal  -- object with the fields of the task's action goal. Points are in
+             the base_link frame.
+    returns the duration in seconds
+    raises ValueError if task is not supported or no shoulder yaw faces its
+    goal
+    """
+    if task == TASK_GRIND:
+      return self.grind_execution(start, goal.x_start, goal.y_start,
+                                  goal.ground_position, goal.depth,
+                                  goal.length)
+    if task == TASK_SCOOP_LINEAR:
+      return self.scoop_linear_execution(start, goal.point, goal.depth,
+                                         goal.length)
+    if task == TASK_SCOOP_CIRCULAR:
+      return self.scoop_circular_execution(start, goal.point, goal.depth,
+                                           goal.parallel)
+    if task == TASK_DISCARD:
+      return self.discard_execution(start, goal.point, goal.height)
+    raise ValueError(f"Durations of {task} cannot be estimated")
+
+  def estimate(self, task, start, goal):
+    """Calibrated estimate of a task
+    task  -- one of the TASK_* action names
+    start -- positions of ARM_JOINTS the task starts from
+    goal  -- object with the fields of the task's action goal. Points are in
+             the base_link frame.
+    returns an Estimate
+    raises ValueError if task is not supported or no shoulder yaw faces its
+    goal
+    """
+    execution = self.estimate_execution(task, start, goal)
+    execution_scale, planning_duration = self._calibration[task]
+    return Estimate(execution_scale * execution,
+                    planning_duration * self.SEGMENTS[task])
+
+
+class DurationEstimatorServer:
+  """Serves estimates of the DurationEstimator with the EstimateTaskDuration
+  service
+  """
+
+  SRV_ESTIMATE_TASK_DURATION = 'EstimateTaskDuration'
+
+  def __init__(self):
+    self._estimator = DurationEstimator()
+    self._arm_joints_monitor = JointAnglesSubscriber(constants.ARM_JOINTS)
+    self._service = rospy.Service(self.SRV_ESTIMATE_TASK_DURATION,
+                                  ow_lander.srv.EstimateTaskDuration,
+                                  self._handle_request)
+
+  def _handle_request(self, request):
+    response = ow_lander.srv.EstimateTaskDurationResponse()
+    try:
+      start = list(request.start_positions)
+      if not start:
+        start = self._arm_joints_monitor.get_joint_positions()
+      if len(start) != len(constants.ARM_JOINTS):
+        raise ValueError(f"start_positions must have a position for each of "
+                         f"{constants.ARM_JOINTS}")
+      goal = request
+      if request.task == TASK_GRIND:
+        goal = GrindGoal(request.point.x, request.point.y, request.point.z,
+                         request.depth, request.length)
+      estimate = self._estimator.estimate(request.task, start, goal)
+    except ValueError as err:
+      response.success = False
+      response.message = str(err)
+      return response
+    response.success = True
+    response.execution_duration = estimate.execution
+    response.planning_duration = estimate.planning
+    return response
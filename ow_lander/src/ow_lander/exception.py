@@ -9,6 +9,40 @@ class ArmPlanningError(ActionError):
   """Raise when planning of an arm trajectory has encountered a problem"""
   pass
 
+class ArmPlanningIncompleteError(ArmPlanningError):
+  """Raise when a Cartesian path of the arm could only be planned part of the
+  way
+  """
+
+  def __init__(self, message, fraction):
+    """
+    message  -- description of the failure
+    fraction -- fraction of the path that could be planned
+    """
+    super().__init__(message)
+    self.fraction = fraction
+
+class ArmPlanningTimeoutError(ArmPlanningError):
+  """Raise when planning of a sequence of arm trajectories has run out of the
+  time allotted to it
+  """
+
+  def __init__(self, segment, kind, deadline, elapsed):
+    """
+    segment  -- index of the segment of the sequence being planned when the
+                time ran out
+    kind     -- type of that segment, e.g. 'pose' or 'linear'
+    deadline -- planning time allotted to the whole sequence (seconds)
+    elapsed  -- time spent planning the sequence (seconds)
+    """
+    super().__init__(
+      f"Planning exceeded its deadline of {deadline:.2f} seconds at segment "
+      f"{segment} ({kind}) after {elapsed:.2f} seconds")
+    self.segment = segment
+    self.kind = kind
+    self.deadline = deadline
+    self.elapsed = elapsed
+
 class ArmExecutionError(ActionError):
   """Raise when execution of an arm trajectory has encountered a problem and
   must be ceased
@@ -0,0 +1,228 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines the monitor of arm trajectory execution. The commanded and actual
+joint positions reported by the follow_joint_trajectory feedback of the active
+controller are sampled into preallocated ring buffers, from which the tracking
+error and timing slip of each action are summarized.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+import rospy
+
+import ow_lander.msg
+import ow_lander.srv
+from ow_lander import constants
+from ow_lander.common import Singleton, create_header
+
+DEFAULT_DUMP_PATH = '~/.ros/ow_lander/execution_buffers.npz'
+
+class ExecutionMonitor(metaclass=Singleton):
+  """Samples every feedback message of the trajectories executed between the
+  check out and check in of the arm by an action server, and publishes an
+  ExecutionSummary message on a latched topic when the arm is checked in. The
+  buffers hold the samples of the most recent action until the next one
+  begins executing. Configured by the following parameters in the private
+  namespace of the node:
+    execution_monitor/enabled  -- default: True
+    execution_monitor/capacity -- number of samples the buffers hold. Once
+                                  full, the oldest samples are overwritten,
+                                  but the summary still covers all samples.
+                                  default: 20000
+  """
+
+  TOPIC = '/execution_summary'
+  # columns of the buffers, which are NaN for joints a sample does not include
+  JOINTS = constants.ARM_JOINTS + ['j_grinder']
+
+  def __init__(self):
+    self.enabled = rospy.get_param('~execution_monitor/enabled', True)
+    self._capacity = rospy.get_param('~execution_monitor/capacity', 20000)
+    self._columns = {name: i for i, name in enumerate(self.JOINTS)}
+    joints = len(self.JOINTS)
+    self._time = np.zeros(self._capacity)
+    self._slip = np.zeros(self._capacity)
+    self._commanded = np.full((self._capacity, joints), np.nan)
+    self._actual = np.full((self._capacity, joints), np.nan)
+    self._squared_error = np.zeros(joints)
+    self._max_error = np.zeros(joints)
+    self._joint_samples = np.zeros(joints, dtype=int)
+    self._lock = threading.Lock()
+    self._action = None
+    # True once the summary of the action has been published
+    self._finished = True
+    self._samples = 0
+    self._executions = 0
+    self._planned_duration = 0.0
+    self._actual_duration = 0.0
+    self._max_slip = 0.0
+    # start time and planned duration of the trajectory being executed
+    self._start = None
+    self._planned = 0.0
+    self._pub = None
+    if self.enabled:
+      self._pub = rospy.Publisher(self.TOPIC, ow_lander.msg.ExecutionSummary,
+                                  queue_size=10, latch=True)
+
+  def _reset(self, action):
+    self._action = action
+    self._finished = False
+    self._samples = 0
+    self._executions = 0
+    self._planned_duration = 0.0
+    self._actual_duration = 0.0
+    self._max_slip = 0.0
+    self._squared_error[:] = 0.0
+    self._max_error[:] = 0.0
+    self._joint_samples[:] = 0
+
+  def begin_execution(self, action, trajectory):
+    """Start sampling the execution of a trajectory
+    action     -- name of the action server that executes it
+    trajectory -- trajectory_msgs JointTrajectory being executed
+    """
+    if not self.enabled:
+      return
+    with self._lock:
+      if self._finished or action != self._action:
+        self._reset(action)
+      self._executions += 1
+      self._planned = trajectory.points[-1].time_from_start.to_sec()
+      self._start = rospy.get_time()
+
+  def sample(self, feedback):
+    """Record a feedback message of the follow_joint_trajectory action
+    feedback -- control_msgs FollowJointTrajectoryFeedback
+    """
+    if not self.enabled:
+      return
+    now = rospy.get_time()
+    with self._lock:
+      if self._start is None:
+        return
+      indices = [(i, self._columns[name])
+                 for i, name in enumerate(feedback.joint_names)
+                 if name in self._columns]
+      fields, columns = [list(x) for x in zip(*indices)] if indices \
+                        else ([], [])
+      commanded = np.asarray(feedback.desired.positions)[fields]
+      actual = np.asarray(feedback.actual.positions)[fields]
+      error = np.abs(actual - commanded)
+      self._squared_error[columns] += error ** 2
+      self._max_error[columns] = np.maximum(self._max_error[columns], error)
+      self._joint_samples[columns] += 1
+      slip = now - self._start - feedback.desired.time_from_start.to_sec()
+      self._max_slip = max(self._max_slip, slip)
+      row = self._samples % self._capacity
+      self._time[row] = now
+      self._slip[row] = slip
+      self._commanded[row] = np.nan
+      self._actual[row] = np.nan
+      self._commanded[row, columns] = commanded
+      self._actual[row, columns] = actual
+      self._samples += 1
+
+  def end_execution(self):
+    """Stop sampling the trajectory being executed"""
+    if not self.enabled:
+      return
+    with self._lock:
+      if self._start is None:
+        return
+      self._actual_duration += rospy.get_time() - self._start
+      self._planned_duration += self._planned
+      self._start = None
+
+  def get_summary(self):
+    """returns an ow_lander/ExecutionSummary message of the most recent
+    action
+    """
+    with self._lock:
+      sampled = np.flatnonzero(self._joint_samples)
+      rms = np.sqrt(self._squared_error[sampled]
+                    / self._joint_samples[sampled])
+      return ow_lander.msg.ExecutionSummary(
+        header=create_header('', rospy.Time.now()),
+        action=self._action or '',
+        joint_names=[self.JOINTS[i] for i in sampled],
+        rms_error=rms.tolist(),
+        max_error=self._max_error[sampled].tolist(),
+        executions=self._executions,
+        samples=self._samples,
+        planned_duration=self._planned_duration,
+        actual_duration=self._actual_duration,
+        timing_slip=self._actual_duration - self._planned_duration,
+        max_timing_slip=self._max_slip
+      )
+
+  def finish_action(self, action):
+    """Publish the summary of action if it executed any trajectories"""
+    if not self.enabled:
+      return
+    with self._lock:
+      if self._finished or action != self._action:
+        return
+      self._finished = True
+    summary = self.get_summary()
+    self._pub.publish(summary)
+    if summary.joint_names:
+      worst = int(np.argmax(summary.max_error))
+      rospy.loginfo(f"{action} tracked its trajectories within "
+                    f"{summary.max_error[worst]:.4f} radians "
+                    f"({summary.joint_names[worst]}) with a timing slip of "
+                    f"{summary.timing_slip:.2f} seconds")
+
+  def dump(self, path):
+    """Write the samples in the buffers to a NumPy .npz file in the order
+    they were taken
+    path -- file to write
+    """
+    with self._lock:
+      count = min(self._samples, self._capacity)
+      # the oldest sample is at the write position once the buffers are full
+      order = (np.arange(count) + self._samples - count) % self._capacity
+      arrays = {
+        'action': np.array(self._action or ''),
+        'joint_names': np.array(self.JOINTS),
+        'time': self._time[order],
+        'timing_slip': self._slip[order],
+        'commanded': self._commanded[order],
+        'actual': self._actual[order]
+      }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # np.savez appends .npz to paths that lack it
+    with open(path, 'wb') as f:
+      np.savez_compressed(f, **arrays)
+    return count
+
+
+class ExecutionMonitorServer:
+  """Dumps the buffers of the ExecutionMonitor with the DumpExecutionBuffers
+  service
+  """
+
+  SRV_DUMP_EXECUTION_BUFFERS = 'DumpExecutionBuffers'
+
+  def __init__(self):
+    self._monitor = ExecutionMonitor()
+    self._service = rospy.Service(self.SRV_DUMP_EXECUTION_BUFFERS,
+                                  ow_lander.srv.DumpExecutionBuffers,
+                                  self._handle_request)
+
+  def _handle_request(self, request):
+    response = ow_lander.srv.DumpExecutionBuffersResponse()
+    path = os.path.expanduser(request.path or DEFAULT_DUMP_PATH)
+    try:
+      count = self._monitor.dump(path)
+    except OSError as err:
+      response.success = False
+      response.message = f"Failed to write execution buffers to {path}: {err}"
+      return response
+    response.success = True
+    response.message = f"Wrote {count} samples to {path}"
+    return response
@@ -0,0 +1,108 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a facade of MoveIt's /compute_fk service that memoizes its results,
+for the links that the analytic forward kinematics of ow_lander.kinematics
+cannot compute.
+"""
+
+import threading
+from copy import deepcopy
+from collections import OrderedDict
+
+import rospy
+from moveit_msgs.srv import GetPositionFK
+from moveit_msgs.msg import MoveItErrorCodes
+
+from ow_lander import constants
+from ow_lander.common import Singleton, create_header
+from ow_lander.exception import ArmPlanningError
+
+def _state_key(robot_state):
+  """Identifies a moveit_msgs RobotState by its joint positions"""
+  return (tuple(robot_state.joint_state.name),
+          tuple(robot_state.joint_state.position))
+
+
+class ForwardKinematicsService(metaclass=Singleton):
+  """Computes link poses with /compute_fk over a persistent connection, which
+  is shared by all threads but used by one at a time. Poses are memoized per
+  robot state, and counters of the queries and service calls are kept for
+  reporting.
+  """
+
+  SRV_COMPUTE_FK = '/compute_fk'
+  # maximal number of (frame, state, link) poses held before the
+  # least-recently-used is evicted
+  CAPACITY = 1024
+
+  def __init__(self):
+    self._proxy = None
+    # guards the proxy, which is not safe to call from several threads at once
+    self._proxy_lock = threading.Lock()
+    self._poses = OrderedDict()
+    self._lock = threading.Lock()
+    # queries answered from memory, queries that required the service, and
+    # service calls made
+    self._hits = 0
+    self._misses = 0
+    self._calls = 0
+
+  def _call(self, frame_id, link, robot_state):
+    with self._proxy_lock:
+      if self._proxy is None:
+        SERVICE_TIMEOUT = 30 # seconds
+        rospy.wait_for_service(self.SRV_COMPUTE_FK, SERVICE_TIMEOUT)
+        self._proxy = rospy.ServiceProxy(self.SRV_COMPUTE_FK, GetPositionFK,
+                                         persistent=True)
+      with self._lock:
+        self._calls += 1
+      try:
+        result = self._proxy(create_header(frame_id), [link], robot_state)
+      except rospy.ServiceException as err:
+        # a persistent connection does not survive a restart of move_group, so
+        # reconnect on the next call
+        self._proxy.close()
+        self._proxy = None
+        raise ArmPlanningError(f"{self.SRV_COMPUTE_FK} service call failed: "
+                               f"{err}")
+    if result.error_code.val != MoveItErrorCodes.SUCCESS:
+      raise ArmPlanningError(f"{self.SRV_COMPUTE_FK} service returned "
+                             f"error code {result.error_code}")
+    return result.pose_stamped[0].pose
+
+  def compute_pose(self, link, robot_state, frame_id=constants.FRAME_ID_BASE):
+    """Compute the pose of a link
+    link        -- link name
+    robot_state -- moveit_msgs RobotState
+    frame_id    -- frame the pose is expressed in
+    returns a geometry_msgs Pose, which is a copy, so callers may modify it
+    """
+    key = (frame_id, _state_key(robot_state), link)
+    with self._lock:
+      pose = self._poses.get(key)
+      if pose is not None:
+        self._poses.move_to_end(key)
+        self._hits += 1
+      else:
+        self._misses += 1
+    if pose is None:
+      pose = self._call(frame_id, link, robot_state)
+      with self._lock:
+        self._poses[key] = pose
+        while len(self._poses) > self.CAPACITY:
+          self._poses.popitem(last=False)
+    return deepcopy(pose)
+
+  def get_statistics(self):
+    """returns a dictionary of the number of queries answered from memory
+    (hits), queries that required the service (misses), and service calls made
+    (calls)
+    """
+    with self._lock:
+      return {
+        'hits': self._hits,
+        'misses': self._misses,
+        'calls': self._calls
+      }
@@ -134,6 +134,20 @@ class FrameTransformer(metaclass = Singleton):
       rospy.logerr(f"FrameTransfomer.lookup_transform failure: {str(err)}")
       return None
 
+  def get_latest_common_time(self, target_frame, source_frame):
+    """Finds the time of the most recent transform between two frames, which
+    changes only when a transform along the chain between them is updated
+    source_frame -- The frame from which the transform is computed
+    target_frame -- The frame transformed into
+    returns a rospy.Time or None if the frames are not connected
+    """
+    try:
+      return self._buffer.get_latest_common_time(target_frame, source_frame)
+    except tf2_ros.TransformException as err:
+      rospy.logerr(
+        f"FrameTransfomer.get_latest_common_time failure: {str(err)}")
+      return None
+
 def initialize():
   """Initialize tf2 Buffer. Call this following rospy.init_node"""
   FrameTransformer()
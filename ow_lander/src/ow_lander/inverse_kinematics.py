@@ -0,0 +1,161 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines an in-process damped least-squares inverse kinematics solver for
+the OceanWATERS arm, built on the closed-form forward kinematics of
+ow_lander.kinematics. Paths of Cartesian waypoints are solved in one call, each
+waypoint warm-started from the solution of the previous one.
+"""
+
+import numpy as np
+
+from ow_lander import math3d_array
+from ow_lander.common import Singleton
+from ow_lander.kinematics import ForwardKinematics
+
+def _rotation_error(target, current):
+  """Rotation vector of the rotation from current to target
+  target  -- numpy array of shape (4,) of a unit quaternion
+  current -- numpy array of shape (4,) of a unit quaternion
+  returns a numpy array of shape (3,) in the base_link frame
+  """
+  q = math3d_array.quaternion_multiply(
+    target, math3d_array.quaternion_inverse(current))
+  # take the shortest rotation
+  if q[3] < 0:
+    q = -q
+  s = np.linalg.norm(q[:3])
+  if s < 1e-12:
+    return 2.0 * q[:3]
+  return 2.0 * np.arctan2(s, q[3]) * q[:3] / s
+
+
+class InverseKinematics(metaclass=Singleton):
+  """Solves for joint positions that place a link at a pose in the base_link
+  frame. Only solutions within the joint limits of the URDF are returned.
+  """
+
+  POSITION_TOLERANCE = 1e-4    # meters
+  ORIENTATION_TOLERANCE = 1e-3 # radians
+  MAX_ITERATIONS = 100
+  # damping keeps steps small near singularities
+  DAMPING = 0.01
+  # largest change of any joint in a single iteration (radians)
+  MAX_ITERATION_STEP = 0.2
+
+  def __init__(self):
+    """May raise KeyError if robot_description is not on the parameter server"""
+    self._fk = ForwardKinematics()
+
+  def supports_link(self, link):
+    """returns True if IK can be solved for link"""
+    return self._fk.supports_link(link)
+
+  def solve(self, link, joint_names, seed, pose):
+    """Solve IK for a single pose
+    link        -- name of the link to place at pose
+    joint_names -- names of the joints solved for. Must include all joints
+                   that move link.
+    seed        -- array-like of joint positions the search starts from
+    pose        -- array-like of shape (7,) of (x, y, z, qx, qy, qz, qw)
+    returns a numpy array of joint positions or None if no solution was found
+    """
+    q = np.array(seed, dtype=float)
+    target = np.asarray(pose, dtype=float)
+    lower, upper = self._fk.get_joint_limits(joint_names)
+    damping = self.DAMPING ** 2 * np.eye(6)
+    for _ in range(self.MAX_ITERATIONS):
+      current, j = self._fk.compute_jacobians(link, joint_names, q)
+      current, j = current[0], j[0]
+      error = np.concatenate((target[:3] - current[:3],
+                              _rotation_error(target[3:], current[3:])))
+      if np.linalg.norm(error[:3]) <= self.POSITION_TOLERANCE \
+          and np.linalg.norm(error[3:]) <= self.ORIENTATION_TOLERANCE:
+        return q
+      step = j.T @ np.linalg.solve(j @ j.T + damping, error)
+      largest = np.max(np.abs(step))
+      if largest > self.MAX_ITERATION_STEP:
+        step *= self.MAX_ITERATION_STEP / largest
+      q = np.clip(q + step, lower, upper)
+    return None
+
+  def solve_path(self, link, joint_names, seed, poses, max_joint_step):
+    """Solve IK for a sequence of waypoints, so that the arm moves
+    continuously between the solutions
+    link           -- name of the link to place at the waypoints
+    joint_names    -- names of the joints solved for
+    seed           -- array-like of joint positions at the start of the path
+    poses          -- array-like of shape (N, 7) of waypoints
+    max_joint_step -- largest change of any joint between consecutive
+                      waypoints (radians). Larger changes indicate the
+                      solution jumped to a different configuration of the arm.
+    returns a numpy array of shape (N, len(joint_names))
+    May raise ValueError if a waypoint cannot be solved
+    """
+    solutions = np.empty((len(poses), len(joint_names)))
+    previous = np.asarray(seed, dtype=float)
+    for i, pose in enumerate(np.asarray(poses, dtype=float)):
+      solution = self.solve(link, joint_names, previous, pose)
+      if solution is None:
+        raise ValueError(f"No IK solution was found for waypoint {i}")
+      if np.max(np.abs(solution - previous)) > max_joint_step:
+        raise ValueError(f"IK solution jumped at waypoint {i}")
+      solutions[i] = solution
+      previous = solution
+    return solutions
+
+  def solve_sparse_path(self, link, joint_names, seed, poses, max_joint_step,
+                        max_deviation):
+    """Solve IK for a sequence of waypoints that may be far apart, adding
+    waypoints only where the arm would stray from the path. Between two
+    solutions, the arm moves by joint-space interpolation. Wherever its
+    position halfway through an interval deviates from the middle of the
+    straight line between the waypoints by more than max_deviation, the
+    middle of that line is solved as an additional waypoint.
+    link           -- name of the link to place at the waypoints
+    joint_names    -- names of the joints solved for
+    seed           -- array-like of joint positions at the start of the path,
+                      where link is at the start of the path
+    poses          -- array-like of shape (N, 7) of waypoints
+    max_joint_step -- see solve_path
+    max_deviation  -- largest distance between the path and the position of
+                      link halfway between solutions (meters)
+    returns a tuple of numpy arrays of the waypoints of shape (M, 7) and their
+    solutions of shape (M, len(joint_names)), where M >= N
+    May raise ValueError if a waypoint cannot be solved or the deviation
+    cannot be bounded
+    """
+    # each round halves the intervals that deviate too far
+    MAX_ROUNDS = 6
+    seed = np.asarray(seed, dtype=float)
+    poses = np.asarray(poses, dtype=float)
+    solutions = self.solve_path(link, joint_names, seed, poses, max_joint_step)
+    start = self._fk.compute_poses(link, joint_names, seed)
+    for _ in range(MAX_ROUNDS):
+      ends = np.vstack([start, poses])
+      joints = np.vstack([seed, solutions])
+      halfway = self._fk.compute_poses(link, joint_names,
+                                       (joints[:-1] + joints[1:]) / 2)
+      middles = (ends[:-1, :3] + ends[1:, :3]) / 2
+      deviating = np.flatnonzero(
+        math3d_array.norm(halfway[:, :3] - middles) > max_deviation)
+      if len(deviating) == 0:
+        return poses, solutions
+      # insert from the back, so the indices ahead remain valid
+      for i in deviating[::-1]:
+        middle = np.concatenate([middles[i], math3d_array.slerp_quaternion(
+          ends[i, 3:], ends[i + 1, 3:], [0.5])[0]])
+        solution = self.solve(link, joint_names,
+                              (joints[i] + joints[i + 1]) / 2, middle)
+        if solution is None:
+          raise ValueError(f"No IK solution was found between waypoints {i} "
+                           f"and {i + 1}")
+        if max(np.max(np.abs(solution - joints[i])),
+               np.max(np.abs(solution - joints[i + 1]))) > max_joint_step:
+          raise ValueError(f"IK solution jumped between waypoints {i} and "
+                           f"{i + 1}")
+        poses = np.insert(poses, i, middle, axis=0)
+        solutions = np.insert(solutions, i, solution, axis=0)
+    raise ValueError(f"The path deviates by more than {max_deviation} meters "
+                     f"after {MAX_ROUNDS} subdivisions")
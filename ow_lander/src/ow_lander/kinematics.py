@@ -0,0 +1,316 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a closed-form kinematics facility for the OceanWATERS arm that is
+computed in-process from the URDF on the parameter server. This avoids the ROS
+service round trip of MoveIt's /compute_fk for every pose query.
+"""
+
+import math
+import numpy as np
+from urdf_parser_py.urdf import URDF
+from geometry_msgs.msg import Pose, Point, Quaternion
+
+from ow_lander import constants
+from ow_lander.common import Singleton
+
+def _rotation_from_rpy(rpy):
+  """Computes the rotation matrix of URDF fixed-axis roll, pitch, and yaw
+  rpy -- 3-element sequence of (roll, pitch, yaw) in radians
+  returns a 3x3 numpy array
+  """
+  cr, cp, cy = np.cos(rpy)
+  sr, sp, sy = np.sin(rpy)
+  return np.array([
+    [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr],
+    [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr],
+    [-sp,     cp * sr,                cp * cr               ]
+  ])
+
+def _skew(v):
+  """Computes the cross-product matrix of a 3-vector"""
+  return np.array([
+    [0.0,   -v[2],  v[1]],
+    [v[2],   0.0,  -v[0]],
+    [-v[1],  v[0],  0.0 ]
+  ])
+
+def quaternions_from_matrices(r):
+  """Converts an array of rotation matrices into unit quaternions
+  r -- numpy array of shape (N, 3, 3)
+  returns a numpy array of shape (N, 4) ordered as (x, y, z, w) to match
+  geometry_msgs Quaternion
+  """
+  m00, m11, m22 = r[:, 0, 0], r[:, 1, 1], r[:, 2, 2]
+  trace = m00 + m11 + m22
+  # each row is valid only where its pivot is the largest, which keeps the
+  # square root argument well away from zero
+  candidates = np.stack([
+    # pivot on w
+    np.stack([r[:, 2, 1] - r[:, 1, 2], r[:, 0, 2] - r[:, 2, 0],
+              r[:, 1, 0] - r[:, 0, 1], 1.0 + trace], axis=-1),
+    # pivot on x
+    np.stack([1.0 + m00 - m11 - m22, r[:, 0, 1] + r[:, 1, 0],
+              r[:, 0, 2] + r[:, 2, 0], r[:, 2, 1] - r[:, 1, 2]], axis=-1),
+    # pivot on y
+    np.stack([r[:, 0, 1] + r[:, 1, 0], 1.0 - m00 + m11 - m22,
+              r[:, 1, 2] + r[:, 2, 1], r[:, 0, 2] - r[:, 2, 0]], axis=-1),
+    # pivot on z
+    np.stack([r[:, 0, 2] + r[:, 2, 0], r[:, 1, 2] + r[:, 2, 1],
+              1.0 - m00 - m11 + m22, r[:, 1, 0] - r[:, 0, 1]], axis=-1)
+  ], axis=1)
+  pivot = np.argmax(np.stack([trace, m00, m11, m22], axis=-1), axis=-1)
+  q = candidates[np.arange(len(r)), pivot]
+  q /= np.linalg.norm(q, axis=-1, keepdims=True)
+  # prefer a non-negative w so results are deterministic
+  q[q[:, 3] < 0] *= -1.0
+  return q
+
+def _quaternion_from_matrix(m):
+  """Scalar version of quaternions_from_matrices for a single rotation
+  m -- numpy array whose upper-left 3x3 block is a rotation matrix
+  returns a 4-tuple ordered as (x, y, z, w)
+  """
+  (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = m[:3, :3].tolist()
+  trace = m00 + m11 + m22
+  if trace >= m00 and trace >= m11 and trace >= m22:
+    q = (m21 - m12, m02 - m20, m10 - m01, 1.0 + trace)
+  elif m00 >= m11 and m00 >= m22:
+    q = (1.0 + m00 - m11 - m22, m01 + m10, m02 + m20, m21 - m12)
+  elif m11 >= m22:
+    q = (m01 + m10, 1.0 - m00 + m11 - m22, m12 + m21, m02 - m20)
+  else:
+    q = (m02 + m20, m12 + m21, 1.0 - m00 - m11 + m22, m10 - m01)
+  n = math.sqrt(sum(x * x for x in q))
+  if q[3] < 0:
+    n = -n
+  return tuple(x / n for x in q)
+
+def pose_from_array(a):
+  """Converts a 7-element array of (x, y, z, qx, qy, qz, qw) into a Pose
+  a -- sequence of 7 floats
+  returns a geometry_msgs Pose
+  """
+  return Pose(Point(*a[:3]), Quaternion(*a[3:7]))
+
+
+class _ChainJoint:
+  """A single joint along a kinematic chain reduced to the constants needed to
+  compute its transform.
+  """
+
+  def __init__(self, joint):
+    self.name = joint.name
+    self.type = joint.type
+    xyz = [0.0, 0.0, 0.0]
+    rpy = [0.0, 0.0, 0.0]
+    if joint.origin is not None:
+      xyz = joint.origin.xyz if joint.origin.xyz is not None else xyz
+      rpy = joint.origin.rpy if joint.origin.rpy is not None else rpy
+    self.origin_translation = np.array(xyz, dtype=float)
+    self.origin_rotation = _rotation_from_rpy(np.array(rpy, dtype=float))
+    axis = np.array(joint.axis if joint.axis is not None else [1.0, 0.0, 0.0],
+                    dtype=float)
+    self.axis = axis / np.linalg.norm(axis)
+    # Rodrigues' rotation formula terms: R(q) = I + sin(q) K + (1 - cos(q)) K^2
+    self._k = _skew(self.axis)
+    self._k2 = self._k @ self._k
+    # terms of the homogeneous transform of the joint so that a single joint
+    # position can be evaluated as T(q) = T0 + sin(q) T1 + (1 - cos(q)) T2, or
+    # as T(q) = T0 + q T1 for prismatic joints
+    self._t0 = np.eye(4)
+    self._t0[:3, :3] = self.origin_rotation
+    self._t0[:3, 3] = self.origin_translation
+    self._t1 = np.zeros((4, 4))
+    self._t2 = np.zeros((4, 4))
+    if self.type == 'prismatic':
+      self._t1[:3, 3] = self.origin_rotation @ self.axis
+    else:
+      self._t1[:3, :3] = self.origin_rotation @ self._k
+      self._t2[:3, :3] = self.origin_rotation @ self._k2
+
+  def is_movable(self):
+    return self.type in ('revolute', 'continuous', 'prismatic')
+
+  def transform(self, q):
+    """Homogeneous transform of the joint for a single joint position
+    q -- joint position (ignored for fixed joints)
+    returns a 4x4 numpy array
+    """
+    if self.type == 'prismatic':
+      return self._t0 + q * self._t1
+    elif self.is_movable():
+      return self._t0 + math.sin(q) * self._t1 + (1.0 - math.cos(q)) * self._t2
+    return self._t0
+
+  def motion_rotations(self, q):
+    """Rotations caused by joint motion
+    q -- numpy array of shape (N,) of joint positions
+    returns a numpy array of shape (N, 3, 3)
+    """
+    if self.type == 'prismatic':
+      return np.broadcast_to(np.eye(3), (len(q), 3, 3))
+    return np.eye(3) + np.sin(q)[:, None, None] * self._k \
+                     + (1.0 - np.cos(q))[:, None, None] * self._k2
+
+  def motion_translations(self, q):
+    """Translations caused by joint motion
+    q -- numpy array of shape (N,) of joint positions
+    returns a numpy array of shape (N, 3)
+    """
+    if self.type == 'prismatic':
+      return q[:, None] * self.axis
+    return np.zeros((len(q), 3))
+
+
+class ForwardKinematics(metaclass=Singleton):
+  """Computes link poses of the arm in the base_link frame from joint positions
+  using the kinematic description of the lander in the robot_description
+  parameter. Results are equivalent to those of MoveIt's /compute_fk service
+  requested in the base_link frame.
+  """
+
+  def __init__(self):
+    """May raise KeyError if robot_description is not on the parameter server"""
+    self._urdf = URDF.from_parameter_server()
+    self._base = constants.FRAME_ID_BASE
+    self._chains = dict()
+
+  def _get_chain(self, link):
+    if link not in self._chains:
+      if link not in self._urdf.link_map:
+        raise ValueError(f"Link {link} is not defined in robot_description")
+      joint_names = self._urdf.get_chain(self._base, link, joints=True,
+                                         links=False, fixed=True)
+      self._chains[link] = [
+        _ChainJoint(self._urdf.joint_map[name]) for name in joint_names
+      ]
+    return self._chains[link]
+
+  def supports_link(self, link):
+    """Check whether a link's pose can be computed
+    link -- Name of the link as it appears in the URDF
+    returns True if link is connected to base_link
+    """
+    try:
+      self._get_chain(link)
+    except (ValueError, KeyError):
+      return False
+    return True
+
+  def get_joint_names(self, link):
+    """Movable joints that affect the pose of a link
+    link -- Name of the link as it appears in the URDF
+    returns list of joint names ordered from base_link to link
+    """
+    return [j.name for j in self._get_chain(link) if j.is_movable()]
+
+  def _evaluate_chain(self, link, joint_names, joint_positions,
+                      jacobian=False):
+    """Batched evaluation of the chain from base_link to link
+    returns a tuple of the translations of shape (N, 3) and rotations of shape
+    (N, 3, 3) of link, and its geometric Jacobians of shape
+    (N, 6, len(joint_names)) if jacobian is True or otherwise None
+    """
+    q = np.atleast_2d(np.asarray(joint_positions, dtype=float))
+    columns = {name : i for i, name in enumerate(joint_names)}
+    n = q.shape[0]
+    rotation = np.broadcast_to(np.eye(3), (n, 3, 3))
+    translation = np.zeros((n, 3))
+    # axis and origin of each movable joint in base_link, keyed on column
+    joint_frames = dict()
+    for joint in self._get_chain(link):
+      translation = translation + rotation @ joint.origin_translation
+      rotation = rotation @ joint.origin_rotation
+      if not joint.is_movable():
+        continue
+      if joint.name not in columns:
+        raise ValueError(f"No position was provided for joint {joint.name}, "
+                         f"which is required to compute the pose of {link}")
+      column = columns[joint.name]
+      if jacobian:
+        joint_frames[column] = (joint.type, rotation @ joint.axis, translation)
+      q_joint = q[:, column]
+      translation = translation + np.einsum(
+        'nij,nj->ni', rotation, joint.motion_translations(q_joint))
+      rotation = rotation @ joint.motion_rotations(q_joint)
+    if not jacobian:
+      return translation, rotation, None
+    j = np.zeros((n, 6, len(joint_names)))
+    for column, (joint_type, axis, origin) in joint_frames.items():
+      if joint_type == 'prismatic':
+        j[:, :3, column] = axis
+      else:
+        j[:, :3, column] = np.cross(axis, translation - origin)
+        j[:, 3:, column] = axis
+    return translation, rotation, j
+
+  def compute_poses(self, link, joint_names, joint_positions):
+    """Batched forward kinematics
+    link            -- Name of the link whose pose will be computed
+    joint_names     -- Sequence of joint names that label the columns of
+                       joint_positions. Must include all names returned by
+                       get_joint_names for link. Other names are ignored.
+    joint_positions -- Array-like of shape (N, len(joint_names)) or of shape
+                       (len(joint_names),) for a single configuration
+    returns a numpy array of shape (N, 7) where each row is a pose in the
+    base_link frame represented as (x, y, z, qx, qy, qz, qw)
+    """
+    translation, rotation, _ = self._evaluate_chain(link, joint_names,
+                                                    joint_positions)
+    return np.hstack([translation, quaternions_from_matrices(rotation)])
+
+  def compute_jacobians(self, link, joint_names, joint_positions):
+    """Batched forward kinematics with geometric Jacobians
+    link            -- Name of the link whose pose will be computed
+    joint_names     -- Sequence of joint names that label the columns of
+                       joint_positions. Must include all names returned by
+                       get_joint_names for link.
+    joint_positions -- Array-like of shape (N, len(joint_names)) or of shape
+                       (len(joint_names),) for a single configuration
+    returns a tuple of a numpy array of shape (N, 7) of poses as returned by
+    compute_poses, and a numpy array of shape (N, 6, len(joint_names)) whose
+    rows map joint velocities to the linear and then the angular velocity of
+    link in base_link. Columns of joints that do not move link are zero.
+    """
+    translation, rotation, j = self._evaluate_chain(link, joint_names,
+                                                    joint_positions,
+                                                    jacobian=True)
+    return np.hstack([translation, quaternions_from_matrices(rotation)]), j
+
+  def get_joint_limits(self, joint_names):
+    """Position limits of joints as defined in the URDF
+    joint_names -- Sequence of joint names
+    returns a tuple of numpy arrays of the lower and upper limits. Joints
+    without limits are unbounded.
+    """
+    lower = np.full(len(joint_names), -np.inf)
+    upper = np.full(len(joint_names), np.inf)
+    for i, name in enumerate(joint_names):
+      joint = self._urdf.joint_map[name]
+      if joint.type != 'continuous' and joint.limit is not None:
+        lower[i] = joint.limit.lower
+        upper[i] = joint.limit.upper
+    return lower, upper
+
+  def compute_pose(self, link, joint_names, joint_positions):
+    """Forward kinematics for a single configuration
+    link            -- Name of the link whose pose will be computed
+    joint_names     -- Sequence of joint names that label joint_positions
+    joint_positions -- Sequence of joint positions
+    returns a geometry_msgs Pose in the base_link frame
+    """
+    # NOTE: This is a non-vectorized version of compute_poses, which is an
+    #       order of magnitude faster for a single configuration.
+    values = dict(zip(joint_names, joint_positions))
+    t = np.eye(4)
+    for joint in self._get_chain(link):
+      if not joint.is_movable():
+        t = t @ joint.transform(0.0)
+        continue
+      if joint.name not in values:
+        raise ValueError(f"No position was provided for joint {joint.name}, "
+                         f"which is required to compute the pose of {link}")
+      t = t @ joint.transform(values[joint.name])
+    return Pose(Point(*t[:3, 3]), Quaternion(*_quaternion_from_matrix(t)))
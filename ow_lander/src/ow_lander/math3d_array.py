@@ -0,0 +1,243 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Batched counterparts of the functions in math3d that operate on NumPy arrays
+instead of one geometry_msgs object at a time. Vectors are arrays whose last
+axis has length 3 (x, y, z), quaternions are arrays whose last axis has length
+4 (x, y, z, w), and poses are arrays whose last axis has length 7
+(x, y, z, qx, qy, qz, qw). All functions broadcast over leading axes.
+"""
+
+import numpy as np
+from geometry_msgs.msg import Quaternion, Vector3, Point, Pose
+
+def vectors_from_msgs(vectors):
+  """Converts geometry_msgs vectors to an array
+  vectors -- sequence of geometry_msgs Vector3 or Point
+  returns a numpy array of shape (N, 3)
+  """
+  return np.array([(v.x, v.y, v.z) for v in vectors], dtype=float) \
+           .reshape(-1, 3)
+
+def vectors_to_msgs(a, msg_type=Vector3):
+  """Converts an array of vectors to geometry_msgs
+  a        -- numpy array of shape (N, 3)
+  msg_type -- geometry_msgs Vector3 or Point
+  returns a list of msg_type
+  """
+  return [msg_type(*row) for row in np.asarray(a).reshape(-1, 3).tolist()]
+
+def quaternions_from_msgs(quaternions):
+  """Converts geometry_msgs quaternions to an array
+  quaternions -- sequence of geometry_msgs Quaternion
+  returns a numpy array of shape (N, 4)
+  """
+  return np.array([(q.x, q.y, q.z, q.w) for q in quaternions], dtype=float) \
+           .reshape(-1, 4)
+
+def quaternions_to_msgs(a):
+  """Converts an array of quaternions to geometry_msgs
+  a -- numpy array of shape (N, 4)
+  returns a list of geometry_msgs Quaternion
+  """
+  return [Quaternion(*row) for row in np.asarray(a).reshape(-1, 4).tolist()]
+
+def poses_from_msgs(poses):
+  """Converts geometry_msgs poses to an array
+  poses -- sequence of geometry_msgs Pose
+  returns a numpy array of shape (N, 7)
+  """
+  return np.array([(p.position.x, p.position.y, p.position.z,
+                    p.orientation.x, p.orientation.y, p.orientation.z,
+                    p.orientation.w) for p in poses], dtype=float) \
+           .reshape(-1, 7)
+
+def poses_to_msgs(a):
+  """Converts an array of poses to geometry_msgs
+  a -- numpy array of shape (N, 7)
+  returns a list of geometry_msgs Pose
+  """
+  return [Pose(Point(*row[:3]), Quaternion(*row[3:]))
+          for row in np.asarray(a).reshape(-1, 7).tolist()]
+
+def dot(a, b):
+  """Computes dot products along the last axis
+  a -- numpy array of vectors or quaternions
+  b -- numpy array of the same kind as a
+  returns a numpy array of dot products
+  """
+  return np.sum(np.multiply(a, b), axis=-1)
+
+def cross(a, b):
+  """Computes cross products of vectors (a x b)"""
+  return np.cross(a, b)
+
+def norm(a):
+  """Computes the norms of vectors or quaternions"""
+  return np.linalg.norm(a, axis=-1)
+
+def normalize(a):
+  """Normalizes vectors or quaternions
+  a -- numpy array of vectors or quaternions, none of which may be zero
+  returns a numpy array of the same shape as a
+  """
+  a = np.asarray(a, dtype=float)
+  n = norm(a)[..., None]
+  assert(np.all(n != 0))
+  return a / n
+
+def quaternion_inverse(q):
+  """Computes the inverses of unit quaternions"""
+  return np.asarray(q, dtype=float) * np.array([-1.0, -1.0, -1.0, 1.0])
+
+def quaternion_multiply(a, b):
+  """Computes quaternion products (a * b)
+  a -- numpy array of quaternions
+  b -- numpy array of quaternions
+  returns a numpy array of quaternion products
+  """
+  a = np.asarray(a, dtype=float)
+  b = np.asarray(b, dtype=float)
+  ax, ay, az, aw = np.moveaxis(a, -1, 0)
+  bx, by, bz, bw = np.moveaxis(b, -1, 0)
+  return np.stack([aw * bx + ax * bw + ay * bz - az * by,
+                   aw * by - ax * bz + ay * bw + az * bx,
+                   aw * bz + ax * by - ay * bx + az * bw,
+                   aw * bw - ax * bx - ay * by - az * bz], axis=-1)
+
+def quaternion_rotate(q, v):
+  """Perform passive rotations of vectors using unit quaternions. Equivalent to
+  q * v * q^-1 as computed by math3d.quaternion_rotate.
+  q -- numpy array of unit quaternions
+  v -- numpy array of vectors
+  returns a numpy array of rotated vectors
+  """
+  q = np.asarray(q, dtype=float)
+  v = np.asarray(v, dtype=float)
+  u = q[..., :3]
+  w = q[..., 3:]
+  t = 2.0 * np.cross(u, v)
+  return v + w * t + np.cross(u, t)
+
+def slerp(a, b, t):
+  """Computes spherical linear interpolations between two vectors at several
+  fractions. Equivalent to math3d.slerp evaluated for each fraction.
+  a -- numpy array of shape (3,) -- The value returned when t=0
+  b -- numpy array of shape (3,) -- The value returned when t=1
+  t -- numpy array of shape (N,) of fractions between a and b. 0 <= t <= 1
+  returns a numpy array of shape (N, 3)
+  """
+  a = np.asarray(a, dtype=float)
+  b = np.asarray(b, dtype=float)
+  t = np.asarray(t, dtype=float)[:, None]
+  # handle case where points of contact are within floating-precision error of
+  # each other
+  if np.isclose(np.linalg.norm(b - a), 0):
+    return np.broadcast_to(a, (len(t), 3)).copy()
+  # compute arc length between points of contact
+  cos_al = np.clip(np.dot(a / np.linalg.norm(a), b / np.linalg.norm(b)),
+                   -1.0, 1.0)
+  al = np.arccos(cos_al)
+  if np.isclose(np.sin(al), 0):
+    # vectors are parallel, so the interpolation is linear
+    return (1.0 - t) * a + t * b
+  return (np.sin((1.0 - t) * al) * a + np.sin(t * al) * b) / np.sin(al)
+
+def slerp_quaternion(q1, q2, t):
+  """Computes spherical linear interpolations between two quaternions at
+  several fractions along the shortest path. Equivalent to
+  math3d.slerp_quaternion evaluated for each fraction.
+  q1 -- numpy array of shape (4,) -- The value returned when t=0
+  q2 -- numpy array of shape (4,) -- The value returned when t=1
+  t  -- numpy array of shape (N,) of fractions between q1 and q2. 0 <= t <= 1
+  returns a numpy array of shape (N, 4)
+  """
+  q1 = normalize(q1)
+  q2 = normalize(q2)
+  t = np.asarray(t, dtype=float)[:, None]
+  d = np.dot(q1, q2)
+  if abs(abs(d) - 1.0) < np.finfo(float).eps * 4.0:
+    return np.broadcast_to(q1, (len(t), 4)).copy()
+  if d < 0.0:
+    # take the shortest path
+    d = -d
+    q2 = -q2
+  angle = np.arccos(np.clip(d, -1.0, 1.0))
+  if np.isclose(angle, 0):
+    return np.broadcast_to(q1, (len(t), 4)).copy()
+  return (np.sin((1.0 - t) * angle) * q1 + np.sin(t * angle) * q2) \
+           / np.sin(angle)
+
+def linear_waypoints(start, end, increment):
+  """Computes poses along a straight line between two poses, excluding the
+  start pose and including the end pose. Orientation is interpolated with
+  slerp.
+  start     -- numpy array of shape (7,)
+  end       -- numpy array of shape (7,)
+  increment -- maximal distance between consecutive positions (meters)
+  returns a numpy array of shape (N, 7)
+  """
+  start = np.asarray(start, dtype=float)
+  end = np.asarray(end, dtype=float)
+  length = np.linalg.norm(end[:3] - start[:3])
+  count = max(1, int(np.ceil(length / increment)))
+  t = np.arange(1, count + 1) / count
+  positions = start[:3] + t[:, None] * (end[:3] - start[:3])
+  orientations = slerp_quaternion(start[3:], end[3:], t)
+  return np.hstack([positions, orientations])
+
+def adaptive_circular_waypoints(start, end, center, max_deviation,
+                                max_rotation, max_step):
+  """Computes poses along a circular arc around a center between two poses,
+  with orientation interpolated by slerp, but places them only as densely as
+  needed. Intervals between waypoints are subdivided until the arc deviates
+  from the straight line between their ends by no more than max_deviation at
+  their middle, which bounds the deviation of a circular arc everywhere, and
+  until orientation changes by no more than max_rotation across them. Since
+  the middle deviation grows with the square of an interval's length, each
+  interval is divided into as many equal parts as needed to satisfy all
+  bounds if the path changed uniformly across it. The start pose is excluded
+  and the end pose is included.
+  start         -- numpy array of shape (7,)
+  end           -- numpy array of shape (7,)
+  center        -- numpy array of shape (3,) of the circle's center
+  max_deviation -- maximal distance between the arc and the path through the
+                   waypoints (meters)
+  max_rotation  -- maximal orientation change between waypoints (radians)
+  max_step      -- maximal distance between consecutive positions (meters)
+  returns a numpy array of shape (N, 7) with N >= 2
+  """
+  start = np.asarray(start, dtype=float)
+  end = np.asarray(end, dtype=float)
+  center = np.asarray(center, dtype=float)
+  poc1 = start[:3] - center
+  poc2 = end[:3] - center
+  def positions(t):
+    return center + slerp(poc1, poc2, t)
+  def orientations(t):
+    return slerp_quaternion(start[3:], end[3:], t)
+  # non-uniform paths, i.e. arcs whose ends are not equally far from the
+  # center, may need a few rounds of subdivision
+  MAX_ROUNDS = 8
+  t = np.array([0.0, 1.0])
+  for _ in range(MAX_ROUNDS):
+    p = positions(t)
+    q = orientations(t)
+    deviation = norm(positions((t[:-1] + t[1:]) / 2) - (p[:-1] + p[1:]) / 2)
+    step = norm(p[1:] - p[:-1])
+    rotation = 2.0 * np.arccos(np.clip(np.abs(dot(q[:-1], q[1:])), 0.0, 1.0))
+    parts = np.ceil(np.maximum.reduce([np.sqrt(deviation / max_deviation),
+                                       rotation / max_rotation,
+                                       step / max_step,
+                                       np.ones_like(step)])).astype(int)
+    if np.all(parts == 1):
+      break
+    t = np.concatenate([np.linspace(a, b, k, endpoint=False)
+                        for a, b, k in zip(t[:-1], t[1:], parts)] + [[1.0]])
+  if len(t) < 3:
+    # a circular trajectory needs more than a single waypoint
+    t = np.array([0.0, 0.5, 1.0])
+  waypoints = np.hstack([positions(t[1:]), orientations(t[1:])])
+  waypoints[-1] = end
+  return waypoints
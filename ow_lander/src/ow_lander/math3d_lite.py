@@ -0,0 +1,311 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Lightweight vector and quaternion value types with the same function surface
+as math3d. Constructing a geometry_msgs message is comparatively expensive, so
+intermediate results of geometric computations should use these types and be
+converted to messages only where they are handed to ROS. Functions accept
+either these types or geometry_msgs types as arguments, but always return
+these types.
+"""
+
+from math import sqrt, isclose, acos, sin, cos, atan2
+from geometry_msgs.msg import Quaternion, Vector3, Point, Pose
+
+class Vec3:
+  """A 3D vector that can stand in for geometry_msgs Vector3 and Point"""
+
+  __slots__ = ('x', 'y', 'z')
+
+  def __init__(self, x=0.0, y=0.0, z=0.0):
+    self.x = x
+    self.y = y
+    self.z = z
+
+  def __repr__(self):
+    return f"Vec3({self.x}, {self.y}, {self.z})"
+
+  def __eq__(self, other):
+    return isinstance(other, Vec3) \
+      and (self.x, self.y, self.z) == (other.x, other.y, other.z)
+
+  @classmethod
+  def from_msg(cls, msg):
+    """msg -- geometry_msgs Vector3 or Point"""
+    return cls(msg.x, msg.y, msg.z)
+
+  def to_msg(self, msg_type=Vector3):
+    """msg_type -- geometry_msgs Vector3 or Point"""
+    return msg_type(self.x, self.y, self.z)
+
+
+class Quat:
+  """A quaternion that can stand in for geometry_msgs Quaternion"""
+
+  __slots__ = ('x', 'y', 'z', 'w')
+
+  def __init__(self, x=0.0, y=0.0, z=0.0, w=0.0):
+    self.x = x
+    self.y = y
+    self.z = z
+    self.w = w
+
+  def __repr__(self):
+    return f"Quat({self.x}, {self.y}, {self.z}, {self.w})"
+
+  def __eq__(self, other):
+    return isinstance(other, Quat) \
+      and (self.x, self.y, self.z, self.w) \
+          == (other.x, other.y, other.z, other.w)
+
+  @classmethod
+  def from_msg(cls, msg):
+    """msg -- geometry_msgs Quaternion"""
+    return cls(msg.x, msg.y, msg.z, msg.w)
+
+  def to_msg(self):
+    return Quaternion(self.x, self.y, self.z, self.w)
+
+
+def pose_msg(position, orientation):
+  """Creates a message from a position and an orientation
+  position    -- Vec3, geometry_msgs Vector3 or Point
+  orientation -- Quat or geometry_msgs Quaternion
+  returns a geometry_msgs Pose
+  """
+  return Pose(Point(position.x, position.y, position.z),
+              Quaternion(orientation.x, orientation.y, orientation.z,
+                         orientation.w))
+
+def add(a, b):
+  """Adds two vectors
+  a -- Vec3, geometry_msgs Vector3 or Point
+  b -- Vec3, geometry_msgs Vector3 or Point
+  returns a Vec3 that represents a + b
+  """
+  return Vec3(a.x + b.x, a.y + b.y, a.z + b.z)
+
+def subtract(a, b):
+  """Subtracts two vectors
+  a -- Vec3, geometry_msgs Vector3 or Point
+  b -- Vec3, geometry_msgs Vector3 or Point
+  returns a Vec3 that represents a - b
+  """
+  return Vec3(a.x - b.x, a.y - b.y, a.z - b.z)
+
+def scalar_multiply(a, b):
+  """Computes the multiplication of the scalar a to the vector b
+  a -- float
+  b -- Vec3, geometry_msgs Vector3 or Point
+  returns a Vec3 that is the result of ab
+  """
+  return Vec3(a * b.x, a * b.y, a * b.z)
+
+def quaternion_inverse(a):
+  """Compute the inverse of a quaternion
+  a -- Quat or geometry_msgs Quaternion
+  returns the quaternion inverse of a
+  """
+  return Quat(-a.x, -a.y, -a.z, a.w)
+
+def quaternion_multiply(a, b):
+  """Compute the product of two quaternions multiplied together (a * b)
+  a -- Quat or geometry_msgs Quaternion
+  b -- Quat or geometry_msgs Quaternion
+  returns quaternion product of a and b
+  """
+  return Quat(a.w * b.x + a.x * b.w + a.y * b.z - a.z * b.y,
+              a.w * b.y - a.x * b.z + a.y * b.w + a.z * b.x,
+              a.w * b.z + a.x * b.y - a.y * b.x + a.z * b.w,
+              a.w * b.w - a.x * b.x - a.y * b.y - a.z * b.z)
+
+def quaternion_rotate(q, v):
+  """Perform a passive rotation of a vector using a quaternion
+  q -- Quat or geometry_msgs Quaternion -- Should be a unit quaternion
+  v -- Vec3, geometry_msgs Vector3 or Point
+  returns v rotated by q as a Vec3
+  """
+  # expanded form of q * v * q^-1 that skips the intermediate quaternions
+  tx = 2.0 * (q.y * v.z - q.z * v.y)
+  ty = 2.0 * (q.z * v.x - q.x * v.z)
+  tz = 2.0 * (q.x * v.y - q.y * v.x)
+  return Vec3(v.x + q.w * tx + q.y * tz - q.z * ty,
+              v.y + q.w * ty + q.z * tx - q.x * tz,
+              v.z + q.w * tz + q.x * ty - q.y * tx)
+
+def dot(a, b):
+  """Computes dot product between vectors/quaternions a and b (a * b)
+  a -- Vec3, Quat, or geometry_msgs Vector3, Point, or Quaternion
+  b -- Vec3, Quat, or geometry_msgs Vector3, Point, or Quaternion
+  returns a float that is the result of a * b
+  """
+  result = a.x * b.x + a.y * b.y + a.z * b.z
+  if hasattr(a, 'w'):
+    result += a.w * b.w
+  return result
+
+def cross(a, b):
+  """Computes the cross product between vectors a and b (a x b)
+  a -- Vec3, geometry_msgs Vector3 or Point
+  b -- Vec3, geometry_msgs Vector3 or Point
+  returns a Vec3 that is the result of a x b
+  """
+  return Vec3(a.y*b.z - a.z*b.y, a.z*b.x - a.x*b.z, a.x*b.y - a.y*b.x)
+
+def norm_squared(v):
+  """Computes the squared norm (or length) of a vector or quaternion"""
+  return dot(v, v)
+
+def norm(v):
+  """Computes the norm (or length) of a vector or quaternion"""
+  return sqrt(norm_squared(v))
+
+def normalize(v):
+  """Normalizes a vector or quaternion
+  v -- Vec3, Quat, or geometry_msgs Vector3, Point, or Quaternion
+  returns the normalized version of v as a Vec3 or Quat
+  """
+  n = norm(v)
+  assert(n != 0)
+  if hasattr(v, 'w'):
+    return Quat(v.x / n, v.y / n, v.z / n, v.w / n)
+  else:
+    return Vec3(v.x / n, v.y / n, v.z / n)
+
+def is_normalized(v):
+  """Normalization check
+  v -- Vec3, geometry_msgs Vector3 or Point
+  returns true if v is normalized
+  """
+  return norm_squared(v) == 1.0
+
+def distance(a, b):
+  """Compute the distance between vectors a and b, same as norm(b - a)"""
+  return sqrt((b.x - a.x)**2 + (b.y - a.y)**2 + (b.z - a.z)**2)
+
+def orthogonal(v):
+  """Returns an orthogonal vector to v
+  v -- Vec3, geometry_msgs Vector3 or Point
+  returns the orthogonal Vec3 of v
+  """
+  normalized = normalize(v)
+  x = abs(normalized.x)
+  y = abs(normalized.y)
+  z = abs(normalized.z)
+  basis = None
+  if x < y:
+    basis = Vec3(1, 0, 0) if x < z else Vec3(0, 0, 1)
+  else:
+    basis = Vec3(0, 1, 0) if y < z else Vec3(0, 0, 1)
+  return cross(normalized, basis)
+
+def quaternion_from_euler(x, y, z):
+  """Equivalent to math3d.quaternion_from_euler (static xyz axes)
+  x -- Radian rotation around x (roll)
+  y -- Radian rotation around y (pitch)
+  z -- Radian rotation around z (yaw)
+  returns a Quat
+  """
+  ci, si = cos(x / 2), sin(x / 2)
+  cj, sj = cos(y / 2), sin(y / 2)
+  ck, sk = cos(z / 2), sin(z / 2)
+  cc, cs = ci * ck, ci * sk
+  sc, ss = si * ck, si * sk
+  return Quat(cj * sc - sj * cs,
+              cj * ss + sj * cc,
+              cj * cs - sj * sc,
+              cj * cc + sj * ss)
+
+def euler_from_quaternion(q):
+  """Equivalent to math3d.euler_from_quaternion (static xyz axes)
+  q -- Quat or geometry_msgs Quaternion
+  returns a 3-tuple of Euler angles (x, y, z)
+  """
+  q = normalize(q)
+  m00 = 1.0 - 2.0 * (q.y * q.y + q.z * q.z)
+  m10 = 2.0 * (q.x * q.y + q.z * q.w)
+  m20 = 2.0 * (q.x * q.z - q.y * q.w)
+  m21 = 2.0 * (q.y * q.z + q.x * q.w)
+  m22 = 1.0 - 2.0 * (q.x * q.x + q.y * q.y)
+  cy = sqrt(m00 * m00 + m10 * m10)
+  if cy > 1e-12:
+    return (atan2(m21, m22), atan2(-m20, cy), atan2(m10, m00))
+  m11 = 1.0 - 2.0 * (q.x * q.x + q.z * q.z)
+  m12 = 2.0 * (q.y * q.z - q.x * q.w)
+  return (atan2(-m12, m11), atan2(-m20, cy), 0.0)
+
+def slerp_quaternion(q1, q2, t):
+  """Computes a spherical linear interpolation (slerp) between two quaternions
+  along the shortest path. Equivalent to math3d.slerp_quaternion.
+  q1 -- Quat or geometry_msgs Quaternion -- The value returned when t=0
+  q2 -- Quat or geometry_msgs Quaternion -- The value returned when t=1
+  t  -- Fraction between q1 and q2. 0 <= t <= 1
+  returns a Quat between q1 and q2 by a fractional amount t
+  """
+  q1 = normalize(q1)
+  q2 = normalize(q2)
+  if t == 0.0:
+    return q1
+  if t == 1.0:
+    return q2
+  d = dot(q1, q2)
+  EPSILON = 8.881784197001252e-16 # 4 times machine epsilon
+  if abs(abs(d) - 1.0) < EPSILON:
+    return q1
+  if d < 0.0:
+    d = -d
+    q2 = Quat(-q2.x, -q2.y, -q2.z, -q2.w)
+  angle = acos(d)
+  if abs(angle) < EPSILON:
+    return q1
+  w1 = sin((1.0 - t) * angle) / sin(angle)
+  w2 = sin(t * angle) / sin(angle)
+  return Quat(w1 * q1.x + w2 * q2.x, w1 * q1.y + w2 * q2.y,
+              w1 * q1.z + w2 * q2.z, w1 * q1.w + w2 * q2.w)
+
+def slerp(a, b, t):
+  """Compute a spherical linear interpolation (slerp) between two vectors.
+  a -- Vec3, geometry_msgs Point/Vector3 -- The value returned when t=0
+  b -- Vec3, geometry_msgs Point/Vector3 -- The value returned when t=1
+  t -- Fraction between a and b. 0 <= t <= 1
+  returns a Vec3 between a and b by a fractional amount t
+  """
+  # handle case where points of contact are within floating-precision error of
+  # each other
+  if isclose(distance(a, b), 0):
+    return Vec3(a.x, a.y, a.z)
+  # compute arc length between points of contact
+  al = acos(dot(normalize(a), normalize(b)))
+  # compute scalar weight for a and b respectively
+  weight_a = sin((1 - t) * al) / sin(al)
+  weight_b = sin(t * al) / sin(al)
+  return Vec3(weight_a * a.x + weight_b * b.x,
+              weight_a * a.y + weight_b * b.y,
+              weight_a * a.z + weight_b * b.z)
+
+def quaternion_rotation_between(a, b):
+  """Computes the quaternion rotation between the vectors a and b.
+  a -- Vec3, geometry_msgs Vector3 or Point
+  b -- Vec3, geometry_msgs Vector3 or Point
+  returns a Quat that represents a rotation from a to b
+  """
+  a = normalize(a)
+  b = normalize(b)
+  k = dot(a, b)
+  ab_norm = sqrt(norm_squared(a) * norm_squared(b))
+  if isclose(k / ab_norm, -1): # special case of a = -b
+    o = normalize(orthogonal(a))
+    return Quat(o.x, o.y, o.z, 0)
+  w = k + ab_norm
+  v = cross(a, b)
+  return normalize(Quat(v.x, v.y, v.z, w))
+
+def vectors_approx_equivalent(a, b, tolerance):
+  """Check if two vectors are nearly the same.
+  a -- Vec3, geometry_msgs Point/Vector3
+  b -- Vec3, geometry_msgs Point/Vector3
+  tolerance -- The maximal distance positions can differ by
+  returns True if the difference between a and b are below the tolerance
+  """
+  return distance(a, b) <= tolerance
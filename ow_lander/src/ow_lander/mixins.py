@@ -9,7 +9,11 @@ define non-arm mixins.
 """
 
 import sys
+import time
+import threading
+from io import BytesIO
 import rospy
+import genpy
 import moveit_commander
 from abc import ABC, abstractmethod
 from std_msgs.msg import Float64
@@ -17,17 +21,23 @@ from geometry_msgs.msg import Pose, PoseStamped, PointStamped
 from tf2_geometry_msgs import do_transform_pose
 from owl_msgs.msg import ArmFaultsStatus
 
+import ow_lander.srv
+
 from ow_lander import constants
 from ow_lander import math3d
 from ow_lander.common import (radians_equivalent, in_closed_range,
                               create_header, wait_for_subscribers)
-from ow_lander.exception import (ArmPlanningError, ArmExecutionError,
-                                 AntennaPlanningError, AntennaExecutionError)
+from ow_lander.exception import (ActionError, ArmPlanningError,
+                                 ArmExecutionError, AntennaPlanningError,
+                                 AntennaExecutionError)
 from ow_lander.subscribers import LinkStateSubscriber, JointAnglesSubscriber
 from ow_lander.arm_interface import OWArmInterface
 from ow_lander.faults_interface import FaultsInterface
 from ow_lander.frame_transformer import FrameTransformer
-from ow_lander.trajectory_sequence import TrajectorySequence
+from ow_lander.pose_provider import EndEffectorPoseProvider
+from ow_lander.trajectory_sequence import TrajectorySequence, SequenceCheckpoint
+from ow_lander.trajectory_pipeline import SegmentPipeline
+from ow_lander.fk_service import ForwardKinematicsService
 
 class ArmActionMixin:
   """Enables an action server to control the OceanWATERS arm. This or one of its
@@ -35,9 +45,16 @@ class ArmActionMixin:
   e.g.
   class FooArmActionServer(ArmActionMixin, ActionServerBase):
     ...
+  The rate in hertz at which feedback is published during trajectory execution
+  is set by the following parameters in the private namespace of the node:
+    feedback_rate/<action name> -- rate of the action server
+    execution_feedback_rate     -- rate of action servers without their own.
+                                   default: 100
   """
   def __init__(self, *args, **kwargs):
     super().__init__(*args, **kwargs)
+    self._feedback_rate = rospy.get_param(f'~feedback_rate/{self.name}',
+      rospy.get_param('~execution_feedback_rate', 100.0))
     # initialize moveit interface for arm control
     moveit_commander.roscpp_initialize(sys.argv)
     # initialize/reference
@@ -45,22 +62,289 @@ class ArmActionMixin:
     self._arm_faults = FaultsInterface()
     # initialize interface for querying scoop tip position
     self._arm_tip_monitor = LinkStateSubscriber('lander::l_scoop_tip')
+    # a goal that is waiting for the arm gives up its place in the queue when
+    # it is preempted
+    self._server.register_preempt_callback(self._cancel_arm_checkout)
     self._start_server()
 
+  def _cancel_arm_checkout(self):
+    self._arm.cancel_checkout(self.name,
+                              "Goal was preempted while waiting for the arm")
+
+
+class PlanOnlyMixin(ArmActionMixin):
+  """Advertises the <action name>/plan service, which plans the trajectory of
+  a goal with the server's plan_trajectory method without executing it. The
+  service is available while no action has checked out the arm.
+  plan_trajectory must plan with the move_group_scoop and move_group_grinder
+  properties of the server. Plan-only requests are planned with move groups
+  of their own, so they never change the targets, start states, or planners
+  of the move groups of OWArmInterface that executing actions plan with.
+  """
+
+  # plan-only requests of all servers share one MoveGroupCommander per move
+  # group, keyed on group name, so they are planned one at a time
+  _plan_only_lock = threading.Lock()
+  _plan_only_groups = dict()
+
+  def __init__(self, *args, **kwargs):
+    # marks the thread that handles a plan-only request
+    self._plan_only = threading.local()
+    super().__init__(*args, **kwargs)
+    self._plan_service = rospy.Service(f'{self.name}/plan',
+                                       ow_lander.srv.PlanTrajectory,
+                                       self._handle_plan_request)
+
+  def is_planning_only(self):
+    """returns True if called while handling a plan-only request"""
+    return getattr(self._plan_only, 'active', False)
+
+  def _get_move_group(self, group_name, shared):
+    if not self.is_planning_only():
+      return shared
+    # only called while _plan_only_lock is held
+    group = PlanOnlyMixin._plan_only_groups.get(group_name)
+    if group is None:
+      group = moveit_commander.MoveGroupCommander(group_name)
+      PlanOnlyMixin._plan_only_groups[group_name] = group
+    return group
+
+  @property
+  def move_group_scoop(self):
+    """MoveGroupCommander of the arm move group to plan with"""
+    return self._get_move_group('arm', self._arm.move_group_scoop)
+
+  @property
+  def move_group_grinder(self):
+    """MoveGroupCommander of the grinder move group to plan with"""
+    return self._get_move_group('grinder', self._arm.move_group_grinder)
+
+  def plan_without_executing(self, goal):
+    """Plan the trajectory of goal with plan_trajectory as a plan-only request
+    returns a RobotTrajectory
+    raises ArmPlanningError if planning failed
+    """
+    with self._plan_only_lock:
+      self._plan_only.active = True
+      try:
+        return self.plan_trajectory(goal)
+      finally:
+        self._plan_only.active = False
+
+  def _handle_plan_request(self, request):
+    response = ow_lander.srv.PlanTrajectoryResponse()
+    # a trajectory planned while the arm moves would start where it no longer
+    # is. An action that checks out the arm after this check cannot interfere
+    # with the request, which plans with move groups of its own.
+    in_use_by = self._arm.in_use_by()
+    if in_use_by is not None:
+      response.message = f"Arm is checked out by the {in_use_by} action " \
+                         "server. Plan again once it has finished."
+      return response
+    goal = self.goal_type()
+    try:
+      goal.deserialize(bytes(request.goal))
+    except genpy.DeserializationError as err:
+      response.message = f"Goal is not a {self.goal_type.__name__}: {err}"
+      return response
+    start = time.time()
+    try:
+      trajectory = self.plan_without_executing(goal)
+    except ArmPlanningError as err:
+      response.message = str(err)
+      return response
+    response.success = True
+    response.trajectory = trajectory
+    response.planning_time = time.time() - start
+    points = trajectory.joint_trajectory.points
+    if points:
+      response.duration = points[-1].time_from_start.to_sec()
+    rospy.loginfo(f"{self.name} planned a {response.duration:.1f} second "
+                  f"trajectory in {response.planning_time:.2f} seconds without "
+                  "executing it")
+    return response
+
+
+class ArmTrajectoryMixin(PlanOnlyMixin, ABC):
+  """Plans a trajectory from the goal and executes it. If pipelined_execution is
+  True, each segment of a sequence created by create_sequence begins executing
+  as soon as it is planned, while later segments are planned in the
+  background. A planning failure of a later segment aborts the action once the
+  arm has come to rest at the end of the segment preceding it. Pipelined
+  segments are retimed one by one, so they are not blended with each other.
+  The planning time of a sequence is bounded by the following parameters in
+  the private namespace of the node, in seconds, where 0 means unbounded:
+    planning_deadline/<action name> -- deadline of the action server's
+                                       sequences
+    planning_deadline/default       -- deadline of action servers without
+                                       their own. default: 0
+  If the parameter resume_failed_goals is True, the progress of each goal is
+  recorded in a SequenceCheckpoint. When a goal fails and the same goal is
+  sent again before the arm moves, it resumes at the segment that did not
+  complete. Only segments executed one by one by pipelined execution are
+  recorded as completed.
+  If the parameter arm_arbitration/plan_ahead is True, a goal that has to wait
+  for the arm is planned as a plan-only request while it waits, so it plans
+  with the move groups of plan-only requests and never with those of the
+  action server using the arm. The trajectory is executed if it starts where
+  the arm is when the goal is granted the arm, otherwise the goal is planned
+  again.
+  """
 
-class ArmTrajectoryMixin(ArmActionMixin, ABC):
+  pipelined_execution = False
 
   def __init__(self, *args, **kwargs):
+    self._pipeline = None
+    self._pipelining_enabled = rospy.get_param('~pipelined_execution', True)
+    self._planning_deadline = rospy.get_param(
+      f'~planning_deadline/{self.name}',
+      rospy.get_param('~planning_deadline/default', 0.0))
+    self._resume_enabled = rospy.get_param('~resume_failed_goals', True)
+    # checkpoint of the most recent goal if it failed
+    self._checkpoint = None
+    # checkpoint of the goal in progress
+    self._active_checkpoint = None
+    self._plan_ahead_enabled = rospy.get_param('~arm_arbitration/plan_ahead',
+                                               False)
+    # trajectory planned while waiting for the arm
+    self._planned_ahead = None
     super().__init__(*args, **kwargs)
+
+  def _checkout_arm(self, goal):
+    """Check out the arm, planning goal while waiting for it if plan-ahead is
+    enabled and the arm is in use
+    """
+    self._planned_ahead = None
+    if not self._plan_ahead_enabled or self._arm.in_use_by() is None:
+      self._arm.checkout_arm(self.name)
+      return
+    planned = dict()
+    def plan_ahead():
+      try:
+        planned['trajectory'] = self.plan_without_executing(goal)
+      except ArmPlanningError as err:
+        rospy.logdebug(f"{self.name} failed to plan ahead: {err}")
+    thread = threading.Thread(target=plan_ahead, daemon=True)
+    thread.start()
+    self._arm.checkout_arm(self.name)
+    thread.join()
+    self._planned_ahead = planned.get('trajectory')
+
+  def _starts_at_current_positions(self, trajectory):
+    """returns True if the first point of trajectory is at the current joint
+    positions of the arm
+    """
+    state = self._arm.robot.get_current_state().joint_state
+    current = dict(zip(state.name, state.position))
+    start = trajectory.joint_trajectory.points[0].positions
+    return all(
+      name in current and radians_equivalent(current[name], position,
+                                             constants.ARM_JOINT_TOLERANCE)
+        for name, position in zip(trajectory.joint_trajectory.joint_names,
+                                  start)
+    )
+
+  def create_sequence(self, move_group, end_effector=None, segments=None):
+    """Create a TrajectorySequence that participates in pipelined execution
+    and is bound by the planning deadline of the action server. Child classes
+    should use this instead of constructing TrajectorySequence in
+    plan_trajectory.
+    segments -- number of segments that will be planned, over which the
+                planning deadline is divided
+    """
+    segment_cb = None
+    if self._pipeline is not None and not self.is_planning_only():
+      segment_cb = self._pipeline.push_segment
+    sequence = TrajectorySequence(self._arm.robot, move_group, end_effector,
+                                  segment_cb=segment_cb, action=self.name)
+    if self._planning_deadline > 0:
+      sequence.set_deadline(self._planning_deadline, segments)
+    if self._active_checkpoint is not None and not self.is_planning_only():
+      sequence.set_checkpoint(self._active_checkpoint)
+    return sequence
+
+  def _checkout_checkpoint(self, goal):
+    """returns the checkpoint of the failed goal if goal resumes it, otherwise
+    a new checkpoint for goal, or None if resuming is disabled
+    """
+    if not self._resume_enabled:
+      return None
+    buffer = BytesIO()
+    goal.serialize(buffer)
+    checkpoint, self._checkpoint = self._checkpoint, None
+    if checkpoint is not None and checkpoint.can_resume(buffer.getvalue()):
+      checkpoint.resume()
+      rospy.loginfo(f"{self.name} resumes the failed goal at segment "
+                    f"{checkpoint.resume_index}")
+      return checkpoint
+    return SequenceCheckpoint(buffer.getvalue())
+
+  def _plan_and_execute(self, goal, action_feedback_cb=None):
+    fk_service = ForwardKinematicsService()
+    before = fk_service.get_statistics()
+    try:
+      self._plan_and_execute_sequence(goal, action_feedback_cb)
+    finally:
+      after = fk_service.get_statistics()
+      hits = after['hits'] - before['hits']
+      queries = hits + after['misses'] - before['misses']
+      if queries > 0:
+        rospy.loginfo(f"{self.name} made {after['calls'] - before['calls']} "
+                      f"{ForwardKinematicsService.SRV_COMPUTE_FK} calls for "
+                      f"{queries} pose queries, answering {hits} from memory")
+
+  def _plan_and_execute_sequence(self, goal, action_feedback_cb):
+    checkpoint = self._checkout_checkpoint(goal)
+    self._active_checkpoint = checkpoint
+    try:
+      self._plan_and_execute_checkpointed(goal, action_feedback_cb, checkpoint)
+    except ActionError:
+      if checkpoint is not None:
+        # keep the progress of the goal in case it is sent again
+        checkpoint.suspend()
+        self._checkpoint = checkpoint
+      raise
+    finally:
+      self._active_checkpoint = None
+
+  def _plan_and_execute_checkpointed(self, goal, action_feedback_cb,
+                                     checkpoint):
+    trajectory, self._planned_ahead = self._planned_ahead, None
+    if trajectory is not None and trajectory.joint_trajectory.points:
+      if self._starts_at_current_positions(trajectory):
+        rospy.loginfo(f"{self.name} executes the trajectory it planned while "
+                      "waiting for the arm")
+        self._arm.execute_arm_trajectory(trajectory,
+                                         action_feedback_cb=action_feedback_cb,
+                                         feedback_rate=self._feedback_rate)
+        return
+      rospy.loginfo(f"{self.name} plans again because the arm moved while it "
+                    "waited for the arm")
+    if not (self.pipelined_execution and self._pipelining_enabled):
+      self._arm.execute_arm_trajectory(self.plan_trajectory(goal),
+                                       action_feedback_cb=action_feedback_cb,
+                                       feedback_rate=self._feedback_rate)
+      return
+    self._pipeline = SegmentPipeline(lambda: self.plan_trajectory(goal))
+    self._pipeline.start()
+    try:
+      for segment in self._pipeline.segments():
+        self._arm.execute_arm_trajectory(segment,
+                                         action_feedback_cb=action_feedback_cb,
+                                         feedback_rate=self._feedback_rate)
+        if checkpoint is not None:
+          checkpoint.record_executed()
+    finally:
+      self._pipeline.cancel()
+      self._pipeline = None
+
   def execute_action(self, goal):
     # Reset faults messages before the arm start moving
     self._arm_faults.reset_arm_faults_flags()
     try:
-      self._arm.checkout_arm(self.name)
-      self._arm.execute_arm_trajectory(
-        self.plan_trajectory(goal),
-        action_feedback_cb = self.publish_feedback_cb
-      )
+      self._checkout_arm(goal)
+      self._plan_and_execute(goal,
+                             action_feedback_cb=self.publish_feedback_cb)
     except ArmExecutionError as err:
       self._arm.checkin_arm(self.name)
       self._set_aborted(str(err))
@@ -88,22 +372,38 @@ class ArmTrajectoryMixin(ArmActionMixin, ABC):
 
 
 class GrinderTrajectoryMixin(ArmTrajectoryMixin):
+  """Executes the trajectory with the grinder_controller. The switch to it
+  runs while the trajectory is planned. The grinder_controller does not drive
+  j_scoop_yaw, so the switch back to the arm_controller begins in the
+  background when the goal ends, unless the next goal waiting for the arm also
+  uses the grinder_controller.
+  """
+
+  CONTROLLER = 'grinder_controller'
 
   def __init__(self, *args, **kwargs):
     super().__init__(*args, **kwargs)
+    self._arm.register_controller(self.name, self.CONTROLLER)
 
   def _cleanup(self):
-    self._arm.switch_to_arm_controller()
-    self._arm.checkin_arm(self.name)
+    try:
+      if self._arm.get_next_controller() != self.CONTROLLER:
+        self._arm.prepare_controller(OWArmInterface.DEFAULT_CONTROLLER)
+    finally:
+      self._arm.checkin_arm(self.name)
 
   def execute_action(self, goal):
     # Reset faults messages before the arm start moving
     self._arm_faults.reset_arm_faults_flags()
     try:
-      self._arm.checkout_arm(self.name)
-      self._arm.switch_to_grinder_controller()
-      plan = self.plan_trajectory(goal)
-      self._arm.execute_arm_trajectory(plan)
+      self._checkout_arm(goal)
+    except ArmExecutionError as err:
+      # the arm was never checked out, so there is nothing to clean up
+      self._set_aborted(str(err))
+      return
+    try:
+      self._arm.prepare_controller(self.CONTROLLER)
+      self._plan_and_execute(goal)
     except ArmExecutionError as err:
       self._cleanup()
       self._set_aborted(str(err))
@@ -111,7 +411,6 @@ class GrinderTrajectoryMixin(ArmTrajectoryMixin):
       self._cleanup()
       self._arm_faults.set_arm_faults_flag(ArmFaultsStatus.TRAJECTORY_GENERATION)
       self._set_aborted(str(err))
-      
     else:
       self._cleanup()
       self._set_succeeded(f"{self.name} trajectory succeeded")
@@ -142,10 +441,12 @@ class ModifyJointValuesMixin(ArmActionMixin, ABC):
     try:
       self._arm.checkout_arm(self.name)
       new_positions = self.modify_joint_positions(goal)
-      sequence = TrajectorySequence(self._arm.robot, self._arm.move_group_scoop)
+      sequence = TrajectorySequence(self._arm.robot, self._arm.move_group_scoop,
+                                    action=self.name)
       sequence.plan_to_joint_positions(new_positions)
       self._arm.execute_arm_trajectory(sequence.merge(),
-        action_feedback_cb=self.publish_feedback_cb)
+        action_feedback_cb=self.publish_feedback_cb,
+        feedback_rate=self._feedback_rate)
     except ArmExecutionError as err:
       self._arm.checkin_arm(self.name)
       self._set_aborted(str(err),
@@ -309,6 +610,9 @@ class FrameMixin:
                     default: rospy.Duration(0)
     returns geometry_msgs.PoseStamped
     """
+    if timestamp == rospy.Time(0):
+      # the latest pose is shared by all callers until its transform changes
+      return EndEffectorPoseProvider().get_pose(self._end_effector, frame_id)
     pose = self._arm.move_group_scoop.get_current_pose(self._end_effector)
     pose.header.stamp = timestamp
     return FrameTransformer().transform(pose, frame_id, timeout)
@@ -320,8 +624,8 @@ class FrameMixin:
     """
     pose_t = self.transform_to_planning_frame(pose)
     # plan trajectory to pose in the arm's pose frame
-    sequence = TrajectorySequence(
-      self._arm.robot, self._arm.move_group_scoop, self._end_effector)
+    sequence = TrajectorySequence(self._arm.robot, self._arm.move_group_scoop,
+                                  self._end_effector, action=self.name)
     sequence.plan_to_pose(pose_t.pose)
     return sequence.merge()
 
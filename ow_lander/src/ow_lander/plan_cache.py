@@ -0,0 +1,167 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a bounded least-recently-used cache of planned arm trajectories so
+that repeated planning requests from the same start state can skip MoveIt.
+"""
+
+import os
+import pickle
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+import rospy
+from moveit_msgs.msg import RobotTrajectory
+
+from ow_lander import constants
+from ow_lander.common import Singleton, radians_equivalent
+
+def serialize_trajectory(trajectory):
+  """Serialize a trajectory into its compact ROS wire format
+  trajectory -- moveit_msgs RobotTrajectory
+  returns bytes
+  """
+  buffer = BytesIO()
+  trajectory.serialize(buffer)
+  return buffer.getvalue()
+
+def deserialize_trajectory(data):
+  """Inverse of serialize_trajectory
+  data -- bytes
+  returns a new moveit_msgs RobotTrajectory
+  """
+  return RobotTrajectory().deserialize(data)
+
+def trajectory_starts_at(trajectory, joint_positions,
+                         tolerance=constants.ARM_JOINT_TOLERANCE):
+  """Check if a trajectory begins at the provided joint positions
+  trajectory      -- moveit_msgs RobotTrajectory
+  joint_positions -- list of joint positions in radians
+  tolerance       -- maximal allowed deviation of any joint in radians
+  returns True if every joint of the trajectory's first point is within
+  tolerance of joint_positions
+  """
+  points = trajectory.joint_trajectory.points
+  if len(points) == 0 or len(points[0].positions) != len(joint_positions):
+    return False
+  return all(radians_equivalent(a, b, tolerance)
+             for a, b in zip(points[0].positions, joint_positions))
+
+def _quantize(value, resolution):
+  """Recursively round all floats within nested tuples to a resolution so they
+  can be used as part of a dictionary key.
+  """
+  if isinstance(value, float):
+    return round(value / resolution)
+  if isinstance(value, (tuple, list)):
+    return tuple(_quantize(x, resolution) for x in value)
+  return value
+
+
+class PlanCache(metaclass=Singleton):
+  """Trajectories planned by TrajectorySequence keyed on the move group, the
+  end-effector, the planner ID, the start joint positions, and the planning
+  call along with its arguments. Configured by the following parameters in the
+  private namespace of the node:
+    plan_cache/enabled          -- default: True
+    plan_cache/capacity         -- maximal number of trajectories held before the
+                                   least-recently-used is evicted. default: 64
+    plan_cache/joint_resolution -- start joint positions are quantized to this
+                                   resolution in radians. default: 0.01
+    plan_cache/path             -- file the cache is loaded from at startup and
+                                   saved to at shutdown. Persistence is disabled
+                                   when empty. default: ''
+  """
+
+  # floats in the planning call arguments are quantized to this resolution
+  REQUEST_RESOLUTION = 1e-4
+
+  def __init__(self):
+    self.enabled = rospy.get_param('~plan_cache/enabled', True)
+    self._capacity = rospy.get_param('~plan_cache/capacity', 64)
+    self._joint_resolution = rospy.get_param('~plan_cache/joint_resolution',
+                                             0.01)
+    self._path = os.path.expanduser(rospy.get_param('~plan_cache/path', ''))
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+    if self.enabled and self._path:
+      self.load()
+      rospy.on_shutdown(self.save)
+
+  def make_key(self, group_name, end_effector, planner_id, start_positions,
+               request):
+    """Create a cache key
+    group_name      -- name of the move group the trajectory is planned for
+    end_effector    -- name of the end-effector link or None
+    planner_id      -- ID of the MoveIt planner, or the configuration of the
+                       PlannerPortfolio when its planners race
+    start_positions -- joint positions the trajectory starts from
+    request         -- tuple that identifies the planning call and its arguments
+                       e.g. ('pose', x, y, z, qx, qy, qz, qw)
+    returns a hashable key
+    """
+    return (group_name, end_effector, planner_id,
+            _quantize(tuple(start_positions), self._joint_resolution),
+            _quantize(request, self.REQUEST_RESOLUTION))
+
+  def get(self, key, start_positions):
+    """Look up a trajectory
+    key             -- key created by make_key
+    start_positions -- the exact joint positions the trajectory must start from
+    returns a moveit_msgs RobotTrajectory or None if there is no trajectory for
+    key or if the cached trajectory does not start within
+    ARM_JOINT_TOLERANCE of start_positions
+    """
+    with self._lock:
+      data = self._entries.get(key)
+      if data is None:
+        return None
+      trajectory = deserialize_trajectory(data)
+      if not trajectory_starts_at(trajectory, start_positions):
+        # quantization allowed a start state that is too far off
+        return None
+      self._entries.move_to_end(key)
+      return trajectory
+
+  def put(self, key, trajectory):
+    """Insert a trajectory, evicting the least-recently-used if at capacity
+    key        -- key created by make_key
+    trajectory -- moveit_msgs RobotTrajectory
+    """
+    with self._lock:
+      self._entries[key] = serialize_trajectory(trajectory)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self._capacity:
+        self._entries.popitem(last=False)
+
+  def load(self):
+    """Replace the cache's contents with those in the file at plan_cache/path"""
+    if not os.path.isfile(self._path):
+      return
+    try:
+      with open(self._path, 'rb') as f:
+        entries = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as err:
+      rospy.logwarn(f"Failed to load plan cache from {self._path}: {err}")
+      return
+    with self._lock:
+      self._entries = OrderedDict(entries)
+      while len(self._entries) > self._capacity:
+        self._entries.popitem(last=False)
+    rospy.loginfo(f"Loaded {len(self._entries)} trajectories into the plan "
+                  f"cache from {self._path}")
+
+  def save(self):
+    """Write the cache's contents to the file at plan_cache/path"""
+    if not self._path:
+      return
+    with self._lock:
+      entries = list(self._entries.items())
+    try:
+      os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+      with open(self._path, 'wb') as f:
+        pickle.dump(entries, f)
+    except OSError as err:
+      rospy.logwarn(f"Failed to save plan cache to {self._path}: {err}")
@@ -0,0 +1,31 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a client of the <action name>/plan services, which plan the
+trajectories of arm action goals without executing them.
+"""
+
+from io import BytesIO
+
+import rospy
+
+import ow_lander.srv
+
+def plan_action_goal(action_name, goal, timeout=None):
+  """Plan the trajectory of an arm action goal without executing it. Planned
+  trajectories are added to the plan cache like those of executed goals.
+  action_name -- name of the action server, e.g. 'TaskScoopLinear'
+  goal        -- goal message of the action
+  timeout     -- seconds to wait for the service to become available, or None
+                 to wait indefinitely
+  returns an ow_lander PlanTrajectoryResponse
+  May raise rospy.ROSException if the service does not become available and
+  rospy.ServiceException if the service call fails
+  """
+  service_name = f'/{action_name}/plan'
+  rospy.wait_for_service(service_name, timeout)
+  buffer = BytesIO()
+  goal.serialize(buffer)
+  plan = rospy.ServiceProxy(service_name, ow_lander.srv.PlanTrajectory)
+  return plan(buffer.getvalue())
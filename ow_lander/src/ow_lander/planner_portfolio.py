@@ -0,0 +1,277 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a planner portfolio that races several MoveIt planners on the same
+planning problem and keeps the statistics needed to tune the portfolio.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import (ThreadPoolExecutor, FIRST_COMPLETED,
+                                wait as wait_for_futures)
+
+import yaml
+import rospy
+import moveit_commander
+
+from ow_lander.common import Singleton
+from ow_lander.exception import ArmPlanningError
+
+def trajectory_duration(trajectory):
+  """returns the duration of a moveit_msgs RobotTrajectory in seconds"""
+  return trajectory.joint_trajectory.points[-1].time_from_start.to_sec()
+
+
+class _PlannerStatistics:
+  """Running record of how a single planner fared in races"""
+
+  def __init__(self):
+    self.races = 0
+    self.wins = 0
+    self.failures = 0
+    # races that were won by another planner before this one finished, or
+    # that it sat out because its context was busy
+    self.unfinished = 0
+    self.planning_time_total = 0.0
+    self.duration_total = 0.0
+
+  def as_dict(self):
+    successes = self.races - self.failures - self.unfinished
+    return {
+      'races': self.races,
+      'wins': self.wins,
+      'failures': self.failures,
+      'unfinished': self.unfinished,
+      'win_rate': self.wins / self.races if self.races else 0.0,
+      'mean_planning_time': self.planning_time_total / successes
+                            if successes else 0.0,
+      'mean_trajectory_duration': self.duration_total / successes
+                                  if successes else 0.0
+    }
+
+
+class PlannerPortfolio(metaclass=Singleton):
+  """Plans with several planners on the same problem. Each planner of each
+  move group has its own dedicated planning context. A move_group node plans
+  one goal at a time and cancels a pending goal when another arrives, so
+  planners served by the same move_group node plan one after another, each
+  with an even share of the planning time. Planners only race each other if
+  they are served by different move_group nodes, configured with
+  planner_portfolio/namespaces. A planning context that is still busy with a
+  previous problem sits out the next one instead of queueing it. Configured
+  by the following parameters in the private namespace of the node:
+    planner_portfolio/enabled         -- default: False
+    planner_portfolio/planners        -- planner IDs to race.
+                                         default: [RRTConnect, RRTstar, BiTRRT]
+    planner_portfolio/namespaces      -- dictionary of planner ID to the
+                                         namespace of the move_group node that
+                                         plans with it. Planners not listed are
+                                         served by the move_group node of the
+                                         lander. default: {}
+    planner_portfolio/mode            -- 'first' takes the first valid result.
+                                         'best' takes the shortest trajectory
+                                         found by the deadline. default: 'first'
+    planner_portfolio/deadline        -- planning time in seconds allotted to
+                                         each move_group node. default: 5.0
+    planner_portfolio/statistics_path -- file per-planner statistics are
+                                         written to at shutdown. Statistics are
+                                         only logged when empty. default: ''
+  """
+
+  MODES = ('first', 'best')
+
+  def __init__(self):
+    self.enabled = rospy.get_param('~planner_portfolio/enabled', False)
+    self._planners = rospy.get_param('~planner_portfolio/planners',
+                                     ['RRTConnect', 'RRTstar', 'BiTRRT'])
+    self._namespaces = rospy.get_param('~planner_portfolio/namespaces', {})
+    self._mode = rospy.get_param('~planner_portfolio/mode', 'first')
+    if self._mode not in self.MODES:
+      rospy.logwarn(f"Unknown planner portfolio mode {self._mode}. Defaulting "
+                    f"to {self.MODES[0]}.")
+      self._mode = self.MODES[0]
+    self._deadline = rospy.get_param('~planner_portfolio/deadline', 5.0)
+    self._statistics_path = os.path.expanduser(
+      rospy.get_param('~planner_portfolio/statistics_path', ''))
+    self._statistics = {p : _PlannerStatistics() for p in self._planners}
+    self._lock = threading.Lock()
+    # maps (group name, planner ID) to a tuple of a MoveGroupCommander and the
+    # lock that grants exclusive use of it
+    self._contexts = dict()
+    # planner IDs grouped by the move_group node that serves them, in order
+    self._chains = dict()
+    for planner_id in self._planners:
+      namespace = self._namespaces.get(planner_id, '')
+      self._chains.setdefault(namespace, list()).append(planner_id)
+    # a race may be lost by a chain that is still planning, which is left to
+    # finish in the background while the next race runs
+    self._executor = ThreadPoolExecutor(2 * len(self._chains))
+    if self.enabled:
+      rospy.on_shutdown(self._report_statistics)
+
+  def get_configuration(self):
+    """returns a hashable identifier of the planners that race and how the
+    winner is chosen, which stands in for a planner ID in plan cache keys
+    """
+    return ('portfolio', self._mode, tuple(self._planners))
+
+  def _get_context(self, group_name, planner_id):
+    with self._lock:
+      key = (group_name, planner_id)
+      if key not in self._contexts:
+        group = moveit_commander.MoveGroupCommander(group_name,
+          ns=self._namespaces.get(planner_id, ''))
+        group.set_planner_id(planner_id)
+        group.set_planning_time(self._deadline)
+        self._contexts[key] = (group, threading.Lock())
+      return self._contexts[key]
+
+  def _plan_chain(self, chain, group_name, end_effector, plan_function,
+                  planning_time, won):
+    """Plans with the planners of one move_group node one after another, each
+    in its own planning context
+    chain -- planner IDs served by the move_group node
+    won   -- threading.Event set once a plan is found. In 'first' mode, no
+             planner is started after it is set.
+    returns a list of tuples of planner ID and its outcome, which is a tuple
+    of the trajectory and its planning time, an ArmPlanningError, or None if
+    the planner did not plan
+    """
+    share = planning_time / len(chain)
+    outcomes = list()
+    for planner_id in chain:
+      if self._mode == 'first' and won.is_set():
+        outcomes.append((planner_id, None))
+        continue
+      group, lock = self._get_context(group_name, planner_id)
+      # a context still planning a previous problem would only make this one
+      # wait for it
+      if not lock.acquire(blocking=False):
+        outcomes.append((planner_id, None))
+        continue
+      try:
+        start = time.time()
+        group.set_planning_time(share)
+        if end_effector is not None:
+          group.set_end_effector_link(end_effector)
+        trajectory, _ = plan_function(group)
+        outcomes.append((planner_id, (trajectory, time.time() - start)))
+        won.set()
+      except ArmPlanningError as err:
+        outcomes.append((planner_id, err))
+      finally:
+        group.clear_pose_targets()
+        lock.release()
+    return outcomes
+
+  def plan(self, group_name, end_effector, plan_function, deadline=None):
+    """Race all planners of the portfolio on the same problem
+    group_name    -- name of the move group
+    end_effector  -- name of the end-effector link or None
+    plan_function -- function with a MoveGroupCommander parameter that plans
+                     the trajectory and returns a tuple of the trajectory and
+                     its planning time. May raise ArmPlanningError.
+    deadline      -- planning time in seconds allotted to each move_group node
+                     if it is shorter than the deadline of the portfolio
+    returns a tuple of the winning trajectory, the wall time of the race, and
+    the planner ID of the winner
+    """
+    start = time.time()
+    planning_time = self._deadline if deadline is None \
+      else min(self._deadline, deadline)
+    won = threading.Event()
+    pending = {
+      self._executor.submit(self._plan_chain, chain, group_name,
+                            end_effector, plan_function, planning_time,
+                            won) : chain
+      for chain in self._chains.values()
+    }
+    results = dict()
+    failures = dict()
+    skipped = list()
+    # allow some time for communication beyond the planners' own deadline
+    DEADLINE_MARGIN = 1.0 # seconds
+    timeout = planning_time + DEADLINE_MARGIN
+    while pending:
+      remaining = timeout - (time.time() - start)
+      if remaining <= 0:
+        break
+      done, _ = wait_for_futures(pending, remaining,
+                                 return_when=FIRST_COMPLETED)
+      for future in done:
+        pending.pop(future)
+        for planner_id, outcome in future.result():
+          if outcome is None:
+            skipped.append(planner_id)
+          elif isinstance(outcome, ArmPlanningError):
+            failures[planner_id] = str(outcome)
+          else:
+            results[planner_id] = outcome
+      if self._mode == 'first' and results:
+        break
+    # planners of chains that are still planning
+    unfinished = [p for chain in pending.values() for p in chain]
+    winner = None
+    if results and self._mode == 'first':
+      # more than one result is possible if planners finished at the same time
+      winner = min(results, key=lambda planner: results[planner][1])
+    elif results:
+      winner = min(results,
+                   key=lambda planner: trajectory_duration(results[planner][0]))
+    if winner is not None and self._mode == 'first':
+      self._record(winner, results, list(failures), unfinished + skipped)
+    else:
+      # planners that did not finish by the deadline have failed
+      self._record(winner, results, list(failures) + unfinished, skipped)
+    if winner is None:
+      reasons = " ".join(f"{p}: {err}" for p, err in failures.items())
+      raise ArmPlanningError(
+        f"No planner of the portfolio found a plan. {reasons}")
+    rospy.logdebug(f"Planner {winner} won the planner portfolio race")
+    return results[winner][0], time.time() - start, winner
+
+  def _record(self, winner, results, failed, unfinished):
+    """Update statistics with the outcome of a race
+    winner     -- planner ID of the winner or None
+    results    -- dictionary of planner ID to a tuple of trajectory and
+                  planning time for all planners that found a plan
+    failed     -- planner IDs of planners that failed
+    unfinished -- planner IDs of planners that were still planning when the
+                  winner was chosen, or did not plan at all
+    """
+    with self._lock:
+      for planner_id, (trajectory, planning_time) in results.items():
+        stats = self._statistics[planner_id]
+        stats.races += 1
+        stats.planning_time_total += planning_time
+        stats.duration_total += trajectory_duration(trajectory)
+      for planner_id in failed:
+        stats = self._statistics[planner_id]
+        stats.races += 1
+        stats.failures += 1
+      for planner_id in unfinished:
+        stats = self._statistics[planner_id]
+        stats.races += 1
+        stats.unfinished += 1
+      if winner is not None:
+        self._statistics[winner].wins += 1
+
+  def get_statistics(self):
+    """returns a dictionary of per-planner statistics keyed on planner ID"""
+    with self._lock:
+      return {p : s.as_dict() for p, s in self._statistics.items()}
+
+  def _report_statistics(self):
+    statistics = self.get_statistics()
+    rospy.loginfo(f"Planner portfolio statistics: {statistics}")
+    if not self._statistics_path:
+      return
+    try:
+      os.makedirs(os.path.dirname(self._statistics_path) or '.', exist_ok=True)
+      with open(self._statistics_path, 'w') as f:
+        yaml.safe_dump(statistics, f)
+    except OSError as err:
+      rospy.logwarn("Failed to save planner portfolio statistics to "
+                    f"{self._statistics_path}: {err}")
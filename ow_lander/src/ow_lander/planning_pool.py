@@ -0,0 +1,65 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a pool of independent MoveIt planning contexts so that several
+trajectories of the same move group can be planned at the same time.
+"""
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import rospy
+import moveit_commander
+
+from ow_lander.common import Singleton
+
+class PlanningContextPool(metaclass=Singleton):
+  """Hands out MoveGroupCommander instances that are not shared with any other
+  thread, so targets and start states set for one plan cannot interfere with
+  another plan. Contexts are created on first use. Configured by the following
+  parameter in the private namespace of the node:
+    parallel_planning/contexts -- maximal number of contexts per move group.
+                                  default: number of CPUs up to 4
+  """
+
+  def __init__(self):
+    self.size = rospy.get_param('~parallel_planning/contexts',
+                                min(4, os.cpu_count() or 1))
+    self._idle = dict()
+    self._created = dict()
+    self._lock = threading.Lock()
+
+  def _take(self, group_name):
+    with self._lock:
+      idle = self._idle.setdefault(group_name, queue.Queue())
+      create = idle.empty() and self._created.get(group_name, 0) < self.size
+      if create:
+        self._created[group_name] = self._created.get(group_name, 0) + 1
+    if create:
+      return moveit_commander.MoveGroupCommander(group_name)
+    # block until another thread returns its context
+    return idle.get()
+
+  @contextmanager
+  def acquire(self, group_name, planner_id, planning_time,
+              end_effector=None):
+    """Context manager that provides exclusive use of a planning context
+    group_name    -- name of the move group
+    planner_id    -- ID of the planner the context will use
+    planning_time -- seconds allotted to each plan
+    end_effector  -- name of the end-effector link, if any
+    yields a moveit_commander MoveGroupCommander
+    """
+    group = self._take(group_name)
+    try:
+      group.set_planner_id(planner_id)
+      group.set_planning_time(planning_time)
+      if end_effector is not None:
+        group.set_end_effector_link(end_effector)
+      yield group
+    finally:
+      group.clear_pose_targets()
+      self._idle[group_name].put(group)
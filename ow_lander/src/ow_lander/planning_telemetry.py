@@ -0,0 +1,177 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines the telemetry of arm trajectory planning. A record is published for
+every planning call of a TrajectorySequence and kept in rolling windows per
+action server, from which histograms are computed on demand.
+"""
+
+import os
+import threading
+from collections import defaultdict, deque
+
+import yaml
+import numpy as np
+
+import rospy
+
+import ow_lander.msg
+import ow_lander.srv
+from ow_lander.common import Singleton, create_header
+
+# action name of records from sequences that were not planned for an action
+NO_ACTION = 'none'
+
+def _distribution(values, bins=None):
+  """Summarizes a sequence of values
+  bins -- upper edges of histogram bins. The last bin holds all values above
+          the last edge. If not provided, no histogram is computed.
+  returns a dictionary
+  """
+  values = np.asarray(values, dtype=float)
+  if values.size == 0:
+    return {'mean': 0.0, 'max': 0.0}
+  summary = {
+    'mean': float(np.mean(values)),
+    'p50': float(np.percentile(values, 50)),
+    'p95': float(np.percentile(values, 95)),
+    'max': float(np.max(values))
+  }
+  if bins is not None:
+    counts = np.bincount(np.searchsorted(bins, values, side='left'),
+                         minlength=len(bins) + 1)
+    summary['histogram'] = {
+      'bins': [float(edge) for edge in bins] + ['inf'],
+      'counts': counts.tolist()
+    }
+  return summary
+
+
+class PlanningTelemetry(metaclass=Singleton):
+  """Publishes a PlanningRecord message for every planning call on a latched
+  topic and keeps the most recent records of each action server. Configured by
+  the following parameters in the private namespace of the node:
+    planning_telemetry/enabled -- default: True
+    planning_telemetry/window  -- number of records per action server the
+                                  histograms are computed over. default: 500
+    planning_telemetry/bins    -- upper edges of the bins of the wall time
+                                  histograms in seconds.
+                                  default: [0.01, 0.1, 0.5, 1, 2, 5, 10, 30]
+  """
+
+  TOPIC = '/planning_telemetry'
+
+  def __init__(self):
+    self.enabled = rospy.get_param('~planning_telemetry/enabled', True)
+    window = rospy.get_param('~planning_telemetry/window', 500)
+    self._bins = sorted(rospy.get_param('~planning_telemetry/bins',
+                                        [0.01, 0.1, 0.5, 1, 2, 5, 10, 30]))
+    self._records = defaultdict(lambda: deque(maxlen=window))
+    self._lock = threading.Lock()
+    self._pub = None
+    if self.enabled:
+      self._pub = rospy.Publisher(self.TOPIC, ow_lander.msg.PlanningRecord,
+                                  queue_size=100, latch=True)
+
+  def record(self, action, group, segment_type, source, planner_id,
+             waypoint_count, success, fraction, wall_time):
+    """Publish and keep the record of a planning call
+    action         -- name of the action server or None
+    group          -- name of the move group
+    segment_type   -- type of the planned segment, e.g. 'pose' or 'linear'
+    source         -- 'planner', 'cache', 'library', or 'checkpoint'
+    planner_id     -- planner that produced the result
+    waypoint_count -- points of the planned trajectory
+    success        -- False if planning failed
+    fraction       -- fraction of the path that could be planned
+    wall_time      -- seconds the call took
+    returns the ow_lander/PlanningRecord message
+    """
+    record = ow_lander.msg.PlanningRecord(
+      header=create_header('', rospy.Time.now()),
+      action=action or NO_ACTION,
+      group=group,
+      segment_type=segment_type,
+      source=source,
+      planner_id=planner_id,
+      waypoint_count=waypoint_count,
+      success=success,
+      fraction=fraction,
+      wall_time=wall_time
+    )
+    if not self.enabled:
+      return record
+    with self._lock:
+      self._records[record.action].append(record)
+    self._pub.publish(record)
+    return record
+
+  def _summarize(self, records):
+    succeeded = [r for r in records if r.success]
+    planners = defaultdict(int)
+    for r in records:
+      planners[r.planner_id] += 1
+    return {
+      'records': len(records),
+      'success_rate': len(succeeded) / len(records) if records else 0.0,
+      'wall_time': _distribution([r.wall_time for r in records], self._bins),
+      'waypoint_count': _distribution([r.waypoint_count for r in succeeded]),
+      'fraction': _distribution([r.fraction for r in records]),
+      'planners': dict(planners)
+    }
+
+  def get_histograms(self, action=None):
+    """Compute histograms of the records held for action servers
+    action -- name of the action server. If not provided, all action servers
+              are included.
+    returns a dictionary keyed on action name of dictionaries of the
+    statistics of all records of the action and of each segment type
+    """
+    with self._lock:
+      if action:
+        records = {action: list(self._records.get(action, []))}
+      else:
+        records = {a: list(r) for a, r in self._records.items()}
+    histograms = dict()
+    for name, action_records in records.items():
+      segment_types = defaultdict(list)
+      for r in action_records:
+        segment_types[r.segment_type].append(r)
+      summary = self._summarize(action_records)
+      summary['segment_types'] = {
+        t: self._summarize(r) for t, r in segment_types.items()
+      }
+      histograms[name] = summary
+    return histograms
+
+
+class PlanningTelemetryServer:
+  """Dumps the histograms of the PlanningTelemetry with the
+  DumpPlanningTelemetry service
+  """
+
+  SRV_DUMP_PLANNING_TELEMETRY = 'DumpPlanningTelemetry'
+
+  def __init__(self):
+    self._telemetry = PlanningTelemetry()
+    self._service = rospy.Service(self.SRV_DUMP_PLANNING_TELEMETRY,
+                                  ow_lander.srv.DumpPlanningTelemetry,
+                                  self._handle_request)
+
+  def _handle_request(self, request):
+    response = ow_lander.srv.DumpPlanningTelemetryResponse()
+    response.histograms = yaml.safe_dump(
+      self._telemetry.get_histograms(request.action), sort_keys=False)
+    if request.path:
+      path = os.path.expanduser(request.path)
+      try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+          f.write(response.histograms)
+      except OSError as err:
+        response.success = False
+        response.message = f"Failed to write histograms to {path}: {err}"
+        return response
+    response.success = True
+    return response
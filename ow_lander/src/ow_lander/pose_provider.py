@@ -0,0 +1,60 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a provider of end-effector poses shared by all action servers, so
+that feedback callbacks that query the same pose many times per second do not
+each repeat the tf2 lookups.
+"""
+
+import threading
+from copy import deepcopy
+
+from geometry_msgs.msg import Pose, Point, PoseStamped
+
+from ow_lander.common import Singleton
+from ow_lander.frame_transformer import FrameTransformer
+
+def _pose_from_transform(transform):
+  """Converts a geometry_msgs TransformStamped into the PoseStamped of its
+  child frame in its parent frame
+  """
+  t = transform.transform.translation
+  pose = Pose(Point(t.x, t.y, t.z), transform.transform.rotation)
+  return PoseStamped(header=transform.header, pose=pose)
+
+
+class EndEffectorPoseProvider(metaclass=Singleton):
+  """Serves the most recent pose of end-effector links from a cache. The pose
+  of an end-effector in a frame is cached with the time of the most recent
+  transform between the two, and is only looked up again once that time
+  changes. Updates of unrelated transforms on /tf leave the cache valid.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    # maps a tuple of end-effector link and frame ID to the geometry_msgs
+    # PoseStamped most recently looked up for them
+    self._poses = dict()
+
+  def get_pose(self, end_effector, frame_id):
+    """Look up the most recent pose of an end-effector
+    end_effector -- name of the end-effector link
+    frame_id     -- frame the pose is expressed in
+    returns a geometry_msgs PoseStamped, which callers may modify, or None if
+    the transform is not available
+    """
+    key = (end_effector, frame_id)
+    stamp = FrameTransformer().get_latest_common_time(frame_id, end_effector)
+    if stamp is None:
+      return None
+    with self._lock:
+      cached = self._poses.get(key)
+    if cached is None or cached.header.stamp != stamp:
+      transform = FrameTransformer().lookup_transform(frame_id, end_effector)
+      if transform is None:
+        return None
+      cached = _pose_from_transform(transform)
+      with self._lock:
+        self._poses[key] = cached
+    return deepcopy(cached)
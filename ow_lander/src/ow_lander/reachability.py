@@ -0,0 +1,233 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a voxel map of the base_link workspace that records which tasks the
+arm can perform at each point, so that task goals the arm cannot reach are
+rejected before anything is planned. The map is generated offline by the
+generate_reachability_map.py script and loaded by the action servers at
+startup.
+"""
+
+import os
+import math
+import itertools
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+import rospy
+
+from ow_lander import constants
+from ow_lander.common import Singleton
+from ow_lander.exception import ArmPlanningError
+
+DEFAULT_MAP_PATH = '~/.ros/ow_lander/reachability_map.npz'
+
+# task types as bit flags of the tasks of a voxel
+TASK_GRIND = 1
+TASK_SCOOP_LINEAR = 2
+TASK_SCOOP_CIRCULAR = 4
+TASK_DISCARD = 8
+TASK_NAMES = {
+  TASK_GRIND: 'grind',
+  TASK_SCOOP_LINEAR: 'scoop_linear',
+  TASK_SCOOP_CIRCULAR: 'scoop_circular',
+  TASK_DISCARD: 'discard'
+}
+
+# contents of a voxel
+# tasks        -- bit flags of the tasks that can be performed in the voxel
+# shoulder_yaw -- shoulder yaw that faces the voxel (radians) or NaN if no
+#                 shoulder yaw within the joint limits does
+# seeds        -- dictionary that maps each task type that can be performed in
+#                 the voxel to the joint positions, as a dictionary keyed on
+#                 joint name, that solved its inverse kinematics
+Voxel = namedtuple('Voxel', ['tasks', 'shoulder_yaw', 'seeds'])
+
+def workspace_shoulder_yaw(x, y):
+  """Shoulder yaw that faces the hand towards a point, without checking joint
+  limits
+  x -- base_link x position
+  y -- base_link y position
+  returns the angle in radians or NaN if the point is too close to the
+  shoulder to be faced
+  """
+  h = math.hypot(y - constants.Y_SHOU, x - constants.X_SHOU)
+  l = constants.Y_SHOU - constants.HAND_Y_OFFSET
+  if h <= abs(l):
+    return math.nan
+  return math.atan2(y - constants.Y_SHOU, x - constants.X_SHOU) \
+    + math.asin(l / h)
+
+
+class ReachabilityMap(metaclass=Singleton):
+  """Voxel grid over the base_link workspace. Each voxel holds the task types
+  whose working pose, with the tool at the center of the voxel, has an inverse
+  kinematics solution within the joint limits. The map file is located by the
+  following parameter in the private namespace of the node:
+    reachability_map/path -- default: ~/.ros/ow_lander/reachability_map.npz
+  When no map is loaded, no goals are rejected. Since a task may be feasible
+  between voxel centers where it is not at the centers themselves, a goal is
+  only rejected when the task is infeasible at all voxel centers surrounding
+  it, and goals outside of the map are never rejected.
+  """
+
+  # increment if the format of the map file changes
+  FORMAT_VERSION = 1
+
+  def __init__(self, path=None):
+    """
+    path -- map file. If not provided the reachability_map/path parameter is
+            used.
+    """
+    if path is None:
+      path = rospy.get_param('~reachability_map/path', DEFAULT_MAP_PATH)
+    self._path = os.path.expanduser(path)
+    self._origin = None
+    self._resolution = None
+    self._tasks = None
+    self._shoulder_yaw = None
+    # maps task type to a tuple of joint names and an array of shape
+    # (nx, ny, nz, len(joint names)) of joint positions, which are NaN where
+    # the task cannot be performed
+    self._seeds = dict()
+    self._lock = threading.Lock()
+    self.load()
+
+  @property
+  def loaded(self):
+    """True if the map holds a grid"""
+    return self._tasks is not None
+
+  def set_grid(self, origin, resolution, tasks, shoulder_yaw, seeds):
+    """Replace the grid of the map
+    origin       -- array-like of shape (3,) of the corner of the grid with the
+                    smallest coordinates
+    resolution   -- edge length of a voxel (meters)
+    tasks        -- integer array of shape (nx, ny, nz) of the task bit flags of
+                    each voxel
+    shoulder_yaw -- array of shape (nx, ny, nz) of shoulder yaws
+    seeds        -- dictionary that maps task types to tuples of joint names
+                    and arrays of shape (nx, ny, nz, len(joint names))
+    """
+    with self._lock:
+      self._origin = np.asarray(origin, dtype=float)
+      self._resolution = float(resolution)
+      self._tasks = np.asarray(tasks, dtype=np.uint8)
+      self._shoulder_yaw = np.asarray(shoulder_yaw, dtype=np.float32)
+      self._seeds = {task: (tuple(names), np.asarray(values, dtype=np.float32))
+                     for task, (names, values) in seeds.items()}
+
+  def _index(self, x, y, z):
+    """returns the index of the voxel that contains a point or None if the
+    point is outside the grid
+    """
+    index = tuple(
+      math.floor((c - o) / self._resolution)
+      for c, o in zip((x, y, z), self._origin.tolist())
+    )
+    if any(i < 0 or i >= n for i, n in zip(index, self._tasks.shape)):
+      return None
+    return index
+
+  def lookup(self, x, y, z):
+    """Look up the voxel that contains a base_link point
+    returns a Voxel or None if the point is outside the map or no map is
+    loaded
+    """
+    with self._lock:
+      if not self.loaded:
+        return None
+      index = self._index(x, y, z)
+      if index is None:
+        return None
+      tasks = int(self._tasks[index])
+      seeds = {
+        task: dict(zip(names, values[index].tolist()))
+        for task, (names, values) in self._seeds.items() if tasks & task
+      }
+      return Voxel(tasks, float(self._shoulder_yaw[index]), seeds)
+
+  def _surrounding_indices(self, x, y, z):
+    """returns the indices of the up to eight voxels of the grid whose centers
+    are the corners of the cell around a point, and whether the grid contains
+    all of them
+    """
+    lower = [math.floor((c - o) / self._resolution - 0.5)
+             for c, o in zip((x, y, z), self._origin.tolist())]
+    indices = [tuple(l + d for l, d in zip(lower, offset))
+               for offset in itertools.product((0, 1), repeat=3)]
+    inside = [index for index in indices
+              if all(0 <= i < n for i, n in zip(index, self._tasks.shape))]
+    return inside, len(inside) == len(indices)
+
+  def check(self, task, point):
+    """Check that a task can be performed at a point. The check is skipped if
+    no map is loaded, and passes if the map does not cover the point.
+    task  -- one of the TASK_* types
+    point -- base_link position of the tool in the task's working pose, which
+             has x, y, and z attributes
+    raises ArmPlanningError if the task cannot be performed at any of the
+    voxel centers surrounding point
+    """
+    with self._lock:
+      if not self.loaded:
+        return
+      indices, covered = self._surrounding_indices(point.x, point.y, point.z)
+      feasible = any(self._tasks[index] & task for index in indices)
+    location = f"({point.x:.3f}, {point.y:.3f}, {point.z:.3f})"
+    if not covered:
+      rospy.logdebug(f"The reachability map does not cover {location}, so "
+                     f"reachability for {TASK_NAMES[task]} is unknown")
+      return
+    if not feasible:
+      raise ArmPlanningError(f"The arm cannot reach {location} to perform "
+                             f"{TASK_NAMES[task]} according to the "
+                             "reachability map")
+
+  def load(self):
+    """Replace the map's grid with the one in its file"""
+    if not os.path.isfile(self._path):
+      rospy.loginfo(f"No reachability map found at {self._path}. Task goals "
+                    "will not be checked for reachability before planning.")
+      return
+    try:
+      with np.load(self._path) as contents:
+        if int(contents['version']) != self.FORMAT_VERSION:
+          rospy.logwarn(f"Reachability map at {self._path} has an unsupported "
+                        "format and will be ignored. Please regenerate it.")
+          return
+        seeds = {
+          task: (contents[f'joints_{name}'].tolist(),
+                 contents[f'seeds_{name}'])
+          for task, name in TASK_NAMES.items()
+        }
+        self.set_grid(contents['origin'], contents['resolution'],
+                      contents['tasks'], contents['shoulder_yaw'], seeds)
+    except (OSError, ValueError, KeyError) as err:
+      rospy.logwarn(f"Failed to load reachability map from {self._path}: "
+                    f"{err}")
+      return
+    rospy.loginfo(f"Loaded a reachability map of {self._tasks.size} voxels "
+                  f"from {self._path}")
+
+  def save(self):
+    """Write the map's grid to its file"""
+    with self._lock:
+      arrays = {
+        'version': self.FORMAT_VERSION,
+        'origin': self._origin,
+        'resolution': self._resolution,
+        'tasks': self._tasks,
+        'shoulder_yaw': self._shoulder_yaw
+      }
+      for task, name in TASK_NAMES.items():
+        names, values = self._seeds[task]
+        arrays[f'joints_{name}'] = np.array(names)
+        arrays[f'seeds_{name}'] = values
+      os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+      # np.savez appends .npz to paths that lack it
+      with open(self._path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
@@ -0,0 +1,148 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines the removal of redundant points from planned joint trajectories
+with a Douglas-Peucker-style pass, so fewer points are sent to the trajectory
+controllers.
+"""
+
+import numpy as np
+
+import rospy
+
+from ow_lander.common import Singleton
+from ow_lander.kinematics import ForwardKinematics
+
+def _interpolate(trajectory, start, end):
+  """Positions of the points strictly between start and end as the trajectory
+  controllers would command them if only start and end were kept. Like the
+  splines of joint_trajectory_controller, the interpolation is quintic when
+  the points have velocities and accelerations, cubic when they only have
+  velocities, and linear otherwise.
+  returns a numpy array of shape (end - start - 1, J)
+  """
+  times = trajectory.times
+  q = trajectory.positions
+  T = times[end] - times[start]
+  t = (times[start + 1:end] - times[start])[:, None]
+  p0, p1 = q[start], q[end]
+  if trajectory.velocities is None:
+    return p0 + t / T * (p1 - p0)
+  v0, v1 = trajectory.velocities[start], trajectory.velocities[end]
+  if trajectory.accelerations is None:
+    c2 = (3 * (p1 - p0) - (2 * v0 + v1) * T) / T ** 2
+    c3 = (2 * (p0 - p1) + (v0 + v1) * T) / T ** 3
+    return p0 + v0 * t + c2 * t ** 2 + c3 * t ** 3
+  a0, a1 = trajectory.accelerations[start], trajectory.accelerations[end]
+  c3 = (20 * (p1 - p0) - (8 * v1 + 12 * v0) * T
+        - (3 * a0 - a1) * T ** 2) / (2 * T ** 3)
+  c4 = (30 * (p0 - p1) + (14 * v1 + 16 * v0) * T
+        + (3 * a0 - 2 * a1) * T ** 2) / (2 * T ** 4)
+  c5 = (12 * (p1 - p0) - 6 * (v1 + v0) * T
+        - (a0 - a1) * T ** 2) / (2 * T ** 5)
+  return p0 + v0 * t + a0 / 2 * t ** 2 + c3 * t ** 3 + c4 * t ** 4 \
+    + c5 * t ** 5
+
+def simplify(trajectory, joint_tolerance, keep=(), link_positions=None,
+             compute_link_positions=None, cartesian_tolerance=None):
+  """Find the points of a trajectory that are needed so that no removed point
+  deviates by more than the tolerances, at the point's time, from the
+  interpolation the controllers would command between the points kept on either
+  side of it.
+  trajectory             -- ColumnarTrajectory
+  joint_tolerance        -- maximal deviation of any joint (radians)
+  keep                   -- indices of points that must be kept in addition to
+                            the first and last points
+  link_positions         -- numpy array of shape (N, 3) of the positions of a
+                            link at each point, or None to only bound
+                            joint-space deviation
+  compute_link_positions -- function that computes link positions of an array
+                            of joint positions of shape (M, J). Required when
+                            link_positions is provided.
+  cartesian_tolerance    -- maximal deviation of the link (meters)
+  returns a boolean mask of the points that are kept
+  """
+  n = len(trajectory)
+  kept = np.zeros(n, dtype=bool)
+  if n == 0:
+    return kept
+  kept[[0, -1]] = True
+  kept[list(keep)] = True
+  anchors = np.flatnonzero(kept)
+  intervals = list(zip(anchors[:-1], anchors[1:]))
+  q = trajectory.positions
+  while intervals:
+    start, end = intervals.pop()
+    if end - start < 2:
+      continue
+    interpolated = _interpolate(trajectory, start, end)
+    deviation = np.max(np.abs(q[start + 1:end] - interpolated), axis=1) \
+                  / joint_tolerance
+    if link_positions is not None:
+      link_deviation = np.linalg.norm(
+        link_positions[start + 1:end] - compute_link_positions(interpolated),
+        axis=1) / cartesian_tolerance
+      deviation = np.maximum(deviation, link_deviation)
+    worst = int(np.argmax(deviation))
+    if deviation[worst] > 1.0:
+      split = start + 1 + worst
+      kept[split] = True
+      intervals.append((start, split))
+      intervals.append((split, end))
+  return kept
+
+
+class TrajectoryCompressor(metaclass=Singleton):
+  """Removes points from trajectories within a joint-space and a Cartesian
+  deviation bound. The Cartesian bound applies to the end-effector whenever
+  its pose can be computed by ForwardKinematics. Configured by the following
+  parameters in the private namespace of the node:
+    compression/enabled             -- default: False
+    compression/joint_tolerance     -- maximal joint deviation (radians).
+                                       default: 0.01
+    compression/cartesian_tolerance -- maximal end-effector deviation (meters).
+                                       default: 0.005
+  """
+
+  def __init__(self):
+    self.enabled = rospy.get_param('~compression/enabled', False)
+    self._joint_tolerance = rospy.get_param('~compression/joint_tolerance',
+                                            0.01)
+    self._cartesian_tolerance = rospy.get_param(
+      '~compression/cartesian_tolerance', 0.005)
+
+  def _link_position_function(self, joint_names, link):
+    if link is None:
+      return None
+    fk = ForwardKinematics()
+    if not fk.supports_link(link) \
+        or not set(fk.get_joint_names(link)) <= set(joint_names):
+      return None
+    return lambda q: fk.compute_poses(link, joint_names, q)[:, :3]
+
+  def compress(self, trajectory, link=None, keep=()):
+    """Remove redundant points from a trajectory. Kept points retain their
+    times, velocities, and accelerations, and the tolerances are checked
+    against the splines the controllers fit through them. Points at which the
+    arm is at rest are always kept.
+    trajectory -- ColumnarTrajectory
+    link       -- name of the end-effector link the Cartesian bound applies
+                  to, or None
+    keep       -- indices of other points that must be kept
+    returns a ColumnarTrajectory
+    """
+    keep = list(keep)
+    if trajectory.velocities is not None:
+      keep += np.flatnonzero(np.all(trajectory.velocities == 0, axis=1)) \
+                .tolist()
+    compute_link_positions = self._link_position_function(
+      trajectory.joint_names, link)
+    link_positions = None
+    if compute_link_positions is not None and len(trajectory) > 0:
+      link_positions = compute_link_positions(trajectory.positions)
+    kept = simplify(trajectory, self._joint_tolerance, keep, link_positions,
+                    compute_link_positions, self._cartesian_tolerance)
+    rospy.logdebug(f"Trajectory compression kept {np.count_nonzero(kept)} of "
+                   f"{len(trajectory)} points")
+    return trajectory[kept]
@@ -0,0 +1,115 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a library of precomputed arm trajectories to named targets. The
+library is generated offline by the generate_trajectory_library.py script and
+loaded by the action servers at startup.
+"""
+
+import os
+import pickle
+import threading
+
+import rospy
+
+from ow_lander.common import Singleton, normalize_radians
+from ow_lander.plan_cache import (serialize_trajectory, deserialize_trajectory,
+                                  trajectory_starts_at)
+
+DEFAULT_LIBRARY_PATH = '~/.ros/ow_lander/trajectory_library.pkl'
+
+class TrajectoryLibrary(metaclass=Singleton):
+  """Trajectories to named SRDF targets keyed on the move group and the target
+  name. Each key may hold trajectories from several start configurations. The
+  library file is located by the following parameter in the private namespace
+  of the node:
+    trajectory_library/path -- default: ~/.ros/ow_lander/trajectory_library.pkl
+  """
+
+  # increment if the format of the library file changes
+  FORMAT_VERSION = 1
+
+  def __init__(self, path=None):
+    """
+    path -- library file. If not provided the trajectory_library/path
+            parameter is used.
+    """
+    if path is None:
+      path = rospy.get_param('~trajectory_library/path', DEFAULT_LIBRARY_PATH)
+    self._path = os.path.expanduser(path)
+    # maps (group name, target name) to a list of serialized trajectories
+    self._entries = dict()
+    self._lock = threading.Lock()
+    self.load()
+
+  def __len__(self):
+    with self._lock:
+      return sum(len(x) for x in self._entries.values())
+
+  def add(self, group_name, target_name, trajectory):
+    """Add a trajectory to the library. Any trajectory to the same target that
+    starts from the same configuration is replaced.
+    group_name  -- name of the move group the trajectory was planned for
+    target_name -- name of the SRDF target the trajectory ends at
+    trajectory  -- moveit_msgs RobotTrajectory
+    """
+    start = trajectory.joint_trajectory.points[0].positions
+    with self._lock:
+      entries = self._entries.setdefault((group_name, target_name), list())
+      entries[:] = [x for x in entries
+                    if not trajectory_starts_at(deserialize_trajectory(x),
+                                                start)]
+      entries.append(serialize_trajectory(trajectory))
+
+  def find(self, group_name, target_name, start_positions):
+    """Look up a trajectory to a named target
+    group_name      -- name of the move group
+    target_name     -- name of the SRDF target
+    start_positions -- joint positions the trajectory must start from
+    returns the moveit_msgs RobotTrajectory whose first point is closest to
+    start_positions, or None if no trajectory starts within
+    ARM_JOINT_TOLERANCE of start_positions
+    """
+    with self._lock:
+      entries = self._entries.get((group_name, target_name), [])
+    best, best_deviation = None, None
+    for data in entries:
+      trajectory = deserialize_trajectory(data)
+      if not trajectory_starts_at(trajectory, start_positions):
+        continue
+      deviation = max(abs(normalize_radians(a - b)) for a, b in zip(
+        trajectory.joint_trajectory.points[0].positions, start_positions))
+      if best is None or deviation < best_deviation:
+        best, best_deviation = trajectory, deviation
+    return best
+
+  def load(self):
+    """Replace the library's contents with those in its file"""
+    if not os.path.isfile(self._path):
+      rospy.loginfo(f"No trajectory library found at {self._path}. All "
+                    "named targets will be planned live.")
+      return
+    try:
+      with open(self._path, 'rb') as f:
+        contents = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as err:
+      rospy.logwarn(f"Failed to load trajectory library from {self._path}: "
+                    f"{err}")
+      return
+    if contents.get('version') != self.FORMAT_VERSION:
+      rospy.logwarn(f"Trajectory library at {self._path} has an unsupported "
+                    "format and will be ignored. Please regenerate it.")
+      return
+    with self._lock:
+      self._entries = contents['entries']
+    rospy.loginfo(f"Loaded {len(self)} trajectories from the trajectory "
+                  f"library at {self._path}")
+
+  def save(self):
+    """Write the library's contents to its file"""
+    with self._lock:
+      contents = {'version': self.FORMAT_VERSION, 'entries': self._entries}
+      os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+      with open(self._path, 'wb') as f:
+        pickle.dump(contents, f)
@@ -0,0 +1,122 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines a pipeline that plans the segments of a trajectory sequence in a
+background thread while the segments that have already been planned are
+executed, so planning latency overlaps with arm motion.
+"""
+
+import queue
+import threading
+
+import rospy
+
+from ow_lander.exception import ArmPlanningError
+
+class SegmentPipeline:
+  """Hands trajectory segments from a planning thread to the thread that
+  executes them. Segments are handed over by passing push_segment as the
+  segment_cb of a TrajectorySequence. e.g.
+    pipeline = SegmentPipeline(plan_function)
+    pipeline.start()
+    try:
+      for segment in pipeline.segments():
+        execute(segment)
+    finally:
+      pipeline.cancel()
+  """
+
+  # marks the end of planning in the segment queue
+  _END = object()
+
+  # seconds cancel waits for the planning thread before it leaves the thread
+  # to exit on its own
+  CANCEL_TIMEOUT = 0.5
+
+  # planning threads of cancelled pipelines that had not exited by the end of
+  # cancel, see wait_for_cancelled
+  _lingering = set()
+  _lingering_lock = threading.Lock()
+
+  def __init__(self, plan_function):
+    """
+    plan_function -- function with no parameters that plans all segments and
+                     returns the merged trajectory. Its return value is only
+                     executed if no segment was pushed while it ran.
+    """
+    self._plan_function = plan_function
+    self._queue = queue.Queue()
+    self._cancelled = threading.Event()
+    self._pushed_count = 0
+    self._thread = threading.Thread(target=self._run, daemon=True)
+
+  def _run(self):
+    try:
+      trajectory = self._plan_function()
+      if self._pushed_count == 0 and not self._cancelled.is_set():
+        self._queue.put(trajectory)
+    except ArmPlanningError as err:
+      self._queue.put(err)
+    except Exception as err:
+      # any other error must also reach the executing thread, or it would wait
+      # forever for the next segment
+      self._queue.put(ArmPlanningError(f"Planning failed unexpectedly: {err}"))
+    finally:
+      self._queue.put(self._END)
+
+  def start(self):
+    """Begin planning in the background"""
+    self._thread.start()
+
+  def push_segment(self, trajectory):
+    """Make a planned segment available for execution. Called by the planning
+    thread.
+    trajectory -- moveit_msgs RobotTrajectory
+    """
+    if self._cancelled.is_set():
+      raise ArmPlanningError("Planning was cancelled")
+    self._pushed_count += 1
+    self._queue.put(trajectory)
+
+  def segments(self):
+    """Generator of planned segments in the order they were planned. Blocks
+    until the next segment is planned. Raises the ArmPlanningError of the
+    planning thread if planning failed after the previous segment.
+    """
+    POLL_PERIOD = 0.1 # seconds
+    while not rospy.is_shutdown():
+      try:
+        item = self._queue.get(timeout=POLL_PERIOD)
+      except queue.Empty:
+        continue
+      if item is self._END:
+        return
+      if isinstance(item, ArmPlanningError):
+        raise item
+      yield item
+
+  def cancel(self):
+    """Stop planning at the next segment. The planning thread exits when it
+    pushes the segment it is planning, which may take the whole planning time
+    of the segment, so it is only waited for CANCEL_TIMEOUT seconds. An abort
+    is then reported without waiting for the planning call in progress.
+    """
+    self._cancelled.set()
+    if not self._thread.is_alive():
+      return
+    self._thread.join(self.CANCEL_TIMEOUT)
+    if self._thread.is_alive():
+      with SegmentPipeline._lingering_lock:
+        SegmentPipeline._lingering.add(self._thread)
+
+  @classmethod
+  def wait_for_cancelled(cls):
+    """Wait for the planning threads of cancelled pipelines to exit, so the
+    move groups they plan with are free for other planning
+    """
+    with cls._lingering_lock:
+      threads = list(cls._lingering)
+      cls._lingering.clear()
+    for thread in threads:
+      thread.join()
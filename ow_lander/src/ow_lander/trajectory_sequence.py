@@ -5,26 +5,212 @@
 import rospy
 import time
 import math
-from numpy import arange
+import threading
+import numpy as np
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError
 
 import moveit_commander
-from moveit_msgs.srv import GetPositionFK
+from moveit_msgs.srv import (GetPositionIK, GetPositionIKRequest,
+                             GetStateValidity, GetStateValidityRequest)
 from moveit_msgs.msg import RobotTrajectory, MoveItErrorCodes
-from trajectory_msgs.msg import JointTrajectory, JointTrajectoryPoint
 from geometry_msgs.msg import Pose
 
 from ow_lander import math3d
-from ow_lander.common import create_header
-from ow_lander.exception import ArmPlanningError
+from ow_lander import math3d_array
+from ow_lander import constants
+from ow_lander.common import create_header, radians_equivalent
+from ow_lander.exception import (ArmPlanningError, ArmPlanningIncompleteError,
+                                 ArmPlanningTimeoutError)
+from ow_lander.kinematics import ForwardKinematics
+from ow_lander.fk_service import ForwardKinematicsService
+from ow_lander.inverse_kinematics import InverseKinematics
+from ow_lander.plan_cache import PlanCache
+from ow_lander.trajectory_library import TrajectoryLibrary
+from ow_lander.planning_pool import PlanningContextPool
+from ow_lander.planner_portfolio import PlannerPortfolio
+from ow_lander.planning_telemetry import PlanningTelemetry
+from ow_lander.columnar_trajectory import ColumnarTrajectory
+from ow_lander.trajectory_timing import TrajectoryRetimer, retime
+from ow_lander.trajectory_compression import TrajectoryCompressor
+
+def _pose_to_tuple(pose):
+  """Flattens a geometry_msgs Pose so it can be part of a plan cache request"""
+  p, o = pose.position, pose.orientation
+  return (p.x, p.y, p.z, o.x, o.y, o.z, o.w)
+
+def _joint_positions_equivalent(positions1, positions2):
+  return len(positions1) == len(positions2) and all(
+    radians_equivalent(a, b, constants.ARM_JOINT_TOLERANCE)
+      for a, b in zip(positions1, positions2))
+
+def robot_state_at(state, joint_names, joint_positions):
+  """Set joints of a robot state to the provided positions
+  state           -- moveit_msgs RobotState, e.g. the current state of a move
+                     group, which is modified
+  joint_names     -- names of the joints to set
+  joint_positions -- positions of the joints in radians
+  returns state, in which all other joints keep their positions
+  """
+  positions = list(state.joint_state.position)
+  for name, position in zip(joint_names, joint_positions):
+    positions[state.joint_state.name.index(name)] = position
+  state.joint_state.position = positions
+  return state
+
+def _completed_future(result):
+  future = Future()
+  future.set_result(result)
+  return future
+
+def _failed_future(error):
+  future = Future()
+  future.set_exception(error)
+  return future
+
+
+class _PendingSegment:
+  """A segment whose planning was deferred by parallel planning"""
+
+  def __init__(self, index, request, plan_function, start_positions, future):
+    self.index = index
+    self.request = request
+    self.plan_function = plan_function
+    self.start_positions = start_positions
+    self.future = future
+
+
+class SequenceCheckpoint:
+  """Record of the segments of a sequence that were planned and executed for a
+  goal. When a sequence is planned again for the same goal after it failed,
+  the checkpoint lets it resume at the first segment that did not complete:
+  segments before it are skipped, the segment itself is planned from the
+  current joint state, and segments after it are reused as planned before if
+  they still start where the sequence reaches.
+  """
+
+  def __init__(self, goal):
+    """
+    goal -- serialized goal the sequence is planned for
+    """
+    self.goal = goal
+    self._lock = threading.Lock()
+    # maps segment index to a tuple of its request, its start joint positions,
+    # and the moveit_msgs RobotTrajectory that was planned for it
+    self._segments = dict()
+    # indices of the segments appended to the sequence in order
+    self._appended = list()
+    self._executed_count = 0
+    # number of segments from the start of the sequence that were executed
+    self._completed = 0
+    self._resume_index = None
+    self._group = None
+    # joint positions of the arm when the sequence failed
+    self._rest_positions = None
+
+  @property
+  def completed(self):
+    """number of segments from the start of the sequence that completed"""
+    with self._lock:
+      return self._completed
+
+  @property
+  def resume_index(self):
+    """index of the segment planning resumes at or None if the sequence is
+    not being resumed
+    """
+    with self._lock:
+      return self._resume_index
+
+  def attach(self, move_group):
+    """Set the MoveGroupCommander of the sequence"""
+    self._group = move_group
+
+  def record_segment(self, index, request, start_positions, trajectory):
+    """Record a segment that was appended to the sequence"""
+    with self._lock:
+      self._segments[index] = (request, list(start_positions), trajectory)
+      self._appended.append(index)
+
+  def record_executed(self):
+    """Record that the next appended segment has finished executing"""
+    with self._lock:
+      if self._executed_count < len(self._appended):
+        self._completed = self._appended[self._executed_count] + 1
+      self._executed_count += 1
+
+  def suspend(self):
+    """Record the joint positions the arm was left at by the failure"""
+    if self._group is not None:
+      self._rest_positions = self._group.get_current_joint_values()
+
+  def can_resume(self, goal):
+    """returns True if the sequence can be resumed for goal, which requires
+    that the arm has not moved since the sequence failed
+    goal -- serialized goal
+    """
+    if goal != self.goal or self._rest_positions is None:
+      return False
+    return _joint_positions_equivalent(self._rest_positions,
+                                       self._group.get_current_joint_values())
+
+  def resume(self):
+    """Prepare the checkpoint for the sequence to be planned again"""
+    with self._lock:
+      self._resume_index = self._completed
+      self._appended = list()
+      self._executed_count = 0
+      self._rest_positions = None
+
+  def get_segment(self, index, request, start_positions=None):
+    """Look up a segment that was planned before
+    index           -- index of the segment in the sequence
+    request         -- tuple that identifies the planning call of the segment
+    start_positions -- joint positions the segment must start from. If not
+                       provided, the start is not checked.
+    returns the moveit_msgs RobotTrajectory of the segment or None if none was
+    planned for the same request from the same start
+    """
+    with self._lock:
+      segment = self._segments.get(index)
+    if segment is None or segment[0] != request:
+      return None
+    if start_positions is not None \
+        and not _joint_positions_equivalent(segment[1], start_positions):
+      return None
+    return segment[2]
+
 
 class TrajectorySequence:
   """Plan a sequence of trajectories for a given robot and move group. If an
-  end-effector is provided, IK can be used to plan to poses.
+  end-effector is provided, IK can be used to plan to poses. If the parameter
+  local_cartesian_planning/enabled is True in the private namespace of the node
+  and the end-effector is supported by InverseKinematics, Cartesian paths are
+  solved in-process and MoveIt is only used to check them for collisions.
+  MoveIt's compute_cartesian_path remains the fallback whenever that fails.
+  Planning of the whole sequence can be bounded with set_deadline. Every
+  planning call is recorded by the PlanningTelemetry. A SequenceCheckpoint
+  set with set_checkpoint records the progress of the sequence and lets it
+  resume after a failure.
   """
 
-  SRV_COMPUTE_FK = '/compute_fk'
+  SRV_COMPUTE_IK = '/compute_ik'
+  SRV_CHECK_STATE_VALIDITY = '/check_state_validity'
 
-  def __init__(self, robot, move_group, end_effector=None):
+  def __init__(self, robot, move_group, end_effector=None, use_cache=True,
+               segment_cb=None, action=None):
+    """
+    robot        -- moveit_commander RobotCommander
+    move_group   -- moveit_commander MoveGroupCommander to plan for
+    end_effector -- name of the end-effector link. Required for IK planning.
+    use_cache    -- if True, trajectories may be served from and saved to the
+                    process-wide PlanCache
+    segment_cb   -- function called with each trajectory as soon as it is
+                    appended to the sequence. May raise ArmPlanningError to
+                    abort planning of the remainder of the sequence.
+    action       -- name of the action server the sequence is planned for,
+                    under which its planning calls are recorded
+    """
     self._ee = end_effector
     self._robot = robot
     self._group = move_group
@@ -32,12 +218,55 @@ class TrajectorySequence:
     self._sequence = list()
     self._most_recent_state = self._robot.get_current_state()
     self._most_recent_joint_positions = self._group.get_current_joint_values()
-    self._planning_time_total = 0.0
+    self._segment_cb = segment_cb
+    self._action = action
+    self._telemetry = PlanningTelemetry()
+    # the planner that produced the result of the planning call in progress on
+    # each thread
+    self._attempt = threading.local()
+    # number of segments whose planning has begun, which is also the index of
+    # the next segment
+    self._segments_begun = 0
+    # planning deadline of the sequence, see set_deadline
+    self._deadline = None
+    self._deadline_start = None
+    self._expected_segments = None
+    # progress of the sequence, see set_checkpoint
+    self._checkpoint = None
+    self._resume_index = None
+    # segments awaiting planning while in a parallel_planning block
+    self._pending = None
+    self._executor = None
+    self._compute_ik_srv = None
+    self._cache = None
+    if use_cache:
+      cache = PlanCache()
+      if cache.enabled:
+        self._cache = cache
+    self._library = TrajectoryLibrary()
+    self._retimer = None
+    retimer = TrajectoryRetimer()
+    if retimer.enabled:
+      self._retimer = retimer
+    self._compressor = None
+    compressor = TrajectoryCompressor()
+    if compressor.enabled:
+      self._compressor = compressor
     # initialize forward-kinematics facility
-    SERVICE_TIMEOUT = 30 # seconds
-    rospy.wait_for_service(self.SRV_COMPUTE_FK, SERVICE_TIMEOUT)
-    self._compute_fk_srv = rospy.ServiceProxy(self.SRV_COMPUTE_FK,
-                                              GetPositionFK)
+    # NOTE: the /compute_fk service is only used for end-effectors the analytic
+    #       forward kinematics cannot compute
+    self._fk = None
+    if self._ee is not None:
+      fk = ForwardKinematics()
+      if fk.supports_link(self._ee):
+        self._fk = fk
+    self._ik = None
+    # per-thread proxy of the check_state_validity service
+    self._state_validity = threading.local()
+    if self._fk is not None \
+        and rospy.get_param('~local_cartesian_planning/enabled', False):
+      self._ik = InverseKinematics()
+    self._fk_service = ForwardKinematicsService()
     if self._ee is not None:
       self._old_ee = self._group.get_end_effector_link()
       # compute_cartesian_path requires this is set to work properly
@@ -67,45 +296,516 @@ class TrajectorySequence:
       return self._group.get_joints().index(joint_name)
 
   def _compute_forward_kinematics(self, robot_state):
-    # TODO unhandled exception could be raised
     self._assert_end_effector_set()
-    result = self._compute_fk_srv(create_header('base_link'),# rospy.Time.now()),
-                                  [self._ee], robot_state)
-    if result.error_code.val != MoveItErrorCodes.SUCCESS:
-      raise ArmPlanningError(f"{self.SRV_COMPUTE_FK} service returned "
-                          f"error code {result.error_code}")
-    return result.pose_stamped[0].pose
+    if self._fk is not None:
+      try:
+        return self._fk.compute_pose(self._ee, robot_state.joint_state.name,
+                                     robot_state.joint_state.position)
+      except ValueError as err:
+        raise ArmPlanningError(f"Forward kinematics failed: {err}")
+    return self._fk_service.compute_pose(self._ee, robot_state)
 
   def _get_final_joint_positions_of(self, trajectory):
     return trajectory.joint_trajectory.points[-1].positions
 
+  def _get_robot_state_at(self, joint_names, joint_positions):
+    """Create a robot state in which the named joints are set to the provided
+    positions and all other joints keep their current positions
+    """
+    return robot_state_at(self._group.get_current_state(), joint_names,
+                          joint_positions)
+
   def _get_final_robot_state_of(self, trajectory):
     assert(len(trajectory.joint_trajectory.points) > 0)
-    rs = self._group.get_current_state()
-    joint_states = self._get_final_joint_positions_of(trajectory)
-    # TODO: is there not better way to do this???
-    # adding antenna (0,0) and grinder positions (-0.1) which should not change
-    rs.joint_state.position = (
-        0, 0) + joint_states[:5] + (-0.1,) + (joint_states[5],)
-    return rs
-
-  def _append_trajectory(self, trajectory, planning_time):
-    rospy.logdebug(f"Trajectory took {planning_time} seconds to plan.")
+    return self._get_robot_state_at(trajectory.joint_trajectory.joint_names,
+      self._get_final_joint_positions_of(trajectory))
+
+  def _append_trajectory(self, index, request, start_positions, trajectory):
+    if self._checkpoint is not None:
+      self._checkpoint.record_segment(index, request, start_positions,
+                                      trajectory)
     self._sequence.append(trajectory)
     self._most_recent_state = self._get_final_robot_state_of(trajectory)
     self._most_recent_joint_positions \
       = list(self._get_final_joint_positions_of(trajectory))
-    self._planning_time_total += planning_time
+    if self._segment_cb is not None:
+      # segments handed over for execution one by one cannot be blended, but
+      # are still post-processed on their own
+      if self._post_processing_enabled():
+        trajectory = self._post_process(
+          [ColumnarTrajectory.from_msg(trajectory)]
+        ).to_msg(self._group.get_pose_reference_frame())
+      self._segment_cb(trajectory)
 
-  def _plan(self):
-    """Calls on MoveIt to plan the next trajectory of the sequence. If no
-    trajectory is provided, the plan is constructed from
+  def _post_processing_enabled(self):
+    return self._retimer is not None or self._compressor is not None
+
+  def _post_process(self, segments, pause=0.0):
+    """Joins segments and applies the enabled post-processing stages, which
+    are retiming followed by compression
+    segments -- list of ColumnarTrajectory
+    pause    -- seconds between segments when they are not retimed
+    returns a ColumnarTrajectory
     """
-    success, trajectory, planning_time, error_code = self._group.plan()
-    if not success:
-      raise ArmPlanningError(
-        f"MoveIt planning failed with error code: {error_code}")
-    self._append_trajectory(trajectory, planning_time)
+    if self._retimer is not None:
+      trajectory = self._retimed(segments, pause)
+    else:
+      trajectory = ColumnarTrajectory.concatenate(segments, pause=pause)
+    if self._compressor is not None:
+      trajectory = self._compressor.compress(trajectory, self._ee)
+    return trajectory
+
+  def _retimed(self, segments, pause=0.0):
+    """Retimes segments with the TrajectoryRetimer, unless that would not make
+    them faster
+    segments -- list of ColumnarTrajectory
+    pause    -- seconds between segments when they are not retimed
+    returns a ColumnarTrajectory
+    """
+    original = ColumnarTrajectory.concatenate(segments, pause=pause)
+    retimed = self._retimer.retime_segments(segments)
+    if retimed.duration >= original.duration:
+      return original
+    rospy.loginfo(f"Retiming shortened the {self._group.get_name()} trajectory "
+                  f"from {original.duration:.2f} to {retimed.duration:.2f} "
+                  f"seconds, saving {original.duration - retimed.duration:.2f} "
+                  "seconds")
+    return retimed
+
+  def set_deadline(self, deadline, segments=None):
+    """Bound the time spent planning the remainder of the sequence. Before
+    each segment is planned, the time left until the deadline is divided
+    evenly among the segments left to plan, and MoveIt is given the share of
+    the segment as its planning time if that is shorter than the planning time
+    of the move group. Planning is aborted with an
+    ArmPlanningTimeoutError that names the segment being planned once the
+    deadline has passed. Cartesian paths are not bounded by the planning time,
+    so the deadline is also checked right before compute_cartesian_path is
+    called. A segment that has been planned is kept even if the deadline
+    passed while it was planned.
+    deadline -- seconds from now by which planning must be complete
+    segments -- number of segments that remain to be planned. If not
+                provided, each segment may use all of the time that is left.
+    """
+    self._deadline = deadline
+    self._deadline_start = time.time()
+    self._expected_segments = None if segments is None \
+      else self._segments_begun + segments
+
+  def get_remaining_planning_time(self):
+    """returns the seconds left until the planning deadline or None if no
+    deadline is set
+    """
+    if self._deadline is None:
+      return None
+    return self._deadline - (time.time() - self._deadline_start)
+
+  def _check_deadline(self, index, request):
+    """raises ArmPlanningTimeoutError if the planning deadline has passed
+    while segment index was being planned
+    """
+    remaining = self.get_remaining_planning_time()
+    if remaining is not None and remaining <= 0:
+      raise ArmPlanningTimeoutError(index, request[0], self._deadline,
+                                    self._deadline - remaining)
+
+  def _check_segment_deadline(self):
+    """raises ArmPlanningTimeoutError if the planning deadline has passed
+    while the segment this thread plans was being planned
+    """
+    segment = getattr(self._attempt, 'segment', None)
+    if segment is not None:
+      self._check_deadline(*segment)
+
+  def _allot_planning_time(self, index, request):
+    """returns the planning time of segment index, which is its share of the
+    time left until the deadline, or None if no deadline is set
+    """
+    self._check_deadline(index, request)
+    remaining = self.get_remaining_planning_time()
+    if remaining is None:
+      return None
+    if self._expected_segments is None:
+      return remaining
+    return remaining / max(1, self._expected_segments - index)
+
+  def _begin_segment(self):
+    """returns the index of the next segment of the sequence"""
+    index = self._segments_begun
+    self._segments_begun += 1
+    return index
+
+  def set_checkpoint(self, checkpoint):
+    """Record the progress of the sequence in a SequenceCheckpoint. If the
+    checkpoint is being resumed, the segments it completed are skipped and
+    planning picks up at the first incomplete segment from the current joint
+    state, reusing the segments planned after it where they are still valid.
+    Must be called before any segment is planned.
+    checkpoint -- SequenceCheckpoint
+    """
+    checkpoint.attach(self._group)
+    self._checkpoint = checkpoint
+    self._resume_index = checkpoint.resume_index
+
+  def _skip_completed(self, index, request):
+    """Skip a segment of a resumed sequence that was completed before, so the
+    sequence continues from its end
+    returns True if the segment was skipped
+    """
+    if self._resume_index is None:
+      return False
+    if index < self._resume_index:
+      trajectory = self._checkpoint.get_segment(index, request)
+      if trajectory is not None:
+        self._most_recent_state = self._get_final_robot_state_of(trajectory)
+        self._most_recent_joint_positions \
+          = list(self._get_final_joint_positions_of(trajectory))
+        return True
+      rospy.logwarn(f"Segment {index} of the {self._group.get_name()} "
+                    "sequence differs from the one that completed before, so "
+                    "it resumes there instead of at segment "
+                    f"{self._resume_index}")
+    # the remainder of the sequence is planned from where the arm is now
+    self._resume_index = None
+    self._most_recent_state = self._robot.get_current_state()
+    self._most_recent_joint_positions = self._group.get_current_joint_values()
+    return False
+
+  def _find_reusable(self, request, index):
+    """returns the trajectory of a segment planned before for a checkpoint
+    that starts at the most recent joint positions, or None if there is none
+    """
+    if self._checkpoint is None:
+      return None
+    start = time.time()
+    trajectory = self._checkpoint.get_segment(index, request,
+                                              self._most_recent_joint_positions)
+    if trajectory is not None:
+      self._record(self._group, request[0], 'checkpoint', start, trajectory,
+                   planner_id='checkpoint')
+    return trajectory
+
+  def _add_planned_segment(self, index, request, plan_function, trajectory,
+                           lookup_time):
+    """Append a segment that did not have to be planned. Within a
+    parallel_planning block it is kept in order with the deferred segments,
+    and planned live if the segment before it ends elsewhere.
+    """
+    if self._pending is None:
+      self._append_trajectory(index, request,
+                              self._most_recent_joint_positions, trajectory)
+      return
+    self._pending.append(_PendingSegment(index, request, plan_function,
+      self._most_recent_joint_positions,
+      _completed_future((trajectory, lookup_time))))
+    self._most_recent_state = self._get_final_robot_state_of(trajectory)
+    self._most_recent_joint_positions \
+      = list(self._get_final_joint_positions_of(trajectory))
+
+  def _record(self, group, segment_type, source, start, trajectory=None,
+              error=None, planner_id=None):
+    """Record a planning call with the PlanningTelemetry
+    group        -- MoveGroupCommander the call planned with
+    segment_type -- type of the planned segment
+    source       -- 'planner', 'cache', 'library', or 'checkpoint'
+    start        -- time the call started at
+    trajectory   -- moveit_msgs RobotTrajectory that was planned, if any
+    error        -- ArmPlanningError the call failed with, if any
+    planner_id   -- planner that produced the result. If not provided, the
+                    planner set with _annotate_planner or else the planner of
+                    group is recorded.
+    """
+    wall_time = time.time() - start
+    if planner_id is None:
+      planner_id = getattr(self._attempt, 'planner_id', None) \
+        or group.get_planner_id()
+    if trajectory is not None:
+      waypoint_count = len(trajectory.joint_trajectory.points)
+      fraction = 1.0
+    else:
+      waypoint_count = 0
+      fraction = getattr(error, 'fraction', 0.0)
+    self._telemetry.record(self._action, group.get_name(), segment_type,
+      source, planner_id, waypoint_count, trajectory is not None, fraction,
+      wall_time)
+
+  def _annotate_planner(self, planner_id):
+    """Set the planner recorded for the planning call in progress"""
+    self._attempt.planner_id = planner_id
+
+  def _plan_from(self, index, request, plan_function, group, start_state,
+                 start_positions):
+    """Plans a trajectory from a start state, or reuses a cached trajectory
+    that was planned for the same request from the same start state. If a
+    deadline is set, the planning time of group is limited to the share of
+    the segment for the duration of the plan.
+    index           -- index of the segment in the sequence
+    request         -- tuple that identifies the planning call and its
+                       arguments
+    plan_function   -- function with parameters (group, start_state) that
+                       plans the trajectory and returns a tuple of the
+                       trajectory and its planning time. If it has a
+                       planner_key attribute, the attribute identifies the
+                       planner in the cache key instead of the planner of
+                       group.
+    group           -- MoveGroupCommander the plan is computed with
+    start_state     -- moveit_msgs RobotState the trajectory starts from
+    start_positions -- positions of the group's joints in start_state
+    returns a tuple of the trajectory and its planning time
+    """
+    key = None
+    start = time.time()
+    self._attempt.planner_id = None
+    if self._cache is not None:
+      planner_key = getattr(plan_function, 'planner_key', None) \
+        or group.get_planner_id()
+      key = self._cache.make_key(group.get_name(), self._ee, planner_key,
+                                 start_positions, request)
+      trajectory = self._cache.get(key, start_positions)
+      if trajectory is not None:
+        self._record(group, request[0], 'cache', start, trajectory)
+        return trajectory, time.time() - start
+    allotted = self._allot_planning_time(index, request)
+    self._attempt.segment = (index, request)
+    previous = group.get_planning_time()
+    if allotted is not None:
+      group.set_planning_time(min(previous, allotted))
+    try:
+      trajectory, planning_time = plan_function(group, start_state)
+    except ArmPlanningError as err:
+      self._record(group, request[0], 'planner', start, error=err)
+      raise
+    finally:
+      self._attempt.segment = None
+      if allotted is not None:
+        group.set_planning_time(previous)
+    self._record(group, request[0], 'planner', start, trajectory)
+    if key is not None:
+      self._cache.put(key, trajectory)
+    return trajectory, planning_time
+
+  def _plan_segment(self, request, plan_function, end=None):
+    """Plans the next trajectory of the sequence. Within a parallel_planning
+    block planning is deferred if the end of the trajectory can be predicted.
+    request       -- tuple that identifies the planning call and its arguments
+    plan_function -- see _plan_from
+    end           -- joint positions or end-effector Pose the trajectory will
+                     end at, used to predict the start of the next trajectory
+    """
+    index = self._begin_segment()
+    if self._skip_completed(index, request):
+      return
+    self._plan_indexed_segment(index, request, plan_function, end)
+
+  def _plan_indexed_segment(self, index, request, plan_function, end):
+    """Plans segment index of the sequence. See _plan_segment"""
+    start = time.time()
+    trajectory = self._find_reusable(request, index)
+    if trajectory is not None:
+      self._add_planned_segment(index, request, plan_function, trajectory,
+                                time.time() - start)
+      return
+    if self._pending is not None and end is not None:
+      predicted = self._predict_joint_positions(end)
+      if predicted is not None:
+        self._defer_segment(index, request, plan_function, predicted)
+        return
+      # the next start cannot be predicted, so this segment must be planned
+      # from the actual end of the segments before it
+      self._resolve_pending()
+    start_positions = self._most_recent_joint_positions
+    trajectory, _ = self._plan_from(index, request, plan_function,
+      self._group, self._most_recent_state, start_positions)
+    self._append_trajectory(index, request, start_positions, trajectory)
+
+  def _motion_plan_function(self, set_target):
+    """Creates a plan function that calls on MoveIt to plan to a target. If the
+    PlannerPortfolio is enabled, the planners of the portfolio race to find
+    the plan instead of the group's own planner.
+    set_target -- function with a MoveGroupCommander parameter that sets the
+                  target of the plan
+    """
+    def plan_single(group, start_state):
+      group.set_start_state(start_state)
+      try:
+        set_target(group)
+      except moveit_commander.exception.MoveItCommanderException as err:
+        raise ArmPlanningError(
+          f"MoveIt planning failed with the following exception: {err}")
+      success, trajectory, planning_time, error_code = group.plan()
+      if not success:
+        raise ArmPlanningError(
+          f"MoveIt planning failed with error code: {error_code}")
+      return trajectory, planning_time
+    # plans are goals of the move_group action, which plans one at a time
+    plan_single.uses_move_group_action = True
+    portfolio = PlannerPortfolio()
+    if not portfolio.enabled:
+      return plan_single
+    def plan_portfolio(group, start_state):
+      # the planning time of group is the share of the segment when a
+      # deadline is set
+      deadline = None if self._deadline is None else group.get_planning_time()
+      trajectory, planning_time, winner = portfolio.plan(group.get_name(),
+        self._ee, lambda context: plan_single(context, start_state),
+        deadline=deadline)
+      self._annotate_planner(winner)
+      return trajectory, planning_time
+    # any planner of the portfolio may produce the plan, so cached plans are
+    # keyed on the portfolio
+    plan_portfolio.planner_key = portfolio.get_configuration()
+    plan_portfolio.uses_move_group_action = True
+    return plan_portfolio
+
+  def _predict_joint_positions(self, end):
+    """Predict the joint positions at the end of a trajectory
+    end -- joint positions or end-effector Pose
+    returns joint positions or None if inverse kinematics has no solution
+    """
+    if not isinstance(end, Pose):
+      return list(end)
+    if self._compute_ik_srv is None:
+      SERVICE_TIMEOUT = 30 # seconds
+      rospy.wait_for_service(self.SRV_COMPUTE_IK, SERVICE_TIMEOUT)
+      self._compute_ik_srv = rospy.ServiceProxy(self.SRV_COMPUTE_IK,
+                                                GetPositionIK)
+    IK_TIMEOUT = 0.1 # seconds
+    request = GetPositionIKRequest()
+    request.ik_request.group_name = self._group.get_name()
+    request.ik_request.robot_state = self._most_recent_state
+    request.ik_request.avoid_collisions = True
+    request.ik_request.ik_link_name = self._ee
+    request.ik_request.pose_stamped.header = create_header(
+      constants.FRAME_ID_BASE)
+    request.ik_request.pose_stamped.pose = end
+    request.ik_request.timeout = rospy.Duration(IK_TIMEOUT)
+    try:
+      result = self._compute_ik_srv(request)
+    except rospy.ServiceException as err:
+      rospy.logwarn(f"{self.SRV_COMPUTE_IK} service call failed: {err}")
+      return None
+    if result.error_code.val != MoveItErrorCodes.SUCCESS:
+      return None
+    solution = result.solution.joint_state
+    try:
+      return [solution.position[solution.name.index(name)]
+              for name in self._group.get_active_joints()]
+    except ValueError:
+      return None
+
+  def _defer_segment(self, index, request, plan_function, predicted_end):
+    """Submit a segment for planning in a separate planning context, then treat
+    its predicted end as the most recent state of the sequence. The move_group
+    action handles one goal at a time and cancels a pending goal when another
+    arrives, so segments planned with it are instead planned right away on
+    this thread, while the segments submitted before them are planned.
+    """
+    start_state = self._most_recent_state
+    start_positions = self._most_recent_joint_positions
+    if getattr(plan_function, 'uses_move_group_action', False):
+      try:
+        future = _completed_future(self._plan_from(index, request,
+          plan_function, self._group, start_state, start_positions))
+      except ArmPlanningError as err:
+        # the plan may only have failed from the predicted start
+        future = _failed_future(err)
+      self._pending.append(_PendingSegment(index, request, plan_function,
+                                           start_positions, future))
+      self._most_recent_state = self._get_robot_state_at(
+        self._group.get_active_joints(), predicted_end)
+      self._most_recent_joint_positions = list(predicted_end)
+      return
+    group_name = self._group.get_name()
+    planner_id = self._group.get_planner_id()
+    planning_time = self._group.get_planning_time()
+    def plan():
+      with PlanningContextPool().acquire(group_name, planner_id,
+                                         planning_time, self._ee) as group:
+        return self._plan_from(index, request, plan_function, group,
+                               start_state, start_positions)
+    self._pending.append(_PendingSegment(index, request, plan_function,
+      start_positions, self._executor.submit(plan)))
+    self._most_recent_state = self._get_robot_state_at(
+      self._group.get_active_joints(), predicted_end)
+    self._most_recent_joint_positions = list(predicted_end)
+
+  def _resolve_pending(self):
+    """Append all deferred segments in order. A segment whose predicted start
+    does not match the actual end of the segment before it, or whose planning
+    failed, is replanned from the actual end.
+    """
+    pending, self._pending = self._pending, list()
+    if len(pending) == 0:
+      return
+    # continuity is checked against the actual end of the sequence
+    if len(self._sequence) > 0:
+      self._most_recent_state = self._get_final_robot_state_of(
+        self._sequence[-1])
+      self._most_recent_joint_positions = list(
+        self._get_final_joint_positions_of(self._sequence[-1]))
+    else:
+      self._most_recent_state = self._robot.get_current_state()
+      self._most_recent_joint_positions = \
+        self._group.get_current_joint_values()
+    start = time.time()
+    replanned = 0
+    try:
+      for segment in pending:
+        if _joint_positions_equivalent(segment.start_positions,
+                                       self._most_recent_joint_positions):
+          try:
+            trajectory, _ = segment.future.result()
+          except (ArmPlanningError, CancelledError) as err:
+            rospy.logdebug(f"Segment {segment.index} planned in parallel "
+                           f"failed and is replanned: {err}")
+          else:
+            self._append_trajectory(segment.index, segment.request,
+                                    segment.start_positions, trajectory)
+            continue
+        segment.future.cancel()
+        replanned += 1
+        start_positions = self._most_recent_joint_positions
+        trajectory, _ = self._plan_from(segment.index, segment.request,
+          segment.plan_function, self._group, self._most_recent_state,
+          start_positions)
+        self._append_trajectory(segment.index, segment.request,
+                                start_positions, trajectory)
+    finally:
+      for segment in pending:
+        segment.future.cancel()
+    rospy.logdebug(f"Resolved {len(pending)} segments planned in parallel in "
+                   f"{time.time() - start} seconds of wall time; {replanned} "
+                   "were replanned.")
+
+  @contextmanager
+  def parallel_planning(self):
+    """Context manager within which the plan_* methods plan segments at the
+    same time in separate planning contexts. Each segment is planned from the
+    end of the segment before it, as predicted by inverse kinematics. Only
+    Cartesian paths are planned in the contexts; motion plans are planned one
+    at a time by the thread of the block, since the move_group action serves
+    one goal at a time. When the block exits, segments are appended in order
+    and any segment that failed or does not start where the actual segment
+    before it ends is replanned. e.g.
+      with sequence.parallel_planning():
+        sequence.plan_to_pose(pose1)
+        sequence.plan_linear_path_to_pose(pose2)
+    """
+    if self._pending is not None:
+      # already planning in parallel
+      yield
+      return
+    self._pending = list()
+    self._executor = ThreadPoolExecutor(PlanningContextPool().size)
+    try:
+      yield
+      self._resolve_pending()
+    finally:
+      for segment in self._pending:
+        segment.future.cancel()
+      self._executor.shutdown(wait=True)
+      self._executor = None
+      self._pending = None
 
   def _plan_to_coordinate(self, coordinate, position):
     """Internal helper function so position of a coordinate can be set
@@ -125,13 +825,11 @@ class TrajectorySequence:
     """
     if len(joint_positions) != self._joints_count:
       raise ArmPlanningError("Incorrect number of joints for arm move group")
-    self._group.set_start_state(self._most_recent_state)
-    try:
-      self._group.set_joint_value_target(joint_positions)
-    except moveit_commander.exception.MoveItCommanderException as err:
-      raise ArmPlanningError(
-        f"MoveIt planning failed with the following exception: {err}")
-    self._plan()
+    joint_positions = list(joint_positions)
+    self._plan_segment(('joint_positions', tuple(joint_positions)),
+      self._motion_plan_function(
+        lambda group: group.set_joint_value_target(joint_positions)),
+      end=joint_positions)
 
   def plan_to_joint_translations(self, joint_translations):
     """Plan for all joints to change their positions by a list of translations
@@ -149,7 +847,7 @@ class TrajectorySequence:
     kwargs -- keywords are joint names and their values are the joint's desired
               translation in radians
     """
-    positions = self._most_recent_joint_positions
+    positions = list(self._most_recent_joint_positions)
     for joint in kwargs:
       positions[self._lookup_joint_index(joint)] = kwargs[joint]
     self.plan_to_joint_positions(positions)
@@ -167,38 +865,163 @@ class TrajectorySequence:
     self.plan_to_joint_translations(translations)
 
   def plan_to_target(self, target_name):
-    """Plan to a named set of joint positions
+    """Plan to a named set of joint positions. A precomputed trajectory from the
+    TrajectoryLibrary is used if one starts from the most recent joint
+    positions in the sequence.
     target_name -- named set of joint positions
     """
-    self.plan_to_joint_positions(
-      self._group.get_named_target_values(target_name))
+    values = self._group.get_named_target_values(target_name)
+    positions = [values[name] for name in self._group.get_active_joints()]
+    request = ('joint_positions', tuple(positions))
+    plan_function = self._motion_plan_function(
+      lambda group: group.set_joint_value_target(positions))
+    index = self._begin_segment()
+    if self._skip_completed(index, request):
+      return
+    start = time.time()
+    trajectory = self._library.find(self._group.get_name(), target_name,
+                                    self._most_recent_joint_positions)
+    if trajectory is None:
+      self._plan_indexed_segment(index, request, plan_function, positions)
+      return
+    self._record(self._group, 'joint_positions', 'library', start, trajectory,
+                 planner_id='trajectory_library')
+    # the target is planned live if the segment before the library trajectory
+    # ends elsewhere
+    self._add_planned_segment(index, request, plan_function, trajectory,
+                              time.time() - start)
 
   def plan_to_pose(self, pose):
     """Plan the end-effector to a new pose
     pose -- geometry_msgs Pose end-effector will move to
     """
     self._assert_end_effector_set()
-    self._group.set_start_state(self._most_recent_state)
-    self._group.set_pose_target(pose, self._ee)
-    self._plan()
+    self._plan_segment(('pose', _pose_to_tuple(pose)),
+      self._motion_plan_function(
+        lambda group: group.set_pose_target(pose, self._ee)),
+      end=pose)
+
+  def _is_state_valid(self, group, robot_state):
+    # segments may be planned by parallel workers, and a persistent proxy must
+    # not be called by several threads at once, so each thread has its own
+    srv = getattr(self._state_validity, 'srv', None)
+    if srv is None:
+      SERVICE_TIMEOUT = 30 # seconds
+      rospy.wait_for_service(self.SRV_CHECK_STATE_VALIDITY, SERVICE_TIMEOUT)
+      srv = rospy.ServiceProxy(self.SRV_CHECK_STATE_VALIDITY, GetStateValidity,
+                               persistent=True)
+      self._state_validity.srv = srv
+    request = GetStateValidityRequest()
+    request.robot_state = robot_state
+    request.group_name = group.get_name()
+    try:
+      return srv(request).valid
+    except rospy.ServiceException as err:
+      # the connection may have been lost, so reconnect on the next check
+      self._state_validity.srv = None
+      srv.close()
+      raise ArmPlanningError(
+        f"{self.SRV_CHECK_STATE_VALIDITY} service call failed: {err}")
+
+  def _plan_cartesian_path_locally(self, group, start_state, waypoints,
+                                   step=None, max_deviation=None):
+    """Plan the end-effector through Cartesian waypoints with
+    InverseKinematics. Every state of the path is checked for collisions by
+    MoveIt. Either step or max_deviation must be provided.
+    group         -- MoveGroupCommander the plan is computed for
+    start_state   -- moveit_msgs RobotState the path starts from
+    waypoints     -- numpy array of shape (N, 7) of end-effector poses
+    step          -- maximal end-effector distance between states (meters).
+                     States are interpolated between waypoints like
+                     compute_cartesian_path does.
+    max_deviation -- maximal distance (meters) between the straight lines
+                     through the waypoints and the end-effector halfway
+                     between states. States are only added between waypoints
+                     where it would deviate further, see
+                     InverseKinematics.solve_sparse_path.
+    returns a tuple of the trajectory and its planning time
+    """
+    # largest joint change between states that is not considered a jump to a
+    # different configuration of the arm
+    MAX_JOINT_STEP = 0.2 # radians
+    start_time = time.time()
+    joint_names = group.get_active_joints()
+    state_positions = dict(zip(start_state.joint_state.name,
+                               start_state.joint_state.position))
+    start_positions = [state_positions[name] for name in joint_names]
+    try:
+      if step is None:
+        _, positions = self._ik.solve_sparse_path(self._ee, joint_names,
+          start_positions, waypoints, MAX_JOINT_STEP, max_deviation)
+      else:
+        start_pose = self._fk.compute_poses(self._ee, joint_names,
+                                            start_positions)[0]
+        ends = np.vstack([start_pose, waypoints])
+        poses = np.vstack([math3d_array.linear_waypoints(a, b, step)
+                           for a, b in zip(ends[:-1], ends[1:])])
+        positions = self._ik.solve_path(self._ee, joint_names,
+                                        start_positions, poses, MAX_JOINT_STEP)
+    except ValueError as err:
+      raise ArmPlanningError(f"Local Cartesian path planning failed. {err}")
+    state = self._get_robot_state_at(joint_names, start_positions)
+    indices = [state.joint_state.name.index(name) for name in joint_names]
+    for i, row in enumerate(positions.tolist()):
+      state_positions = list(state.joint_state.position)
+      for index, position in zip(indices, row):
+        state_positions[index] = position
+      state.joint_state.position = state_positions
+      if not self._is_state_valid(group, state):
+        raise ArmPlanningError("Local Cartesian path planning failed. The arm "
+                               f"would be in collision at waypoint {i}")
+    path = ColumnarTrajectory(joint_names, np.zeros(len(positions) + 1),
+                              np.vstack([start_positions, positions]))
+    trajectory = retime(path, *TrajectoryRetimer().get_limits(joint_names))
+    return trajectory.to_msg(group.get_pose_reference_frame()), \
+      time.time() - start_time
+
+  def _try_local_cartesian_path(self, group, start_state, waypoints,
+                                step=None, max_deviation=None):
+    """returns the result of _plan_cartesian_path_locally or None if local
+    planning is disabled or failed
+    """
+    if self._ik is None:
+      return None
+    try:
+      result = self._plan_cartesian_path_locally(group, start_state,
+        waypoints, step=step, max_deviation=max_deviation)
+      self._annotate_planner('local_ik')
+      return result
+    except ArmPlanningError as err:
+      rospy.logdebug(f"{err} Falling back to compute_cartesian_path.")
+      return None
 
   def plan_linear_path_to_pose(self, pose):
     """Plan the end-effector along a linear path from its most recent pose in
     the sequence to a new pose
     pose -- geometry_msgs Pose
     """
-    self._group.set_start_state(self._most_recent_state)
-    start = time.time()
-    trajectory, fraction = self._group.compute_cartesian_path(
-      [pose], # sequence of waypoints
-      0.01,   # end-effector follow step (meters)
-      0.0     # jump threshold
-    )
-    planning_time = time.time() - start
-    if fraction != 1.0:
-      raise ArmPlanningError("Linear path planning failed. Can only plan up to "
-                            f"{fraction * 100:.1f}% of the way")
-    self._append_trajectory(trajectory, planning_time)
+    STEP = 0.01 # meters
+    def plan(group, start_state):
+      result = self._try_local_cartesian_path(
+        group, start_state, math3d_array.poses_from_msgs([pose]), step=STEP)
+      if result is not None:
+        return result
+      self._annotate_planner('compute_cartesian_path')
+      # compute_cartesian_path is not bounded by the planning time
+      self._check_segment_deadline()
+      group.set_start_state(start_state)
+      start = time.time()
+      trajectory, fraction = group.compute_cartesian_path(
+        [pose], # sequence of waypoints
+        STEP,   # end-effector follow step (meters)
+        0.0     # jump threshold
+      )
+      planning_time = time.time() - start
+      if fraction != 1.0:
+        raise ArmPlanningIncompleteError("Linear path planning failed. Can "
+          f"only plan up to {fraction * 100:.1f}% of the way", fraction)
+      return trajectory, planning_time
+    self._plan_segment(('linear', _pose_to_tuple(pose)), plan, end=pose)
 
   def plan_circular_path_to_pose(self, pose, center):
     """Plan the end-effector along a circular path from its most recent pose in
@@ -212,68 +1035,81 @@ class TrajectorySequence:
     center -- geometry_msgs Point/Vector3 -- The center of the circle traced out
               by the end-effector.
     """
-    ARC_INCREMENT = 0.02 # meters
-    # track planning time
-    start_time = time.time()
-    current = self._compute_forward_kinematics(self._most_recent_state)
-    # compute pose positions relative to the circle's center (points of contact)
-    poc1 = math3d.subtract(current.position, center)
-    poc2 = math3d.subtract(pose.position, center)
-    if math3d.vectors_approx_equivalent(poc1, poc2, 1e-5):
-      raise ArmPlanningError(
-        "Circular path planning failed. The intended end-effector position "
-        "may not be the same as the most recent position in the sequence."
-      )
-    r1 = math3d.norm(poc1)
-    r2 = math3d.norm(poc2)
-    if math.isclose(r1, 0) or math.isclose(r2, 0):
-      raise ArmPlanningError(
-        "Circular path planning failed. The position of the circle's center "
-        "may not be at the same location as the intended position or the most "
-        "recent end-effector position in the sequence."
+    # waypoints are placed as densely as these bounds require
+    MAX_ARC_DEVIATION = 0.001 # meters
+    MAX_ARC_ROTATION = 0.25   # radians
+    MAX_ARC_STEP = 0.05       # meters
+    # the states of the local path are joined by joint-space interpolation
+    # when the trajectory is executed. States are only added between
+    # waypoints where it would stray further than this from the straight line
+    # between them, so the end-effector stays within MAX_ARC_DEVIATION plus
+    # this of the arc.
+    MAX_EXECUTED_DEVIATION = 0.001 # meters
+    # end-effector distance between the states of compute_cartesian_path,
+    # which cannot bound the executed deviation
+    EEF_STEP = 0.01 # meters
+    def plan(group, start_state):
+      # track planning time
+      start_time = time.time()
+      current = self._compute_forward_kinematics(start_state)
+      # compute pose positions relative to the circle's center
+      # (points of contact)
+      poc1 = math3d.subtract(current.position, center)
+      poc2 = math3d.subtract(pose.position, center)
+      if math3d.vectors_approx_equivalent(poc1, poc2, 1e-5):
+        raise ArmPlanningError(
+          "Circular path planning failed. The intended end-effector position "
+          "may not be the same as the most recent position in the sequence."
+        )
+      r1 = math3d.norm(poc1)
+      r2 = math3d.norm(poc2)
+      if math.isclose(r1, 0) or math.isclose(r2, 0):
+        raise ArmPlanningError(
+          "Circular path planning failed. The position of the circle's "
+          "center may not be at the same location as the intended position or "
+          "the most recent end-effector position in the sequence."
+        )
+      # populate a list of poses along the circle between the current pose
+      # and the goal pose, ending exactly at the goal pose
+      # NOTE: this allows for r1 =/= r2, but if this is the case the
+      # trajectory will not necessarily be circular
+      waypoints = math3d_array.adaptive_circular_waypoints(
+        math3d_array.poses_from_msgs([current])[0],
+        math3d_array.poses_from_msgs([pose])[0],
+        math3d_array.vectors_from_msgs([center])[0],
+        MAX_ARC_DEVIATION, MAX_ARC_ROTATION, MAX_ARC_STEP
       )
-    # use the cosine identity of the dot product to find the arc length between
-    # the two points of contact
-    # NOTE: this allows for r1 =/= r2, but if this is the case the trajectory
-    # will not necessarily be circular
-    arc_length = r1 * math.acos(math3d.dot(poc1, poc2) / (r1 * r2))
-    # populate a list of poses along the circle between pose1 and pose2
-    poses = list()
-    t_step = ARC_INCREMENT / arc_length
-    # start at t_step so the starting pose is not included in the resulting list
-    for t in arange(t_step, 1.0, t_step):
-      poc = math3d.slerp(poc1, poc2, t)
-      orientation = math3d.slerp_quaternion(
-        current.orientation, pose.orientation, t
+      result = self._try_local_cartesian_path(group, start_state, waypoints,
+        max_deviation=MAX_EXECUTED_DEVIATION)
+      if result is not None:
+        # include the time spent computing waypoints
+        return result[0], time.time() - start_time
+      self._annotate_planner('compute_cartesian_path')
+      # compute_cartesian_path is not bounded by the planning time
+      self._check_segment_deadline()
+      poses = math3d_array.poses_to_msgs(waypoints)
+      # plan path using the series of Cartesian poses
+      group.set_start_state(start_state)
+      trajectory, fraction = group.compute_cartesian_path(
+        poses, EEF_STEP, 0
       )
-      poses.append(Pose(math3d.add(center, poc), orientation))
-    # the previous loop may result in a final pose that's not quite there
-    if math3d.vectors_approx_equivalent(poses[-1].position,
-                                        pose.position, 1e-3):
-      # replace final pose with goal if difference is less than 1 mm
-      poses[-1] = pose
-    else:
-      # otherwise, add the goal onto the end of the sequence
-      poses.append(pose)
-    # plan path using the series of Cartesian poses
-    self._group.set_start_state(self._most_recent_state)
-    trajectory, fraction = self._group.compute_cartesian_path(
-      poses, ARC_INCREMENT / 2.0, 0
-    )
 
-    planning_time = time.time() - start_time
-    if len(trajectory.joint_trajectory.points) < 3:
-      raise ArmPlanningError(
-        "Circular path planning failed. Only two or fewer trajectory points "
-        "were generated. Either the commanded circle radius or arc length are "
-        "too small and will not produce a circular movement."
-      )
-    if fraction != 1.0:
-      raise ArmPlanningError(
-        "Circular path planning failed. Can only plan up to "
-        f"{fraction * 100:.1f}% of the way"
-      )
-    self._append_trajectory(trajectory, planning_time)
+      planning_time = time.time() - start_time
+      if len(trajectory.joint_trajectory.points) < 3:
+        raise ArmPlanningError(
+          "Circular path planning failed. Only two or fewer trajectory "
+          "points were generated. Either the commanded circle radius or arc "
+          "length are too small and will not produce a circular movement."
+        )
+      if fraction != 1.0:
+        raise ArmPlanningIncompleteError(
+          "Circular path planning failed. Can only plan up to "
+          f"{fraction * 100:.1f}% of the way", fraction
+        )
+      return trajectory, planning_time
+    self._plan_segment(
+      ('circular', _pose_to_tuple(pose), (center.x, center.y, center.z)), plan,
+      end=pose)
 
   def plan_linear_translation(self, translation):
     """Plan the end-effector along a linear path form its most recent pose in
@@ -344,33 +1180,35 @@ class TrajectorySequence:
     """return end-effector pose at the end of the current sequence"""
     return self._compute_forward_kinematics(self._most_recent_state)
 
+  def merge_columnar(self):
+    """Merge all trajectories in the sequence into a single trajectory without
+    creating any messages. Must be called after calling at least one
+    `plan_to_*` method.
+    returns a ColumnarTrajectory that is a merge of all contained trajectories
+    """
+    BETWEEN_TRAJECTORY_PAUSE = 0.1 # seconds
+    if len(self._sequence) == 0:
+      raise ArmPlanningError("Sequence contains no trajectories")
+    segments = [ColumnarTrajectory.from_msg(t) for t in self._sequence]
+    # segments that were handed to segment_cb have already been post-processed
+    if self._post_processing_enabled() and self._segment_cb is None:
+      return self._post_process(segments, pause=BETWEEN_TRAJECTORY_PAUSE)
+    # add a small pause between trajectories so there are no points that
+    # overlap in time
+    return ColumnarTrajectory.concatenate(segments,
+                                          pause=BETWEEN_TRAJECTORY_PAUSE)
+
   def merge(self):
-    """Merge all trajectories in the sequence into a single trajectory. Must be
-    called after calling at least one `plan_to_*` method.
+    """Merge all trajectories in the sequence into a single trajectory. If the
+    TrajectoryRetimer is enabled, the merged trajectory is retimed to the joint
+    limits. If the TrajectoryCompressor is enabled, redundant points are
+    removed from it. Must be called after calling at least one `plan_to_*`
+    method.
     returns a moveit_msgs/RobotTrajectory that is a merge of all contained
     trajectories
     """
-    BETWEEN_TRAJECTORY_PAUSE = rospy.Duration(0.1)
-    if len(self._sequence) == 0:
-      raise ArmPlanningError("Sequence contains no trajectories")
-    if len(self._sequence) == 1:
+    if len(self._sequence) == 1 \
+        and (not self._post_processing_enabled()
+             or self._segment_cb is not None):
       return self._sequence[0]
-    rospy.logdebug("Total time for planning the sequence was "
-                   f"{self._planning_time_total} seconds")
-    # merge trajectories together
-    merged = JointTrajectory()
-    merged.header.frame_id = self._group.get_pose_reference_frame()
-    merged.joint_names = self._sequence[0].joint_trajectory.joint_names
-    time_offset = rospy.Duration(0)
-    for trajectory in self._sequence:
-      merged.points += [
-        JointTrajectoryPoint(
-          x.positions, x.velocities, x.accelerations, x.effort,
-          x.time_from_start + time_offset
-        ) for x in trajectory.joint_trajectory.points
-      ]
-      # for next loop add total duration of this trajectory
-      time_offset += trajectory.joint_trajectory.points[-1].time_from_start \
-      # add a small pause so there are no points that overlap in time
-      time_offset += BETWEEN_TRAJECTORY_PAUSE
-    return RobotTrajectory(joint_trajectory = merged)
+    return self.merge_columnar().to_msg(self._group.get_pose_reference_frame())
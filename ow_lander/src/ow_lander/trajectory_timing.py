@@ -0,0 +1,223 @@
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+"""Defines the time-optimal retiming of joint trajectories against the joint
+limits of the lander, and the blending of the segments of a trajectory
+sequence into one continuous motion.
+"""
+
+import numpy as np
+
+import rospy
+from urdf_parser_py.urdf import URDF
+
+from ow_lander.common import Singleton
+from ow_lander.columnar_trajectory import ColumnarTrajectory
+
+# consecutive points closer than this (radians) are the same configuration
+DUPLICATE_TOLERANCE = 1e-9
+# share of the acceleration limits that changes of direction at points may use.
+# The remainder is left for speeding up and slowing down along the path.
+TURN_ACCELERATION_SHARE = 0.5
+
+def _maximize_speed(v_limit, step_amax, ds):
+  """Forward and backward passes that bound the path speed at each point by
+  the speed that can be reached from its neighbors
+  """
+  v = v_limit.tolist()
+  reach = (2.0 * step_amax * ds).tolist()
+  for k in range(len(v) - 1):
+    v[k + 1] = min(v[k + 1], (v[k] * v[k] + reach[k]) ** 0.5)
+  for k in range(len(v) - 2, -1, -1):
+    v[k] = min(v[k], (v[k + 1] * v[k + 1] + reach[k]) ** 0.5)
+  return np.array(v)
+
+def retime(trajectory, velocity_limits, acceleration_limits, stops=()):
+  """Compute the fastest timing of a trajectory's path that obeys joint limits.
+  The path is followed through its points in order. The path speed is
+  maximized by a forward and a backward pass under the velocity limit of each
+  point and the acceleration limit between points, where the velocity limit of
+  a point also bounds the acceleration needed to change direction at it.
+  trajectory          -- ColumnarTrajectory
+  velocity_limits     -- array of shape (J,) of maximal joint speeds
+  acceleration_limits -- array of shape (J,) of maximal joint accelerations
+  stops               -- indices of points at which the arm must be at rest in
+                         addition to the first and last points
+  returns a ColumnarTrajectory with the same points and new times,
+  velocities, and accelerations
+  """
+  q = trajectory.positions
+  vmax = np.asarray(velocity_limits, dtype=float)
+  amax = np.asarray(acceleration_limits, dtype=float)
+  at_rest = np.zeros(len(q), dtype=bool)
+  at_rest[list(stops)] = True
+  # drop repeated configurations, which have no direction. The first point of
+  # a run of repeats is kept, so a stop at the end of a segment is kept too.
+  steps = np.diff(q, axis=0)
+  keep = np.concatenate(([True],
+    np.any(np.abs(steps) > DUPLICATE_TOLERANCE, axis=1)))
+  run = np.cumsum(keep) - 1
+  at_rest = np.bincount(run, weights=at_rest)[:keep.sum()] > 0
+  q = q[keep]
+  n = len(q)
+  if n < 2:
+    return ColumnarTrajectory(trajectory.joint_names, np.zeros(n), q,
+                              np.zeros_like(q), np.zeros_like(q))
+  steps = np.diff(q, axis=0)
+  ds = np.linalg.norm(steps, axis=1)
+  tangents = steps / ds[:, None]
+  with np.errstate(divide='ignore'):
+    # path speed and acceleration limits of each step between points
+    step_vmax = np.min(vmax / np.abs(tangents), axis=1)
+    step_amax = np.min(amax / np.abs(tangents), axis=1)
+    # changing direction at a point takes an acceleration of roughly
+    # v^2 |dT| / ds, where dT is the change in direction
+    turn = np.abs(np.diff(tangents, axis=0))
+    mean_ds = (ds[:-1] + ds[1:]) / 2
+    turn_amax = TURN_ACCELERATION_SHARE * amax
+    turn_vmax = np.min(np.sqrt(turn_amax * mean_ds[:, None] / turn), axis=1)
+  v_limit = np.full(n, np.inf)
+  v_limit[:-1] = step_vmax
+  v_limit[1:] = np.minimum(v_limit[1:], step_vmax)
+  v_limit[1:-1] = np.minimum(v_limit[1:-1], turn_vmax)
+  v_limit[at_rest] = 0.0
+  v_limit[[0, -1]] = 0.0
+  v = _maximize_speed(v_limit, step_amax, ds)
+  # leave only the acceleration that is not spent on changing direction at
+  # either end of a step for speeding up or slowing down along it. Speeds only
+  # decrease in the second round, so the turns stay within their share.
+  turn_usage = np.zeros_like(q)
+  turn_usage[1:-1] = v[1:-1, None] ** 2 * turn / mean_ds[:, None]
+  remaining = amax - np.maximum(turn_usage[:-1], turn_usage[1:])
+  with np.errstate(divide='ignore'):
+    step_amax = np.min(remaining / np.abs(tangents), axis=1)
+  v = _maximize_speed(v, step_amax, ds)
+  # constant path acceleration between consecutive points
+  v_sum = v[:-1] + v[1:]
+  with np.errstate(divide='ignore', invalid='ignore'):
+    dt = np.where(v_sum > 0, 2.0 * ds / v_sum, 2.0 * np.sqrt(ds / step_amax))
+  times = np.concatenate(([0.0], np.cumsum(dt)))
+  directions = np.empty_like(q)
+  directions[0] = tangents[0]
+  directions[-1] = tangents[-1]
+  directions[1:-1] = (tangents[:-1] + tangents[1:]) / 2
+  velocities = v[:, None] * directions
+  # the accelerations of the profile above: the constant acceleration along
+  # each step, averaged over the steps either side of a point, plus the
+  # acceleration of changing direction at the point. The passes keep each
+  # within the share of the limits left to it, so their sum obeys the limits.
+  along = ((v[1:] - v[:-1]) / dt)[:, None] * tangents
+  accelerations = np.empty_like(q)
+  accelerations[0] = along[0]
+  accelerations[-1] = along[-1]
+  accelerations[1:-1] = (along[:-1] + along[1:]) / 2 \
+    + v[1:-1, None] ** 2 * np.diff(tangents, axis=0) / mean_ds[:, None]
+  return ColumnarTrajectory(trajectory.joint_names, times, q, velocities,
+                            accelerations)
+
+
+class JointLimits(metaclass=Singleton):
+  """Velocity and acceleration limits of the lander's joints. Velocity limits
+  are taken from the robot_description URDF and overridden by the joint limits
+  MoveIt loads into robot_description_planning. Joints without an acceleration
+  limit use MoveIt's default of 1 rad/s^2.
+  """
+
+  DEFAULT_ACCELERATION = 1.0 # rad/s^2
+
+  def __init__(self):
+    """May raise KeyError if robot_description is not on the parameter server"""
+    urdf = URDF.from_parameter_server()
+    overrides = rospy.get_param('/robot_description_planning/joint_limits', {})
+    self._velocity = dict()
+    self._acceleration = dict()
+    for joint in urdf.joints:
+      if joint.limit is not None and joint.limit.velocity:
+        self._velocity[joint.name] = joint.limit.velocity
+    for name, limits in overrides.items():
+      if limits.get('has_velocity_limits', False):
+        self._velocity[name] = limits['max_velocity']
+      if limits.get('has_acceleration_limits', False):
+        self._acceleration[name] = limits['max_acceleration']
+
+  def velocity_limits(self, joint_names):
+    """returns an array of the velocity limits of the named joints. Joints
+    without a limit are unlimited.
+    """
+    return np.array([self._velocity.get(n, np.inf) for n in joint_names])
+
+  def acceleration_limits(self, joint_names):
+    """returns an array of the acceleration limits of the named joints"""
+    return np.array([self._acceleration.get(n, self.DEFAULT_ACCELERATION)
+                     for n in joint_names])
+
+
+class TrajectoryRetimer(metaclass=Singleton):
+  """Retimes planned trajectories to the joint limits of the lander and blends
+  the segments of a sequence where the arm does not need to stop between them.
+  Configured by the following parameters in the private namespace of the node:
+    retiming/enabled              -- default: False
+    retiming/blend_angle          -- maximal change of direction in joint space
+                                     (radians) at which the arm moves through
+                                     the boundary between two segments instead
+                                     of stopping. default: 0.5
+    retiming/velocity_scaling     -- fraction of the velocity limits used.
+                                     default: 1.0
+    retiming/acceleration_scaling -- fraction of the acceleration limits used.
+                                     default: 1.0
+  The scaled limits also time the paths of local Cartesian planning, whether
+  or not retiming is enabled. Segments are only blended where a sequence is
+  merged; segments handed over one by one for pipelined execution are retimed
+  on their own.
+  """
+
+  def __init__(self):
+    self.enabled = rospy.get_param('~retiming/enabled', False)
+    self._blend_angle = rospy.get_param('~retiming/blend_angle', 0.5)
+    self._velocity_scaling = rospy.get_param('~retiming/velocity_scaling', 1.0)
+    self._acceleration_scaling = rospy.get_param(
+      '~retiming/acceleration_scaling', 1.0)
+    self._limits = JointLimits() if self.enabled else None
+
+  def get_limits(self, joint_names):
+    """Scaled limits that trajectories are retimed to
+    joint_names -- names of the joints
+    returns a tuple of arrays of the velocity and acceleration limits
+    """
+    if self._limits is None:
+      self._limits = JointLimits()
+    return (self._velocity_scaling * self._limits.velocity_limits(joint_names),
+            self._acceleration_scaling
+              * self._limits.acceleration_limits(joint_names))
+
+  def _blendable(self, before, after):
+    """Check if the arm can move from the end of one segment into the next
+    without stopping
+    before -- ColumnarTrajectory of the earlier segment
+    after  -- ColumnarTrajectory of the later segment
+    """
+    if len(before) < 2 or len(after) < 2:
+      return False
+    incoming = before.positions[-1] - before.positions[-2]
+    outgoing = after.positions[1] - after.positions[0]
+    norms = np.linalg.norm(incoming) * np.linalg.norm(outgoing)
+    if norms == 0:
+      return False
+    cos_angle = np.clip(np.dot(incoming, outgoing) / norms, -1.0, 1.0)
+    return np.arccos(cos_angle) <= self._blend_angle
+
+  def retime_segments(self, segments):
+    """Join segments into a single trajectory that is retimed to the joint
+    limits. The arm comes to rest only at boundaries it cannot blend through.
+    segments -- non-empty list of ColumnarTrajectory that each start where the
+                previous one ends
+    returns a ColumnarTrajectory
+    """
+    joint_names = segments[0].joint_names
+    joined = ColumnarTrajectory.concatenate(segments)
+    # the last point of each segment is where the next one starts
+    boundaries = np.cumsum([len(s) for s in segments[:-1]]) - 1
+    stops = [b for b, before, after in zip(boundaries, segments, segments[1:])
+             if not self._blendable(before, after)]
+    return retime(joined, *self.get_limits(joint_names), stops)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+import time
+import threading
+import unittest
+from collections import deque
+from unittest import mock
+
+import rospy
+
+from ow_lander.arm_interface import OWArmInterface
+from ow_lander.exception import ArmExecutionError
+
+PKG = 'ow_lander'
+# seconds to wait for threads to reach the expected state of the queue
+WAIT_TIMEOUT = 5.0
+
+def wait_for_queue_depth(depth):
+  deadline = time.time() + WAIT_TIMEOUT
+  while time.time() < deadline:
+    with OWArmInterface._condition:
+      if len(OWArmInterface._queue) == depth:
+        return True
+    time.sleep(0.005)
+  return False
+
+
+class Checkout(threading.Thread):
+  """Checks out the arm on a thread of its own and checks it in immediately
+  once granted
+  """
+
+  def __init__(self, owner, granted):
+    super().__init__(daemon=True)
+    self.owner = owner
+    self.granted = granted
+    self.error = None
+
+  def run(self):
+    try:
+      OWArmInterface.checkout_arm(self.owner)
+    except ArmExecutionError as err:
+      self.error = str(err)
+      return
+    self.granted.append(self.owner)
+    OWArmInterface.checkin_arm(self.owner)
+
+
+class TestArmArbitration(unittest.TestCase):
+
+  def setUp(self):
+    # the arbitration state is held by the class, so each test starts from a
+    # fresh copy of it instead of constructing the node's singleton
+    patches = [
+      mock.patch.multiple(OWArmInterface, _queue=[], _in_use_by=None,
+        _stopped=False, _stop_reason="Stop was called", _owner_priority=0,
+        _queue_timeout=WAIT_TIMEOUT, _default_priority=0,
+        _priorities={'ArmStop': 10, 'Urgent': 5},
+        _preempt_lower_priority=False, _stop_clears_queue=True,
+        _wait_times=deque(maxlen=100), _granted=0, _rejected=0,
+        _queue_pub=None, _controllers={'TaskGrind': 'grinder_controller'}),
+      mock.patch('ow_lander.arm_interface.ExecutionMonitor'),
+      mock.patch('rospy.Time.now', return_value=rospy.Time(0))
+    ]
+    for patch in patches:
+      patch.start()
+      self.addCleanup(patch.stop)
+    self.granted = list()
+
+  def start_checkouts(self, owners):
+    checkouts = list()
+    for owner in owners:
+      depth = len(OWArmInterface._queue)
+      checkout = Checkout(owner, self.granted)
+      checkout.start()
+      checkouts.append(checkout)
+      # queue in a known order of arrival
+      self.assertTrue(wait_for_queue_depth(depth + 1))
+    return checkouts
+
+  def join(self, checkouts):
+    for checkout in checkouts:
+      checkout.join(WAIT_TIMEOUT)
+      self.assertFalse(checkout.is_alive())
+
+  def test_free_arm_is_checked_out_immediately(self):
+    OWArmInterface.checkout_arm('A')
+    self.assertEqual(OWArmInterface.in_use_by(), 'A')
+    OWArmInterface.checkin_arm('A')
+    self.assertIsNone(OWArmInterface.in_use_by())
+
+  def test_checkin_by_other_owner_is_ignored(self):
+    OWArmInterface.checkout_arm('A')
+    OWArmInterface.checkin_arm('B')
+    self.assertEqual(OWArmInterface.in_use_by(), 'A')
+
+  def test_queue_grants_by_priority_then_arrival(self):
+    OWArmInterface.checkout_arm('Owner')
+    checkouts = self.start_checkouts(['A', 'B', 'Urgent', 'C'])
+    status = OWArmInterface.get_queue_status()
+    self.assertEqual(status.owner, 'Owner')
+    self.assertEqual(list(status.queued), ['Urgent', 'A', 'B', 'C'])
+    self.assertEqual(status.queue_depth, 4)
+    OWArmInterface.checkin_arm('Owner')
+    self.join(checkouts)
+    self.assertEqual(self.granted, ['Urgent', 'A', 'B', 'C'])
+    self.assertEqual(OWArmInterface.get_queue_status().granted, 5)
+
+  def test_zero_timeout_rejects_immediately(self):
+    OWArmInterface._queue_timeout = 0.0
+    OWArmInterface.checkout_arm('A')
+    with self.assertRaisesRegex(ArmExecutionError, 'checked out by the A'):
+      OWArmInterface.checkout_arm('B')
+    self.assertEqual(OWArmInterface._queue, [])
+    self.assertEqual(OWArmInterface.get_queue_status().rejected, 1)
+
+  def test_checkout_times_out(self):
+    OWArmInterface._queue_timeout = 0.05
+    OWArmInterface.checkout_arm('A')
+    with self.assertRaisesRegex(ArmExecutionError, 'Waited 0.05 seconds'):
+      OWArmInterface.checkout_arm('B')
+    self.assertEqual(OWArmInterface.in_use_by(), 'A')
+    self.assertEqual(OWArmInterface._queue, [])
+
+  def test_cancelled_checkout_leaves_queue(self):
+    OWArmInterface.checkout_arm('Owner')
+    cancelled, waiting = self.start_checkouts(['A', 'B'])
+    OWArmInterface.cancel_checkout('A', "Goal was preempted")
+    cancelled.join(WAIT_TIMEOUT)
+    self.assertEqual(cancelled.error, "Goal was preempted")
+    self.assertEqual(list(OWArmInterface.get_queue_status().queued), ['B'])
+    OWArmInterface.checkin_arm('Owner')
+    self.join([waiting])
+    self.assertEqual(self.granted, ['B'])
+
+  def test_stop_clears_queue(self):
+    OWArmInterface.checkout_arm('Owner')
+    checkouts = self.start_checkouts(['A', 'B'])
+    self.assertTrue(OWArmInterface.stop_arm())
+    self.join(checkouts)
+    for checkout in checkouts:
+      self.assertIn('Stop was called', checkout.error)
+    self.assertTrue(OWArmInterface._stopped)
+    self.assertEqual(self.granted, [])
+    # the stop ends with the check in of the owner
+    OWArmInterface.checkin_arm('Owner')
+    self.assertFalse(OWArmInterface._stopped)
+
+  def test_stop_keeps_queue_if_configured(self):
+    OWArmInterface._stop_clears_queue = False
+    OWArmInterface.checkout_arm('Owner')
+    checkouts = self.start_checkouts(['A'])
+    self.assertTrue(OWArmInterface.stop_arm())
+    OWArmInterface.checkin_arm('Owner')
+    self.join(checkouts)
+    self.assertEqual(self.granted, ['A'])
+
+  def test_higher_priority_preempts_owner_if_configured(self):
+    OWArmInterface.checkout_arm('Owner')
+    checkouts = self.start_checkouts(['A'])
+    self.assertFalse(OWArmInterface._stopped)
+    OWArmInterface._preempt_lower_priority = True
+    checkouts += self.start_checkouts(['ArmStop'])
+    self.assertTrue(OWArmInterface._stopped)
+    self.assertIn('ArmStop', OWArmInterface._stop_reason)
+    OWArmInterface.checkin_arm('Owner')
+    self.join(checkouts)
+    self.assertEqual(self.granted, ['ArmStop', 'A'])
+
+  def test_next_controller_is_that_of_first_waiting_owner(self):
+    OWArmInterface.checkout_arm('Owner')
+    self.assertIsNone(OWArmInterface.get_next_controller())
+    checkouts = self.start_checkouts(['A', 'TaskGrind'])
+    self.assertEqual(OWArmInterface.get_next_controller(), 'arm_controller')
+    OWArmInterface.cancel_checkout('A', "Goal was preempted")
+    checkouts[0].join(WAIT_TIMEOUT)
+    self.assertEqual(OWArmInterface.get_next_controller(),
+                     'grinder_controller')
+    OWArmInterface.checkin_arm('Owner')
+    self.join(checkouts[1:])
+
+
+if __name__ == '__main__':
+  import rosunit
+  rosunit.unitrun(PKG, 'test_arm_interface', TestArmArbitration)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+import unittest
+from unittest import mock
+
+import numpy as np
+from urdf_parser_py.urdf import URDF
+
+from ow_lander.kinematics import ForwardKinematics
+from ow_lander import math3d_array
+from ow_lander.inverse_kinematics import InverseKinematics
+
+PKG = 'ow_lander'
+
+# the chain from base_link to l_scoop of urdf/lander.xacro
+ARM_URDF = """<?xml version="1.0"?>
+<robot name="arm">
+  <link name="base_link"/>
+  <link name="l_shou"/>
+  <link name="l_prox"/>
+  <link name="l_dist"/>
+  <link name="l_wrist"/>
+  <link name="l_hand"/>
+  <link name="l_scoop"/>
+  <joint name="j_shou_yaw" type="revolute">
+    <origin xyz="0.79 0.175 0.27" rpy="-3.1416 0 0"/>
+    <parent link="base_link"/>
+    <child link="l_shou"/>
+    <axis xyz="0 0 -1"/>
+    <limit effort="70.9" velocity="0.15" lower="-1.56" upper="1.43"/>
+  </joint>
+  <joint name="j_shou_pitch" type="revolute">
+    <origin xyz="0.16 0 0" rpy="1.5708 0 0"/>
+    <parent link="l_shou"/>
+    <child link="l_prox"/>
+    <axis xyz="0 0 -1"/>
+    <limit effort="101.0" velocity="0.2" lower="-0.4" upper="2.2"/>
+  </joint>
+  <joint name="j_prox_pitch" type="revolute">
+    <origin xyz="0.53 0 0" rpy="0 0 0"/>
+    <parent link="l_prox"/>
+    <child link="l_dist"/>
+    <axis xyz="0 0 -1"/>
+    <limit effort="73.0" velocity="0.2" lower="-3.2" upper="3.2"/>
+  </joint>
+  <joint name="j_dist_pitch" type="revolute">
+    <origin xyz="0.586 0 -0.15" rpy="3.1416 0 1.5708"/>
+    <parent link="l_dist"/>
+    <child link="l_wrist"/>
+    <axis xyz="0 0 1"/>
+    <limit effort="25.7" velocity="0.2" lower="-2.2" upper="3.65"/>
+  </joint>
+  <joint name="j_hand_yaw" type="revolute">
+    <origin xyz="0.163 0.2 0" rpy="1.5708 0 0"/>
+    <parent link="l_wrist"/>
+    <child link="l_hand"/>
+    <axis xyz="0 0 -1"/>
+    <limit effort="25.7" velocity="0.2" lower="-3.2" upper="3.2"/>
+  </joint>
+  <joint name="j_scoop_yaw" type="revolute">
+    <origin xyz="0.15 0 0" rpy="1.5708 0 1.5708"/>
+    <parent link="l_hand"/>
+    <child link="l_scoop"/>
+    <axis xyz="0 0 -1"/>
+    <limit effort="20.0" velocity="0.2" lower="-3.2" upper="3.2"/>
+  </joint>
+</robot>
+"""
+JOINTS = ['j_shou_yaw', 'j_shou_pitch', 'j_prox_pitch', 'j_dist_pitch',
+          'j_hand_yaw', 'j_scoop_yaw']
+LINK = 'l_scoop'
+HOME = np.array([0.2, 0.6, -1.2, 1.5, 0.3, 0.1])
+
+
+class TestInverseKinematics(unittest.TestCase):
+
+  def setUp(self):
+    # construct new instances from the URDF above instead of the node's
+    # singletons, which read robot_description from the parameter server
+    with mock.patch.object(URDF, 'from_parameter_server',
+                           return_value=URDF.from_xml_string(ARM_URDF)):
+      self.fk = ForwardKinematics.__new__(ForwardKinematics)
+      self.fk.__init__()
+    self.ik = InverseKinematics.__new__(InverseKinematics)
+    self.ik._fk = self.fk
+    self.lower, self.upper = self.fk.get_joint_limits(JOINTS)
+
+  def assert_reaches(self, positions, poses):
+    reached = self.fk.compute_poses(LINK, JOINTS, positions)
+    np.testing.assert_allclose(reached[:, :3], np.atleast_2d(poses)[:, :3],
+                               atol=2 * InverseKinematics.POSITION_TOLERANCE)
+    # q and -q are the same orientation
+    alignment = np.abs(np.sum(reached[:, 3:] * np.atleast_2d(poses)[:, 3:],
+                              axis=1))
+    np.testing.assert_allclose(alignment, 1.0, atol=1e-5)
+
+  def test_solve_reaches_pose_from_nearby_seed(self):
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+      target = HOME + rng.uniform(-0.3, 0.3, len(JOINTS))
+      pose = self.fk.compute_poses(LINK, JOINTS, target)[0]
+      solution = self.ik.solve(LINK, JOINTS, HOME, pose)
+      self.assertIsNotNone(solution)
+      self.assert_reaches(solution, pose)
+
+  def test_solutions_are_clipped_to_joint_limits(self):
+    # the arm cannot swing this far around without exceeding the limit of
+    # the shoulder yaw
+    target = HOME.copy()
+    target[0] = 2.5
+    pose = self.fk.compute_poses(LINK, JOINTS, target)[0]
+    seed = HOME.copy()
+    seed[0] = self.upper[0]
+    self.assertIsNone(self.ik.solve(LINK, JOINTS, seed, pose))
+    rng = np.random.default_rng(1)
+    for _ in range(10):
+      pose = self.fk.compute_poses(
+        LINK, JOINTS, HOME + rng.uniform(-0.5, 0.5, len(JOINTS)))[0]
+      solution = self.ik.solve(LINK, JOINTS, seed, pose)
+      if solution is not None:
+        self.assertTrue(np.all(solution >= self.lower))
+        self.assertTrue(np.all(solution <= self.upper))
+
+  def test_solve_path_follows_waypoints_continuously(self):
+    joint_path = HOME + np.linspace(0.0, 0.4, 21)[1:, None] \
+                          * np.array([1.0, -0.5, 0.5, -0.5, 1.0, 1.0])
+    poses = self.fk.compute_poses(LINK, JOINTS, joint_path)
+    solutions = self.ik.solve_path(LINK, JOINTS, HOME, poses, 0.2)
+    self.assertEqual(solutions.shape, (20, len(JOINTS)))
+    self.assert_reaches(solutions, poses)
+    steps = np.abs(np.diff(np.vstack([HOME, solutions]), axis=0))
+    self.assertLessEqual(np.max(steps), 0.2)
+
+  def test_solve_path_rejects_jumps(self):
+    target = HOME + np.array([0.3, 0.0, 0.0, 0.0, 0.0, 0.0])
+    poses = self.fk.compute_poses(LINK, JOINTS, target)
+    with self.assertRaisesRegex(ValueError, 'jumped at waypoint 0'):
+      self.ik.solve_path(LINK, JOINTS, HOME, poses, 0.1)
+
+  def test_solve_path_rejects_unreachable_waypoint(self):
+    reachable = self.fk.compute_poses(LINK, JOINTS, HOME)[0]
+    unreachable = reachable.copy()
+    unreachable[:3] += [5.0, 0.0, 0.0]
+    with self.assertRaisesRegex(ValueError, 'waypoint 1'):
+      self.ik.solve_path(LINK, JOINTS, HOME, [reachable, unreachable], 0.2)
+
+  def test_sparse_path_bounds_deviation_halfway_between_states(self):
+    start = self.fk.compute_poses(LINK, JOINTS, HOME)[0]
+    center = start[:3] + np.array([0.0, 0.0, 0.1])
+    end = start.copy()
+    # a quarter circle in the vertical plane through the start
+    end[:3] = center + np.array([0.1, 0.0, 0.0])
+    waypoints = math3d_array.adaptive_circular_waypoints(start, end, center,
+                                                         0.001, 0.25, 0.05)
+    poses, solutions = self.ik.solve_sparse_path(LINK, JOINTS, HOME,
+                                                 waypoints, 0.2, 0.001)
+    self.assert_reaches(solutions, poses)
+    ends = np.vstack([start, poses])
+    joints = np.vstack([HOME, solutions])
+    halfway = self.fk.compute_poses(LINK, JOINTS,
+                                    (joints[:-1] + joints[1:]) / 2)
+    deviation = np.linalg.norm(
+      halfway[:, :3] - (ends[:-1, :3] + ends[1:, :3]) / 2, axis=1)
+    self.assertLessEqual(np.max(deviation), 0.001)
+    # far fewer states than interpolating the arc every centimeter
+    arc_length = 0.1 * np.pi / 2
+    self.assertLess(len(poses), arc_length / 0.01 / 2)
+
+  def test_sparse_path_adds_states_where_the_arm_strays(self):
+    start = self.fk.compute_poses(LINK, JOINTS, HOME)[0]
+    end = self.fk.compute_poses(LINK, JOINTS, HOME + 0.15)[0]
+    poses, _ = self.ik.solve_sparse_path(LINK, JOINTS, HOME, [end], 0.2,
+                                         0.0005)
+    self.assertGreater(len(poses), 1)
+    np.testing.assert_allclose(poses[-1], end)
+
+
+if __name__ == '__main__':
+  import rosunit
+  rosunit.unitrun(PKG, 'test_inverse_kinematics', TestInverseKinematics)
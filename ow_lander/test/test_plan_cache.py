@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+import unittest
+from unittest import mock
+
+from moveit_msgs.msg import RobotTrajectory
+from trajectory_msgs.msg import JointTrajectoryPoint
+
+from ow_lander.plan_cache import PlanCache
+
+PKG = 'ow_lander'
+
+def create_trajectory(start_positions):
+  trajectory = RobotTrajectory()
+  trajectory.joint_trajectory.joint_names = [
+    f'j{i}' for i in range(len(start_positions))]
+  trajectory.joint_trajectory.points = [
+    JointTrajectoryPoint(positions=list(start_positions)),
+    JointTrajectoryPoint(positions=[p + 0.5 for p in start_positions])
+  ]
+  return trajectory
+
+
+class TestPlanCache(unittest.TestCase):
+
+  def setUp(self):
+    # construct a new cache with the default configuration instead of the
+    # node's singleton
+    with mock.patch('rospy.get_param',
+                    side_effect=lambda _name, default=None: default):
+      self.cache = PlanCache.__new__(PlanCache)
+      self.cache.__init__()
+
+  def test_key_quantizes_start_positions(self):
+    a = self.cache.make_key('arm', None, 'RRTConnect', [0.1001, 0.2],
+                            ('pose', 1.0))
+    b = self.cache.make_key('arm', None, 'RRTConnect', [0.0999, 0.2003],
+                            ('pose', 1.0))
+    c = self.cache.make_key('arm', None, 'RRTConnect', [0.12, 0.2],
+                            ('pose', 1.0))
+    self.assertEqual(a, b)
+    self.assertNotEqual(a, c)
+
+  def test_key_distinguishes_requests(self):
+    start = [0.0, 0.0]
+    self.assertNotEqual(
+      self.cache.make_key('arm', None, 'RRTConnect', start, ('pose', 1.0)),
+      self.cache.make_key('arm', None, 'RRTConnect', start, ('pose', 1.001)))
+    self.assertNotEqual(
+      self.cache.make_key('arm', None, 'RRTConnect', start, ('pose', 1.0)),
+      self.cache.make_key('arm', None, 'RRTstar', start, ('pose', 1.0)))
+
+  def test_hit_returns_copy_of_trajectory(self):
+    start = [0.1, 0.2]
+    key = self.cache.make_key('arm', None, 'RRTConnect', start, ('pose',))
+    self.cache.put(key, create_trajectory(start))
+    hit = self.cache.get(key, start)
+    self.assertIsNotNone(hit)
+    self.assertEqual(list(hit.joint_trajectory.points[1].positions),
+                     [0.6, 0.7])
+    hit.joint_trajectory.points[0].positions = [9.0, 9.0]
+    self.assertIsNotNone(self.cache.get(key, start))
+
+  def test_hit_rejected_when_start_is_out_of_tolerance(self):
+    key = ('arm', None, 'RRTConnect', (0, 0), ('pose',))
+    self.cache.put(key, create_trajectory([0.0, 0.0]))
+    self.assertIsNotNone(self.cache.get(key, [0.0, 0.04]))
+    self.assertIsNone(self.cache.get(key, [0.0, 0.06]))
+    self.assertIsNone(self.cache.get(key, [0.0]))
+
+  def test_least_recently_used_is_evicted(self):
+    self.cache._capacity = 2
+    keys = [('arm', None, 'RRTConnect', (i,), ()) for i in range(3)]
+    self.cache.put(keys[0], create_trajectory([0.0]))
+    self.cache.put(keys[1], create_trajectory([0.0]))
+    # touch the first entry so the second is the least recently used
+    self.assertIsNotNone(self.cache.get(keys[0], [0.0]))
+    self.cache.put(keys[2], create_trajectory([0.0]))
+    self.assertIsNotNone(self.cache.get(keys[0], [0.0]))
+    self.assertIsNone(self.cache.get(keys[1], [0.0]))
+    self.assertIsNotNone(self.cache.get(keys[2], [0.0]))
+
+
+if __name__ == '__main__':
+  import rosunit
+  rosunit.unitrun(PKG, 'test_plan_cache', TestPlanCache)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+import threading
+import unittest
+from unittest import mock
+
+from ow_lander.exception import ArmPlanningError
+from ow_lander.planner_portfolio import PlannerPortfolio
+
+PKG = 'ow_lander'
+
+class Trajectory:
+  """Stands in for a RobotTrajectory of a given duration"""
+
+  def __init__(self, duration):
+    self.joint_trajectory = mock.MagicMock()
+    self.joint_trajectory.points[-1].time_from_start.to_sec.return_value = \
+      duration
+
+
+class Context:
+  """Stands in for a MoveGroupCommander"""
+
+  def __init__(self, group_name, ns=''):
+    self.ns = ns
+    self.planner_id = None
+    self.planning_time = None
+
+  def set_planner_id(self, planner_id):
+    self.planner_id = planner_id
+
+  def set_planning_time(self, planning_time):
+    self.planning_time = planning_time
+
+  def set_end_effector_link(self, _link):
+    pass
+
+  def clear_pose_targets(self):
+    pass
+
+
+class TestPlannerPortfolio(unittest.TestCase):
+
+  def create_portfolio(self, **params):
+    params = {f'~planner_portfolio/{k}': v for k, v in params.items()}
+    with mock.patch('rospy.get_param',
+                    side_effect=lambda name, default=None:
+                      params.get(name, default)):
+      portfolio = PlannerPortfolio.__new__(PlannerPortfolio)
+      portfolio.__init__()
+    self.addCleanup(portfolio._executor.shutdown)
+    patch = mock.patch('moveit_commander.MoveGroupCommander', Context)
+    patch.start()
+    self.addCleanup(patch.stop)
+    return portfolio
+
+  def test_planners_of_one_move_group_node_plan_in_turn(self):
+    portfolio = self.create_portfolio(planners=['A', 'B', 'C'], deadline=3.0)
+    calls = list()
+    def plan(context):
+      calls.append((context.planner_id, context.planning_time))
+      if context.planner_id == 'A':
+        raise ArmPlanningError("no plan")
+      return Trajectory(1.0), 0.1
+    _, _, winner = portfolio.plan('arm', None, plan)
+    self.assertEqual(winner, 'B')
+    # C is not started once B found a plan
+    self.assertEqual(calls, [('A', 1.0), ('B', 1.0)])
+    statistics = portfolio.get_statistics()
+    self.assertEqual(statistics['A']['failures'], 1)
+    self.assertEqual(statistics['B']['wins'], 1)
+    self.assertEqual(statistics['C']['unfinished'], 1)
+
+  def test_best_mode_takes_the_shortest_trajectory(self):
+    portfolio = self.create_portfolio(planners=['A', 'B'], mode='best')
+    durations = {'A': 3.0, 'B': 2.0}
+    _, _, winner = portfolio.plan('arm', None,
+      lambda context: (Trajectory(durations[context.planner_id]), 0.1))
+    self.assertEqual(winner, 'B')
+
+  def test_planners_of_separate_move_group_nodes_race(self):
+    portfolio = self.create_portfolio(planners=['A', 'B'], deadline=2.0,
+                                      namespaces={'B': 'portfolio_b'})
+    both_planning = threading.Barrier(2, timeout=2.0)
+    namespaces = dict()
+    def plan(context):
+      namespaces[context.planner_id] = context.ns
+      # only passes if both planners plan at the same time
+      both_planning.wait()
+      return Trajectory(1.0), 0.1
+    portfolio.plan('arm', None, plan)
+    self.assertEqual(namespaces, {'A': '', 'B': 'portfolio_b'})
+
+  def test_busy_context_is_not_queued_behind(self):
+    portfolio = self.create_portfolio(planners=['A', 'B'])
+    _, lock = portfolio._get_context('arm', 'A')
+    planned = list()
+    def plan(context):
+      planned.append(context.planner_id)
+      return Trajectory(1.0), 0.1
+    with lock:
+      _, _, winner = portfolio.plan('arm', None, plan)
+    self.assertEqual(winner, 'B')
+    self.assertEqual(planned, ['B'])
+
+  def test_no_plan_raises(self):
+    portfolio = self.create_portfolio(planners=['A'])
+    def plan(_context):
+      raise ArmPlanningError("no plan")
+    with self.assertRaisesRegex(ArmPlanningError, 'A: no plan'):
+      portfolio.plan('arm', None, plan)
+
+
+if __name__ == '__main__':
+  import rosunit
+  rosunit.unitrun(PKG, 'test_planner_portfolio', TestPlannerPortfolio)
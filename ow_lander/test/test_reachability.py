@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+import unittest
+from collections import namedtuple
+
+import numpy as np
+
+from ow_lander import reachability
+from ow_lander.exception import ArmPlanningError
+from ow_lander.reachability import ReachabilityMap
+
+PKG = 'ow_lander'
+
+Point = namedtuple('Point', ['x', 'y', 'z'])
+
+class TestReachabilityMap(unittest.TestCase):
+
+  def setUp(self):
+    # a map that is not backed by a file
+    self.map = ReachabilityMap.__new__(ReachabilityMap)
+    self.map.__init__('/nonexistent/reachability_map.npz')
+    # a 4x4x4 grid of 0.1 m voxels from the origin where only the voxel with
+    # its center at (0.15, 0.15, 0.15) is known to be reachable for grinding
+    tasks = np.zeros((4, 4, 4), dtype=np.uint8)
+    tasks[1, 1, 1] = reachability.TASK_GRIND
+    self.map.set_grid([0.0, 0.0, 0.0], 0.1, tasks,
+                      np.zeros(tasks.shape), dict())
+
+  def test_no_map_rejects_nothing(self):
+    empty = ReachabilityMap.__new__(ReachabilityMap)
+    empty.__init__('/nonexistent/reachability_map.npz')
+    self.assertFalse(empty.loaded)
+    empty.check(reachability.TASK_GRIND, Point(0.0, 0.0, 0.0))
+
+  def test_point_next_to_feasible_voxel_passes(self):
+    # the voxel containing this point is infeasible, but one of the voxel
+    # centers surrounding it is feasible
+    self.map.check(reachability.TASK_GRIND, Point(0.22, 0.18, 0.24))
+    self.map.check(reachability.TASK_GRIND, Point(0.15, 0.15, 0.15))
+
+  def test_point_surrounded_by_infeasible_voxels_is_rejected(self):
+    with self.assertRaises(ArmPlanningError):
+      self.map.check(reachability.TASK_GRIND, Point(0.27, 0.27, 0.27))
+    with self.assertRaises(ArmPlanningError):
+      self.map.check(reachability.TASK_DISCARD, Point(0.15, 0.15, 0.15))
+
+  def test_points_outside_the_map_are_unknown(self):
+    self.map.check(reachability.TASK_GRIND, Point(1.0, 1.0, 1.0))
+    self.map.check(reachability.TASK_GRIND, Point(-0.5, 0.2, 0.2))
+    # the surrounding voxel centers of points in the outer half of a boundary
+    # voxel are not all mapped
+    self.map.check(reachability.TASK_GRIND, Point(0.38, 0.2, 0.2))
+
+  def test_workspace_shoulder_yaw_is_nan_near_the_shoulder(self):
+    self.assertTrue(np.isnan(reachability.workspace_shoulder_yaw(
+      reachability.constants.X_SHOU, reachability.constants.Y_SHOU)))
+    self.assertFalse(np.isnan(reachability.workspace_shoulder_yaw(2.0, 0.0)))
+
+
+if __name__ == '__main__':
+  import rosunit
+  rosunit.unitrun(PKG, 'test_reachability', TestReachabilityMap)
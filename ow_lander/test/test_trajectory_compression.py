@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from ow_lander.columnar_trajectory import ColumnarTrajectory
+from ow_lander.trajectory_compression import (TrajectoryCompressor,
+                                              _interpolate, simplify)
+
+PKG = 'ow_lander'
+
+def sample_polynomial(coefficients, times):
+  """Samples positions, velocities, and accelerations of a polynomial in time
+  with one column of coefficients per joint, lowest order first
+  """
+  powers = np.arange(len(coefficients))
+  t = np.asarray(times)[:, None]
+  positions = (t ** powers) @ coefficients
+  velocities = (powers[1:] * t ** powers[:-1]) @ coefficients[1:]
+  accelerations = (powers[2:] * (powers[2:] - 1) * t ** powers[:-2]) \
+                    @ coefficients[2:]
+  return positions, velocities, accelerations
+
+def max_deviation(original, kept):
+  """Maximal joint deviation of the original points from the interpolation
+  between the kept points
+  """
+  anchors = np.flatnonzero(kept)
+  deviation = 0.0
+  for start, end in zip(anchors[:-1], anchors[1:]):
+    if end - start > 1:
+      interpolated = _interpolate(original, start, end)
+      deviation = max(deviation, np.max(
+        np.abs(original.positions[start + 1:end] - interpolated)))
+  return deviation
+
+
+class TestInterpolation(unittest.TestCase):
+
+  def test_quintic_reproduces_quintic_polynomial(self):
+    rng = np.random.default_rng(1)
+    coefficients = rng.normal(size=(6, 2))
+    times = np.linspace(0.0, 2.0, 9)
+    trajectory = ColumnarTrajectory(['a', 'b'], times,
+                                    *sample_polynomial(coefficients, times))
+    np.testing.assert_allclose(_interpolate(trajectory, 0, 8),
+                               trajectory.positions[1:8], atol=1e-9)
+
+  def test_cubic_reproduces_cubic_polynomial(self):
+    rng = np.random.default_rng(2)
+    coefficients = rng.normal(size=(4, 3))
+    times = np.linspace(0.5, 1.5, 6)
+    positions, velocities, _ = sample_polynomial(coefficients, times)
+    trajectory = ColumnarTrajectory(['a', 'b', 'c'], times, positions,
+                                    velocities)
+    np.testing.assert_allclose(_interpolate(trajectory, 0, 5),
+                               positions[1:5], atol=1e-9)
+
+  def test_linear_without_velocities(self):
+    trajectory = ColumnarTrajectory(['a'], [0.0, 1.0, 4.0], [[0.0], [5.0],
+                                                             [4.0]])
+    np.testing.assert_allclose(_interpolate(trajectory, 0, 2), [[1.0]])
+
+
+class TestSimplify(unittest.TestCase):
+
+  def test_collinear_points_are_removed(self):
+    times = np.linspace(0.0, 1.0, 11)
+    trajectory = ColumnarTrajectory(['a', 'b'], times,
+                                    np.stack([times, 2 * times], axis=1))
+    kept = simplify(trajectory, 0.01)
+    self.assertEqual(np.flatnonzero(kept).tolist(), [0, 10])
+
+  def test_deviation_is_checked_against_spline(self):
+    # the points are on a line in time, but the velocities they retain make
+    # the spline between the end points bulge away from it
+    times = np.linspace(0.0, 1.0, 11)
+    positions = times[:, None]
+    velocities = np.full_like(positions, 3.0)
+    linear = ColumnarTrajectory(['a'], times, positions)
+    splined = ColumnarTrajectory(['a'], times, positions, velocities,
+                                 np.zeros_like(positions))
+    self.assertEqual(np.count_nonzero(simplify(linear, 0.01)), 2)
+    kept = simplify(splined, 0.01)
+    self.assertGreater(np.count_nonzero(kept), 2)
+    self.assertLessEqual(max_deviation(splined, kept), 0.01)
+
+  def test_keep_is_honored(self):
+    times = np.linspace(0.0, 1.0, 5)
+    trajectory = ColumnarTrajectory(['a'], times, times[:, None])
+    kept = simplify(trajectory, 0.01, keep=[2])
+    self.assertEqual(np.flatnonzero(kept).tolist(), [0, 2, 4])
+
+
+class TestTrajectoryCompressor(unittest.TestCase):
+
+  def setUp(self):
+    with mock.patch('rospy.get_param',
+                    side_effect=lambda _name, default=None: default):
+      self.compressor = TrajectoryCompressor.__new__(TrajectoryCompressor)
+      self.compressor.__init__()
+
+  def test_compressed_trajectory_is_within_tolerance(self):
+    rng = np.random.default_rng(3)
+    times = np.linspace(0.0, 4.0, 81)
+    # a smooth path sampled densely, at rest at its ends and in the middle
+    phase = np.pi * times / 2.0
+    amplitude = rng.uniform(0.5, 1.5, 4)
+    positions = np.sin(phase / 2.0)[:, None] ** 2 * amplitude
+    velocities = (np.pi / 4.0 * np.sin(phase))[:, None] * amplitude
+    accelerations = (np.pi ** 2 / 8.0 * np.cos(phase))[:, None] * amplitude
+    velocities[[0, 40, 80]] = 0.0
+    trajectory = ColumnarTrajectory(['a', 'b', 'c', 'd'], times, positions,
+                                    velocities, accelerations)
+    compressed = self.compressor.compress(trajectory)
+    self.assertLess(len(compressed), len(trajectory))
+    kept = np.isin(trajectory.times, compressed.times)
+    self.assertTrue(kept[40])
+    self.assertLessEqual(max_deviation(trajectory, kept), 0.01)
+    np.testing.assert_array_equal(compressed.velocities,
+                                  trajectory.velocities[kept])
+
+
+if __name__ == '__main__':
+  import rosunit
+  rosunit.unitrun(PKG, 'test_interpolation', TestInterpolation)
+  rosunit.unitrun(PKG, 'test_simplify', TestSimplify)
+  rosunit.unitrun(PKG, 'test_trajectory_compressor', TestTrajectoryCompressor)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+import time
+import threading
+import unittest
+
+from ow_lander.exception import ArmPlanningError
+from ow_lander.trajectory_pipeline import SegmentPipeline
+
+PKG = 'ow_lander'
+# seconds to wait for threads that are expected to finish
+WAIT_TIMEOUT = 5.0
+
+class TestSegmentPipeline(unittest.TestCase):
+
+  def setUp(self):
+    # released to let the planning thread finish its current segment
+    self.release = threading.Event()
+    self.pushed = list()
+    self.errors = list()
+
+  def create_pipeline(self, segments):
+    def plan():
+      for segment in segments:
+        self.release.wait(WAIT_TIMEOUT)
+        try:
+          pipeline.push_segment(segment)
+        except ArmPlanningError as err:
+          self.errors.append(err)
+          raise
+        self.pushed.append(segment)
+      return 'merged'
+    pipeline = SegmentPipeline(plan)
+    return pipeline
+
+  def test_segments_are_yielded_in_order(self):
+    self.release.set()
+    pipeline = self.create_pipeline(['a', 'b', 'c'])
+    pipeline.start()
+    self.assertEqual(list(pipeline.segments()), ['a', 'b', 'c'])
+    pipeline.cancel()
+
+  def test_merged_trajectory_is_yielded_if_nothing_was_pushed(self):
+    pipeline = self.create_pipeline([])
+    pipeline.start()
+    self.assertEqual(list(pipeline.segments()), ['merged'])
+
+  def test_cancel_does_not_wait_for_planning_in_progress(self):
+    pipeline = self.create_pipeline(['a', 'b'])
+    pipeline.start()
+    start = time.time()
+    pipeline.cancel()
+    self.assertLess(time.time() - start, SegmentPipeline.CANCEL_TIMEOUT + 0.5)
+    self.assertTrue(pipeline._thread.is_alive())
+    # the planning call finishes and the thread exits at its push
+    self.release.set()
+    SegmentPipeline.wait_for_cancelled()
+    self.assertFalse(pipeline._thread.is_alive())
+    self.assertEqual(self.pushed, [])
+    self.assertEqual(len(self.errors), 1)
+
+  def test_wait_for_cancelled_returns_without_cancelled_pipelines(self):
+    SegmentPipeline.wait_for_cancelled()
+
+
+if __name__ == '__main__':
+  import rosunit
+  rosunit.unitrun(PKG, 'test_trajectory_pipeline', TestSegmentPipeline)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+import threading
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import mock
+
+from ow_lander.exception import ArmPlanningError, ArmPlanningTimeoutError
+from ow_lander.trajectory_sequence import TrajectorySequence, _PendingSegment
+
+PKG = 'ow_lander'
+
+class Clock:
+  """Stands in for time.time, so the deadline only advances when told to"""
+
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+
+class TestPlanningDeadline(unittest.TestCase):
+
+  def setUp(self):
+    # only the state of the deadline is set up, so no MoveIt is required
+    self.sequence = TrajectorySequence.__new__(TrajectorySequence)
+    self.sequence._attempt = threading.local()
+    self.sequence._segments_begun = 0
+    self.sequence._deadline = None
+    self.sequence._deadline_start = None
+    self.sequence._expected_segments = None
+    self.sequence._cache = None
+    self.sequence._group = mock.Mock()
+    self.sequence._ee = None
+    self.clock = Clock()
+    patch = mock.patch('time.time', self.clock)
+    patch.start()
+    self.addCleanup(patch.stop)
+
+  def allot(self, index):
+    return self.sequence._allot_planning_time(index, ('pose', index))
+
+  def test_no_deadline_is_unbounded(self):
+    self.assertIsNone(self.allot(0))
+
+  def test_unknown_segment_count_allots_all_time_left(self):
+    self.sequence.set_deadline(10.0)
+    self.clock.now += 4.0
+    self.assertAlmostEqual(self.allot(0), 6.0)
+    self.assertAlmostEqual(self.allot(5), 6.0)
+
+  def test_time_left_is_divided_among_segments_left(self):
+    self.sequence.set_deadline(12.0, segments=3)
+    self.assertAlmostEqual(self.allot(0), 4.0)
+    # the first segment finished early, so the others get more time
+    self.clock.now += 3.0
+    self.assertAlmostEqual(self.allot(1), 4.5)
+    self.clock.now += 6.0
+    self.assertAlmostEqual(self.allot(2), 3.0)
+
+  def test_segments_past_the_expected_count_get_all_time_left(self):
+    self.sequence.set_deadline(12.0, segments=2)
+    self.assertAlmostEqual(self.allot(2), 12.0)
+    self.assertAlmostEqual(self.allot(7), 12.0)
+
+  def test_segment_count_starts_at_segments_begun(self):
+    self.sequence._segments_begun = 2
+    self.sequence.set_deadline(10.0, segments=2)
+    self.assertAlmostEqual(self.allot(2), 5.0)
+    self.assertAlmostEqual(self.allot(3), 10.0)
+
+  def test_passed_deadline_names_the_segment(self):
+    self.sequence.set_deadline(10.0, segments=3)
+    self.clock.now += 10.5
+    with self.assertRaises(ArmPlanningTimeoutError) as context:
+      self.sequence._allot_planning_time(1, ('linear', None))
+    self.assertEqual(context.exception.segment, 1)
+    self.assertEqual(context.exception.kind, 'linear')
+    self.assertAlmostEqual(context.exception.elapsed, 10.5)
+
+  def plan_from(self, plan_function):
+    group = mock.Mock()
+    group.get_planning_time.return_value = 5.0
+    with mock.patch.object(self.sequence, '_record'):
+      result = self.sequence._plan_from(1, ('linear', None), plan_function,
+                                        group, None, [0.0])
+    # the planning time of the group is bounded by the share of the segment
+    # and restored afterwards
+    group.set_planning_time.assert_has_calls([mock.call(2.0),
+                                              mock.call(5.0)])
+    return result
+
+  def test_segment_planned_past_the_deadline_is_kept(self):
+    self.sequence.set_deadline(4.0, segments=3)
+    def plan(group, start_state):
+      self.clock.now += 6.0
+      return 'trajectory', 6.0
+    self.assertEqual(self.plan_from(plan), ('trajectory', 6.0))
+
+  def test_cartesian_fallback_is_not_called_past_the_deadline(self):
+    self.sequence.set_deadline(4.0, segments=3)
+    fallback = mock.Mock(return_value=('trajectory', 0.0))
+    def plan(group, start_state):
+      # local planning failed after the deadline passed
+      self.clock.now += 6.0
+      self.sequence._check_segment_deadline()
+      return fallback()
+    with self.assertRaises(ArmPlanningTimeoutError) as context:
+      self.plan_from(plan)
+    self.assertEqual(context.exception.segment, 1)
+    fallback.assert_not_called()
+    # outside of a planning call there is no segment to check
+    self.sequence._check_segment_deadline()
+
+
+def completed(result=None, error=None):
+  future = Future()
+  if error is None:
+    future.set_result(result)
+  else:
+    future.set_exception(error)
+  return future
+
+
+class TestParallelPlanning(unittest.TestCase):
+
+  def setUp(self):
+    # trajectories are stood in for by the joint positions they end at
+    self.sequence = TrajectorySequence.__new__(TrajectorySequence)
+    self.sequence._group = mock.Mock()
+    self.sequence._ee = None
+    self.sequence._sequence = [[0.0, 0.0]]
+    self.sequence._pending = list()
+    self.sequence._most_recent_state = None
+    self.sequence._most_recent_joint_positions = None
+    self.appended = list()
+    self.replanned = list()
+    def append(index, request, start_positions, trajectory):
+      self.appended.append((index, list(start_positions), trajectory))
+      self.sequence._sequence.append(trajectory)
+      self.sequence._most_recent_joint_positions = list(trajectory)
+    def plan_from(index, request, plan_function, group, start_state,
+                  start_positions):
+      self.replanned.append((index, list(start_positions)))
+      return plan_function(start_positions), 0.0
+    patches = [
+      mock.patch.object(self.sequence, '_append_trajectory',
+                        side_effect=append),
+      mock.patch.object(self.sequence, '_plan_from', side_effect=plan_from),
+      mock.patch.object(self.sequence, '_get_final_robot_state_of'),
+      mock.patch.object(self.sequence, '_get_robot_state_at'),
+      mock.patch.object(self.sequence, '_get_final_joint_positions_of',
+                        side_effect=lambda trajectory: trajectory)
+    ]
+    for patch in patches:
+      patch.start()
+      self.addCleanup(patch.stop)
+
+  def add_pending(self, index, start_positions, future, end):
+    self.sequence._pending.append(_PendingSegment(index, ('pose', index),
+      lambda start: end, start_positions, future))
+
+  def test_planned_segments_are_appended_in_order(self):
+    self.add_pending(1, [0.0, 0.0], completed(([1.0, 0.0], 0.1)), [1.0, 0.0])
+    self.add_pending(2, [1.0, 0.0], completed(([1.0, 1.0], 0.1)), [1.0, 1.0])
+    self.sequence._resolve_pending()
+    self.assertEqual(self.appended, [(1, [0.0, 0.0], [1.0, 0.0]),
+                                     (2, [1.0, 0.0], [1.0, 1.0])])
+    self.assertEqual(self.replanned, [])
+
+  def test_segment_with_mismatched_start_is_replanned(self):
+    # the segment before ends elsewhere than predicted
+    self.add_pending(1, [0.0, 0.0], completed(([1.0, 0.5], 0.1)), [1.0, 0.5])
+    self.add_pending(2, [1.0, 0.0], completed(([1.0, 1.0], 0.1)), [1.0, 1.0])
+    self.sequence._resolve_pending()
+    self.assertEqual(self.replanned, [(2, [1.0, 0.5])])
+    self.assertEqual(self.appended[-1], (2, [1.0, 0.5], [1.0, 1.0]))
+
+  def test_failed_segment_is_replanned(self):
+    self.add_pending(1, [0.0, 0.0],
+                     completed(error=ArmPlanningError("Goal was preempted")),
+                     [1.0, 0.0])
+    self.add_pending(2, [1.0, 0.0], completed(([1.0, 1.0], 0.1)), [1.0, 1.0])
+    self.sequence._resolve_pending()
+    self.assertEqual(self.replanned, [(1, [0.0, 0.0])])
+    self.assertEqual([a[0] for a in self.appended], [1, 2])
+
+  def test_cancelled_segment_is_replanned(self):
+    future = Future()
+    future.cancel()
+    self.add_pending(1, [0.0, 0.0], future, [1.0, 0.0])
+    self.sequence._resolve_pending()
+    self.assertEqual(self.replanned, [(1, [0.0, 0.0])])
+
+  def test_move_group_action_is_not_planned_concurrently(self):
+    self.sequence._executor = ThreadPoolExecutor(2)
+    self.addCleanup(self.sequence._executor.shutdown)
+    self.sequence._group.get_name.return_value = 'arm'
+    self.sequence._most_recent_joint_positions = [0.0, 0.0]
+    motion_plan = mock.Mock(uses_move_group_action=True,
+                            return_value=[1.0, 0.0])
+    with mock.patch('ow_lander.trajectory_sequence.PlanningContextPool') \
+        as pool:
+      self.sequence._defer_segment(1, ('pose', 1), motion_plan, [1.0, 0.0])
+    # planned right away on the calling thread with the sequence's own group
+    pool.assert_not_called()
+    self.assertEqual(self.replanned, [(1, [0.0, 0.0])])
+    self.assertTrue(self.sequence._pending[0].future.done())
+    self.assertEqual(self.sequence._most_recent_joint_positions, [1.0, 0.0])
+
+
+if __name__ == '__main__':
+  import rosunit
+  rosunit.unitrun(PKG, 'test_trajectory_sequence_deadline',
+                  TestPlanningDeadline)
+  rosunit.unitrun(PKG, 'test_trajectory_sequence_parallel',
+                  TestParallelPlanning)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+import unittest
+
+import numpy as np
+
+from ow_lander.columnar_trajectory import ColumnarTrajectory
+from ow_lander.trajectory_timing import retime
+
+PKG = 'ow_lander'
+# relative slack for floating point error when comparing against limits
+LIMIT_SLACK = 1e-9
+
+def random_path(rng, points, joints):
+  positions = np.cumsum(rng.normal(0.0, 0.1, (points, joints)), axis=0)
+  return ColumnarTrajectory([f'j{i}' for i in range(joints)],
+                            np.arange(points, dtype=float), positions)
+
+
+class TestRetime(unittest.TestCase):
+
+  def assert_within_limits(self, trajectory, vmax, amax):
+    self.assertTrue(np.all(np.abs(trajectory.velocities)
+                           <= vmax * (1 + LIMIT_SLACK)))
+    self.assertTrue(np.all(np.abs(trajectory.accelerations)
+                           <= amax * (1 + LIMIT_SLACK)))
+
+  def test_random_paths_obey_limits(self):
+    for seed in range(200):
+      rng = np.random.default_rng(seed)
+      points = int(rng.integers(3, 40))
+      path = random_path(rng, points, 6)
+      vmax = rng.uniform(0.2, 1.5, 6)
+      amax = rng.uniform(0.2, 2.0, 6)
+      stops = rng.choice(np.arange(1, points - 1), size=min(2, points - 2),
+                         replace=False)
+      retimed = retime(path, vmax, amax, stops)
+      with self.subTest(seed=seed):
+        self.assertTrue(np.all(np.diff(retimed.times) > 0))
+        self.assert_within_limits(retimed, vmax, amax)
+
+  def test_path_is_preserved_and_ends_at_rest(self):
+    rng = np.random.default_rng(0)
+    path = random_path(rng, 10, 3)
+    retimed = retime(path, np.ones(3), np.ones(3), stops=[4])
+    np.testing.assert_allclose(retimed.positions, path.positions)
+    self.assertEqual(retimed.times[0], 0.0)
+    for index in (0, 4, 9):
+      np.testing.assert_allclose(retimed.velocities[index], 0.0)
+
+  def test_repeated_points_are_dropped(self):
+    path = ColumnarTrajectory(['a', 'b'], [0.0, 1.0, 2.0, 3.0],
+      [[0.0, 0.0], [0.5, 0.0], [0.5, 0.0], [1.0, 0.5]])
+    retimed = retime(path, np.ones(2), np.ones(2))
+    self.assertEqual(len(retimed), 3)
+    self.assert_within_limits(retimed, np.ones(2), np.ones(2))
+
+  def test_straight_path_reaches_velocity_limit(self):
+    positions = np.linspace(0.0, 10.0, 101)[:, None]
+    path = ColumnarTrajectory(['a'], np.arange(101, dtype=float), positions)
+    retimed = retime(path, [1.0], [2.0])
+    self.assertAlmostEqual(np.max(retimed.velocities), 1.0)
+    self.assert_within_limits(retimed, 1.0, 2.0)
+
+
+if __name__ == '__main__':
+  import rosunit
+  rosunit.unitrun(PKG, 'test_trajectory_timing', TestRetime)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# The Notices and Disclaimers for Ocean Worlds Autonomy Testbed for Exploration
+# Research and Simulation can be found in README.md in the root directory of
+# this repository.
+
+import sys
+import math
+import random
+import rospy
+import roslib
+import unittest
+import moveit_commander
+from moveit_msgs.srv import GetPositionFK
+from moveit_msgs.msg import MoveItErrorCodes
+
+from ow_lander import math3d
+from ow_lander.common import create_header
+from ow_lander.kinematics import ForwardKinematics
+
+PKG = 'ow_sim_tests'
+TEST_NAME = 'forward_kinematics'
+roslib.load_manifest(PKG)
+
+# the number of random arm configurations checked per link
+SAMPLE_COUNT = 50
+# allowed deviation between the analytic and /compute_fk results
+METER_TOLERANCE = 1e-6
+RADIAN_TOLERANCE = 1e-5
+
+class TestForwardKinematics(unittest.TestCase):
+  """Checks the analytic forward kinematics of ow_lander.kinematics against
+  MoveIt's /compute_fk service for random arm configurations.
+  """
+
+  @classmethod
+  def setUpClass(cls):
+    rospy.init_node("forward_kinematics_test")
+    moveit_commander.roscpp_initialize(sys.argv)
+    # proceed with test only when ros clock has been initialized
+    while rospy.get_time() == 0:
+      rospy.sleep(0.1)
+    SERVICE_TIMEOUT = 50 # seconds
+    rospy.wait_for_service('/compute_fk', SERVICE_TIMEOUT)
+    cls._compute_fk_srv = rospy.ServiceProxy('/compute_fk', GetPositionFK)
+    cls._robot = moveit_commander.RobotCommander()
+    cls._fk = ForwardKinematics()
+    random.seed(0)
+
+  def _random_robot_state(self, group):
+    """Random joint positions within limits for all joints of a move group"""
+    state = self._robot.get_current_state()
+    positions = list(state.joint_state.position)
+    for name in self._robot.get_joint_names(group):
+      if name not in state.joint_state.name:
+        continue
+      joint = self._robot.get_joint(name)
+      lower, upper = joint.bounds()
+      positions[state.joint_state.name.index(name)] = \
+        random.uniform(max(lower, -3.2), min(upper, 3.2))
+    state.joint_state.position = positions
+    return state
+
+  def _check_link(self, group, link):
+    for _i in range(SAMPLE_COUNT):
+      state = self._random_robot_state(group)
+      result = self._compute_fk_srv(create_header('base_link'), [link], state)
+      self.assertEqual(result.error_code.val, MoveItErrorCodes.SUCCESS)
+      expected = result.pose_stamped[0].pose
+      actual = self._fk.compute_pose(link, state.joint_state.name,
+                                     state.joint_state.position)
+      msg = f"Analytic pose of {link} does not match /compute_fk.\n" \
+            f"expected: {expected}\nactual: {actual}"
+      self.assertLessEqual(
+        math3d.distance(expected.position, actual.position), METER_TOLERANCE,
+        msg)
+      # q and -q represent the same rotation, so compare the angle between them
+      # NOTE: dot product is clamped because of floating-point error
+      dp = min(abs(math3d.dot(expected.orientation, actual.orientation)), 1.0)
+      self.assertLessEqual(2 * math.acos(dp), RADIAN_TOLERANCE, msg)
+      # batched entry point must agree with the single configuration one
+      batched = self._fk.compute_poses(link, state.joint_state.name,
+                                       [state.joint_state.position])[0]
+      self.assertAlmostEqual(batched[0], actual.position.x)
+      self.assertAlmostEqual(batched[1], actual.position.y)
+      self.assertAlmostEqual(batched[2], actual.position.z)
+
+  def test_01_scoop(self):
+    self._check_link('arm', 'l_scoop')
+
+  def test_02_scoop_tip(self):
+    self._check_link('arm', 'l_scoop_tip')
+
+  def test_03_grinder_tip(self):
+    self._check_link('grinder', 'l_grinder_tip')
+
+if __name__ == '__main__':
+  import rostest
+  rostest.rosrun(PKG, TEST_NAME, TestForwardKinematics)